@@ -0,0 +1,130 @@
+"""Артефакты упавших тестов: скриншот, DOM и последние события браузера
+
+Пока тест идет, ничего лишнего не снимается: консоль браузера копится в
+chromedriver (goog:loggingPrefs browser), а загрузки документов уже есть
+в метриках PageMetricsCollector. Только при падении из браузера
+синхронно читаются скриншот, DOM, консоль и запросы текущей страницы;
+последние события держатся в кольцевых буферах.
+Сжатие и запись на диск идут в фоновом потоке, тест и следующие тесты
+их не ждут. В HTML отчет попадают ссылки на файлы, а не сами файлы.
+"""
+import gzip
+import json
+import os
+import re
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from selenium.common.exceptions import WebDriverException
+
+
+DEFAULT_LOG_SIZE = 200
+
+# Последние запросы текущего документа
+REQUESTS_JS = """
+return performance.getEntriesByType('resource').slice(-100).map(function (entry) {
+  return {url: entry.name, type: entry.initiatorType, start: Math.round(entry.startTime),
+          duration: Math.round(entry.duration), transfer: entry.transferSize,
+          status: entry.responseStatus || null};
+});
+"""
+
+Capture = namedtuple("Capture", "url screenshot dom console network")
+
+
+class ArtifactRecorder:
+    """Кольцевые буферы консоли и запросов одной сессии WebDriver на время теста"""
+
+    def __init__(self, driver, collector, log_size=DEFAULT_LOG_SIZE):
+        self.driver = driver
+        self.collector = collector
+        self.console = deque(maxlen=log_size)
+        self.network = deque(maxlen=log_size)
+        # Сообщения от предыдущего теста этой сессии и сброса между тестами не нужны
+        self.drain_console()
+        self.console.clear()
+
+    def drain_console(self):
+        try:
+            self.console.extend(self.driver.get_log("browser"))
+        except WebDriverException:
+            pass
+
+    def _fill_network(self):
+        """Загрузки документов теста по метрикам сборщика и запросы текущей страницы"""
+        self.network.clear()
+        for page in sorted(self.collector.pages.values(), key=lambda page: page["time_origin"]):
+            self.network.append({"url": page["url"], "type": "navigation", "start": 0, "duration": page.get("load"),
+                                 "transfer": page.get("transfer_bytes"), "status": page.get("status")})
+        try:
+            self.network.extend(self.driver.execute_script(REQUESTS_JS) or [])
+        except WebDriverException:
+            pass
+
+    def capture(self):
+        """Снимок на момент падения; из браузера читается только то, что пропадет после теста"""
+        self.collector.harvest()
+        self.drain_console()
+        self._fill_network()
+        try:
+            url = self.driver.current_url
+            screenshot = self.driver.get_screenshot_as_png()
+            dom = self.driver.page_source
+        except WebDriverException as e:
+            url, screenshot, dom = None, None, f"<!-- page unavailable: {e!r} -->"
+        return Capture(url, screenshot, dom, list(self.console), list(self.network))
+
+
+def _slug(nodeid):
+    return re.sub(r"[^\w.-]+", "_", nodeid).strip("_")[-120:]
+
+
+class ArtifactWriter:
+    """Фоновая запись артефактов: скриншот как есть (PNG уже сжат), DOM и журналы в gzip"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.written = []
+        self.errors = []
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="artifact-writer")
+
+    def submit(self, nodeid, when, capture):
+        """Ставит запись в очередь и сразу возвращает пути файлов {имя: путь}"""
+        folder = os.path.join(self.directory, f"{_slug(nodeid)}-{when}")
+        paths = {"dom": os.path.join(folder, "dom.html.gz"), "logs": os.path.join(folder, "logs.json.gz")}
+        if capture.screenshot:
+            paths["screenshot"] = os.path.join(folder, "screenshot.png")
+        self._executor.submit(self._write, nodeid, folder, paths, capture)
+        return paths
+
+    def _write(self, nodeid, folder, paths, capture):
+        start = time.perf_counter()
+        try:
+            os.makedirs(folder, exist_ok=True)
+            if capture.screenshot:
+                with open(paths["screenshot"], "wb") as f:
+                    f.write(capture.screenshot)
+            with gzip.open(paths["dom"], "wt", encoding="utf-8") as f:
+                f.write(capture.dom)
+            with gzip.open(paths["logs"], "wt", encoding="utf-8") as f:
+                json.dump({"test": nodeid, "url": capture.url, "console": capture.console,
+                           "network": capture.network}, f, ensure_ascii=False, indent=1)
+        except OSError as e:
+            self.errors.append(f"{nodeid}: {e}")
+            return
+        size = sum(os.path.getsize(path) for path in paths.values())
+        self.written.append((nodeid, folder, size, time.perf_counter() - start))
+
+    def close(self):
+        """Дожидается записи всех артефактов"""
+        self._executor.shutdown(wait=True)
+
+
+def summary_lines(written, errors):
+    lines = [f"{size / 1024:>8.1f} KiB  {folder}" for _, folder, size, _ in sorted(written)]
+    if written:
+        seconds = sum(item[3] for item in written)
+        lines.append(f"{len(written)} failures captured, compressed and written in the background in {seconds:.2f}s")
+    lines.extend(f"not written: {error}" for error in errors)
+    return lines
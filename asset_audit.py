@@ -0,0 +1,247 @@
+"""Аудит ресурсов страниц: вес по типам, картинки, сжатие, кэширование
+
+Для каждой посещенной страницы в браузере снимаются Resource Timing
+записи, размеры картинок (исходные и отрисованные) и список блокирующих
+отрисовку CSS и JS в <head>. Заголовки кэширования из JavaScript не
+видны, поэтому в конце прогона уникальные адреса ресурсов проверяются
+HEAD-запросами - по умолчанию только с хоста самой страницы, чужие хосты
+(CDN, счетчики) опрашиваются только по явному запросу. Пороги задаются в
+asset_thresholds.json рядом с модулем, свой файл переопределяет их.
+"""
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import urllib3
+
+
+ASSETS_JS = """
+if (location.protocol.indexOf('http') !== 0) { return null; }
+var nav = performance.getEntriesByType('navigation')[0] || {};
+var resources = performance.getEntriesByType('resource').map(function (entry) {
+  return {
+    url: entry.name,
+    initiator: entry.initiatorType,
+    transfer: entry.transferSize,
+    encoded: entry.encodedBodySize,
+    decoded: entry.decodedBodySize,
+    blocking: entry.renderBlockingStatus || null
+  };
+});
+var images = [];
+Array.prototype.forEach.call(document.images, function (img) {
+  var rect = img.getBoundingClientRect();
+  if (img.complete && img.naturalWidth && rect.width && rect.height) {
+    images.push({url: img.currentSrc || img.src, natural_width: img.naturalWidth, natural_height: img.naturalHeight,
+                 rendered_width: Math.round(rect.width), rendered_height: Math.round(rect.height)});
+  }
+});
+var blocking = [];
+Array.prototype.forEach.call(document.head.querySelectorAll('link[rel~=stylesheet][href], script[src]'), function (el) {
+  if (el.tagName === 'LINK' && !el.disabled && (!el.media || el.media === 'all' || matchMedia(el.media).matches)) {
+    blocking.push(el.href);
+  } else if (el.tagName === 'SCRIPT' && !el.async && !el.defer && el.type !== 'module') {
+    blocking.push(el.src);
+  }
+});
+return {
+  url: location.href,
+  dpr: window.devicePixelRatio || 1,
+  document: {transfer: nav.transferSize || 0, encoded: nav.encodedBodySize || 0, decoded: nav.decodedBodySize || 0},
+  resources: resources,
+  images: images,
+  blocking: blocking
+};
+"""
+
+# Пороги по умолчанию: картинка больше отрисованной (с учетом DPR) в oversized_image_ratio раз,
+# текст меньше uncompressed_min_bytes можно не сжимать, max_transfer_kib - лимиты объема по типам
+DEFAULT_THRESHOLDS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "asset_thresholds.json")
+
+TYPES_BY_EXTENSION = {
+    "css": "css",
+    "js": "script", "mjs": "script",
+    "png": "image", "jpg": "image", "jpeg": "image", "gif": "image", "webp": "image", "avif": "image",
+    "svg": "image", "ico": "image",
+    "woff": "font", "woff2": "font", "ttf": "font", "otf": "font", "eot": "font",
+}
+INITIATOR_TYPES = {"img": "image", "script": "script", "css": "image", "link": "css"}
+TEXT_TYPES = {"css", "script", "document"}
+TEXT_EXTENSIONS = {"svg"}
+
+
+def load_thresholds(path=None):
+    """Пороги из DEFAULT_THRESHOLDS_FILE, поверх них - из path"""
+    with open(DEFAULT_THRESHOLDS_FILE, encoding="utf-8") as f:
+        thresholds = json.load(f)
+    if path and os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            custom = json.load(f)
+        thresholds["max_transfer_kib"].update(custom.pop("max_transfer_kib", {}))
+        thresholds.update(custom)
+    return thresholds
+
+
+def _extension(url):
+    return os.path.splitext(urlsplit(url).path)[1].lstrip(".").lower()
+
+
+def asset_type(resource):
+    return (TYPES_BY_EXTENSION.get(_extension(resource["url"]))
+            or INITIATOR_TYPES.get(resource["initiator"]) or "other")
+
+
+def audit_page(page, thresholds):
+    """Итоги и находки по одной странице; page - результат ASSETS_JS с test и route"""
+    findings = []
+    totals = {"document": {"transfer": page["document"]["transfer"], "decoded": page["document"]["decoded"]}}
+    sizes = {}
+    seen_urls, seen_paths = {}, {}
+
+    for resource in page["resources"]:
+        kind = asset_type(resource)
+        total = totals.setdefault(kind, {"transfer": 0, "decoded": 0})
+        total["transfer"] += resource["transfer"]
+        total["decoded"] += resource["decoded"]
+        sizes[resource["url"]] = max(sizes.get(resource["url"], 0), resource["encoded"])
+
+        if resource["transfer"] > 0:
+            seen_urls[resource["url"]] = seen_urls.get(resource["url"], 0) + 1
+            parts = urlsplit(resource["url"])
+            seen_paths.setdefault((parts.netloc, parts.path), set()).add(resource["url"])
+
+        text = kind in TEXT_TYPES or _extension(resource["url"]) in TEXT_EXTENSIONS
+        # encoded == decoded при ненулевой передаче - ресурс пришел без Content-Encoding
+        if (text and resource["transfer"] > 0 and resource["encoded"] == resource["decoded"]
+                and resource["decoded"] >= thresholds["uncompressed_min_bytes"]):
+            findings.append(("uncompressed", resource["url"], f"{resource['decoded'] / 1024:.1f} KiB sent uncompressed"))
+
+    document = page["document"]
+    if document["transfer"] and document["encoded"] == document["decoded"] \
+            and document["decoded"] >= thresholds["uncompressed_min_bytes"]:
+        findings.append(("uncompressed", page["url"], f"HTML {document['decoded'] / 1024:.1f} KiB sent uncompressed"))
+
+    ratio = thresholds["oversized_image_ratio"]
+    for image in page["images"]:
+        needed_width = image["rendered_width"] * page["dpr"]
+        needed_height = image["rendered_height"] * page["dpr"]
+        size = sizes.get(image["url"], 0)
+        if (image["natural_width"] > needed_width * ratio and image["natural_height"] > needed_height * ratio
+                and size >= thresholds["oversized_image_min_bytes"]):
+            findings.append(("oversized_image", image["url"],
+                             f"{image['natural_width']}x{image['natural_height']} shown at "
+                             f"{image['rendered_width']}x{image['rendered_height']}, {size / 1024:.1f} KiB"))
+
+    for url, count in seen_urls.items():
+        if count > 1:
+            findings.append(("duplicate", url, f"downloaded {count} times"))
+    for urls in seen_paths.values():
+        if len(urls) > 1:
+            findings.append(("duplicate", sorted(urls)[0], f"same file under {len(urls)} URLs: {', '.join(sorted(urls))}"))
+
+    if len(page["blocking"]) > thresholds["max_render_blocking"]:
+        findings.append(("render_blocking", page["url"],
+                         f"{len(page['blocking'])} render-blocking CSS/JS > {thresholds['max_render_blocking']}"))
+
+    totals["total"] = {"transfer": sum(item["transfer"] for item in totals.values()),
+                       "decoded": sum(item["decoded"] for item in totals.values())}
+    for kind, limit in thresholds["max_transfer_kib"].items():
+        transfer = totals.get(kind, {}).get("transfer", 0)
+        if transfer > limit * 1024:
+            findings.append(("weight", page["url"], f"{kind} {transfer / 1024:.0f} KiB > {limit} KiB"))
+
+    return {"test": page["test"], "route": page["route"], "url": page["url"], "totals": totals,
+            "render_blocking": page["blocking"], "findings": findings}
+
+
+def _head(http, url):
+    try:
+        response = http.request("HEAD", url, timeout=5, retries=False,
+                                headers={"Accept-Encoding": "gzip, deflate, br"})
+    except urllib3.exceptions.HTTPError as e:
+        return url, {"error": repr(e)}
+    return url, {key: response.headers.get(key) for key in ("Cache-Control", "ETag", "Last-Modified",
+                                                           "Expires", "Content-Encoding")}
+
+
+def check_cache_headers(urls, limit=300, workers=8):
+    """HEAD-запросы к уникальным ресурсам: {url: {заголовок: значение}}"""
+    http = urllib3.PoolManager(maxsize=workers)
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return dict(pool.map(lambda url: _head(http, url), sorted(urls)[:limit]))
+    finally:
+        http.clear()
+
+
+def cache_findings(headers):
+    """Ресурсы без Cache-Control/Expires и без валидатора ETag/Last-Modified"""
+    findings = []
+    for url, values in sorted(headers.items()):
+        if "error" in values:
+            continue
+        missing = []
+        if not values["Cache-Control"] and not values["Expires"]:
+            missing.append("Cache-Control")
+        if not values["ETag"] and not values["Last-Modified"]:
+            missing.append("ETag")
+        if missing:
+            findings.append(("cache_headers", url, f"missing {' and '.join(missing)}"))
+    return findings
+
+
+def _origin(url):
+    parts = urlsplit(url)
+    return parts.scheme, parts.netloc
+
+
+def audit(pages, thresholds, third_party=False):
+    """Аудит всех страниц прогона с проверкой заголовков кэширования
+
+    third_party - HEAD-запросы и к ресурсам чужих хостов, а не только хоста страницы.
+    """
+    audited = [audit_page(page, thresholds) for page in pages]
+    findings = [(page["test"], *finding) for page in audited for finding in page["findings"]]
+    headers = {}
+    if thresholds["require_cache_headers"]:
+        urls = {resource["url"] for page in pages for resource in page["resources"]
+                if resource["url"].startswith("http")
+                and (third_party or _origin(resource["url"]) == _origin(page["url"]))}
+        headers = check_cache_headers(urls)
+        findings += [(None, *finding) for finding in cache_findings(headers)]
+    return {"pages": audited, "cache_headers": headers, "findings": findings}
+
+
+def write_results(path, results):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+def summary_lines(results, top=15):
+    """Вес страниц по маршрутам и находки аудита"""
+    lines = [f"{'route':<24}{'pages':>6}{'doc':>7}{'css':>7}{'js':>7}{'img':>7}{'font':>7}{'total':>8}  (max transfer, KiB)"]
+    by_route = {}
+    for page in results["pages"]:
+        by_route.setdefault(page["route"], []).append(page)
+    for route, pages in sorted(by_route.items()):
+        def largest(kind):
+            return max(page["totals"].get(kind, {}).get("transfer", 0) for page in pages) / 1024
+        lines.append(f"{route[:23]:<24}{len(pages):>6}{largest('document'):>7.0f}{largest('css'):>7.0f}"
+                     f"{largest('script'):>7.0f}{largest('image'):>7.0f}{largest('font'):>7.0f}{largest('total'):>8.0f}")
+
+    # Одна и та же находка на разных страницах выводится один раз
+    unique = {}
+    for test, kind, url, detail in results["findings"]:
+        unique.setdefault((kind, url, detail), test)
+    counts = {}
+    for kind, url, detail in unique:
+        counts[kind] = counts.get(kind, 0) + 1
+    if counts:
+        lines.append("findings: " + ", ".join(f"{kind} {count}" for kind, count in sorted(counts.items())))
+    for (kind, url, detail), test in sorted(unique.items())[:top]:
+        lines.append(f"  {kind}: {detail}  {url}")
+    if len(unique) > top:
+        lines.append(f"  ... {len(unique) - top} more")
+    return lines
@@ -0,0 +1,427 @@
+"""Долгоживущий Chrome, который переживает запуск pytest
+
+При итерациях над одним тестом (pytest -k ...) основное время уходит на
+запуск Chrome и chromedriver. С опцией --browser-daemon сессия WebDriver
+живет в отдельном фоновом процессе: первый прогон его запускает, а
+следующие подключаются к уже открытой сессии по адресу chromedriver и
+session id (без NEW_SESSION). Перед выдачей сессии демон проверяет, что
+браузер жив (упавший перезапускается), превышение памяти тоже ведет к
+перезапуску, а состояние сбрасывается как в пуле. Клиенты раз в
+HEARTBEAT_INTERVAL сообщают, что сессия используется; без них демон
+закрывает браузер и завершается через --browser-daemon-idle-timeout.
+
+Демон свой для каждого профиля браузера и воркера xdist. Сессия выдается
+в аренду процессу pytest: пока арендатор жив и присылает heartbeat, другим
+процессам демон отказывает (409), и одновременный прогон подключается к
+демону следующего номера (или запускает его). Аренда снимается при
+закрытии клиента или без heartbeat дольше LEASE_TIMEOUT. Состояние
+демонов - JSON файлы в DEFAULT_STATE_DIR:
+
+    python browser_daemon.py status
+    python browser_daemon.py stop
+"""
+import argparse
+import glob
+import hashlib
+import itertools
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import psutil
+import urllib3
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.chromium.remote_connection import ChromiumRemoteConnection
+
+import browser_profiles
+import driver_pool
+import waits
+
+
+DEFAULT_STATE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "opencart-autotest", "daemon")
+DEFAULT_IDLE_TIMEOUT = 900
+HEALTH_INTERVAL = 5.0
+HEARTBEAT_INTERVAL = 30.0
+LEASE_TIMEOUT = HEARTBEAT_INTERVAL * 2
+START_TIMEOUT = 60.0
+
+# Ошибки упавшей сессии: команда не выполнена или chromedriver не принимает соединения
+SESSION_ERRORS = (WebDriverException, urllib3.exceptions.HTTPError)
+
+
+class LeaseTaken(RuntimeError):
+    """Сессию демона арендует другой живой процесс"""
+
+
+def daemon_key(profile, network_log, worker):
+    """Имя демона: воркер и хэш профиля (имя профиля может содержать любые символы)"""
+    settings = json.dumps([profile._asdict(), network_log], sort_keys=True)
+    return f"{worker}-{hashlib.sha1(settings.encode()).hexdigest()[:10]}"
+
+
+def read_state(path):
+    """Состояние живого демона или None (файла нет или процесс завершился)"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return state if psutil.pid_exists(state["pid"]) else None
+
+
+class AttachedChrome(webdriver.Remote):
+    """WebDriver, подключенный к существующей сессии демона
+
+    quit() только закрывает соединения клиента: браузер принадлежит демону.
+    """
+
+    def __init__(self, executor_url, session_id, capabilities, chromedriver_pid):
+        self._attach_to = (session_id, capabilities)
+        self.chromedriver_pid = chromedriver_pid
+        executor = ChromiumRemoteConnection(executor_url, "goog", "chrome", keep_alive=True)
+        super().__init__(command_executor=executor, options=Options())
+
+    def start_session(self, capabilities):
+        self.session_id, self.caps = self._attach_to
+
+    def execute_cdp_cmd(self, cmd, cmd_args):
+        return self.execute("executeCdpCommand", {"cmd": cmd, "params": cmd_args})["value"]
+
+    def quit(self):
+        try:
+            self.command_executor.close()
+        except AttributeError:
+            pass
+
+
+class BrowserDaemon:
+    """Фоновый процесс с одной сессией Chrome и управляющим HTTP на localhost"""
+
+    def __init__(self, state_file, driver_path, profile, network_log=False, idle_timeout=DEFAULT_IDLE_TIMEOUT,
+                 max_memory_mb=0, window_size=(1920, 1080), implicit_wait=10):
+        self.state_file = state_file
+        self.driver_path = driver_path
+        self.profile = profile
+        self.network_log = network_log
+        self.idle_timeout = idle_timeout
+        self.max_memory_mb = max_memory_mb
+        self.window_size = tuple(window_size)
+        self.implicit_wait = implicit_wait
+        self.driver = None
+        self.main_handle = None
+        self.restarts = {}
+        self.last_activity = time.monotonic()
+        # Арендатор сессии: pid клиента и время его последнего обращения
+        self.holder = None
+        self.lease_renewed = 0.0
+        self._lock = threading.Lock()
+        self._server = None
+
+    def launch(self):
+        options = browser_profiles.chrome_options(self.profile, self.network_log)
+        self.driver = webdriver.Chrome(service=Service(self.driver_path), options=options)
+        self.driver.implicitly_wait(self.implicit_wait)
+        self.driver.set_window_size(*self.window_size)
+        waits.install(self.driver)
+        self.main_handle = self.driver.current_window_handle
+
+    def restart(self, reason):
+        self.restarts[reason] = self.restarts.get(reason, 0) + 1
+        print(f"restarting browser: {reason}", flush=True)
+        try:
+            self.driver.quit()
+        except SESSION_ERRORS:
+            pass
+        self.launch()
+
+    def healthy(self):
+        try:
+            return self.main_handle in self.driver.window_handles
+        except SESSION_ERRORS:
+            return False
+
+    def _leased_to_other(self, client):
+        if self.holder is None or self.holder == client:
+            return False
+        return psutil.pid_exists(self.holder) and time.monotonic() - self.lease_renewed < LEASE_TIMEOUT
+
+    def session(self, client):
+        """Аренда, проверка здоровья, сброс состояния и адрес сессии для клиента"""
+        with self._lock:
+            if self._leased_to_other(client):
+                raise LeaseTaken(f"session is leased to pid {self.holder}")
+            self.holder = client
+            self.last_activity = self.lease_renewed = time.monotonic()
+            if not self.healthy():
+                self.restart("crashed")
+            elif self.max_memory_mb and driver_pool.memory_mb(self.driver) > self.max_memory_mb:
+                self.restart("memory")
+            try:
+                driver_pool.reset_driver(self.driver, self.main_handle, self.window_size)
+            except SESSION_ERRORS:
+                self.restart("reset_failed")
+            return {
+                "executor_url": self.driver.command_executor._url,
+                "session_id": self.driver.session_id,
+                "capabilities": self.driver.caps,
+                "chromedriver_pid": self.driver.service.process.pid,
+                "restarts": self.restarts,
+            }
+
+    def ping(self, client):
+        with self._lock:
+            self.last_activity = time.monotonic()
+            if self.holder == client:
+                self.lease_renewed = self.last_activity
+
+    def release(self, client):
+        with self._lock:
+            self.last_activity = time.monotonic()
+            if self.holder == client:
+                self.holder = None
+
+    def _write_state(self, control_url):
+        state = {"pid": os.getpid(), "control_url": control_url, "profile": self.profile.name,
+                 "network_log": self.network_log, "started": time.strftime("%Y-%m-%dT%H:%M:%S")}
+        tmp = self.state_file + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp, self.state_file)
+
+    def serve(self):
+        """Запуск браузера и управляющего сервера; возвращается после простоя или /shutdown"""
+        self.launch()
+        daemon = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                client = json.loads(self.rfile.read(length) or b"{}").get("client")
+                if self.path == "/session":
+                    try:
+                        body = json.dumps(daemon.session(client)).encode()
+                    except LeaseTaken as e:
+                        self.send_error(409, str(e))
+                        return
+                elif self.path == "/ping":
+                    daemon.ping(client)
+                    body = b"{}"
+                elif self.path == "/release":
+                    daemon.release(client)
+                    body = b"{}"
+                elif self.path == "/shutdown":
+                    body = b"{}"
+                    threading.Thread(target=daemon._server.shutdown, daemon=True).start()
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self._watch, daemon=True).start()
+        self._write_state(f"http://127.0.0.1:{self._server.server_address[1]}")
+        print(f"browser daemon {os.getpid()} serving {self.profile.name}", flush=True)
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            if os.path.exists(self.state_file):
+                os.remove(self.state_file)
+            try:
+                self.driver.quit()
+            except SESSION_ERRORS:
+                pass
+
+    def _watch(self):
+        """Простой - завершение; без клиентов - проверка, что браузер жив"""
+        while True:
+            time.sleep(HEALTH_INTERVAL)
+            idle = time.monotonic() - self.last_activity
+            if idle > self.idle_timeout:
+                print(f"idle for {idle:.0f}s, shutting down", flush=True)
+                self._server.shutdown()
+                return
+            # Пока клиент подключен, сессию не трогаем: его команды важнее проверки
+            if idle > HEARTBEAT_INTERVAL * 2:
+                with self._lock:
+                    if not self.healthy():
+                        self.restart("crashed")
+
+
+class DaemonClient:
+    """Подключение pytest к демонам: запуск при первом обращении и heartbeat"""
+
+    def __init__(self, worker, driver_path, state_dir=DEFAULT_STATE_DIR, idle_timeout=DEFAULT_IDLE_TIMEOUT,
+                 max_memory_mb=0, window_size=(1920, 1080)):
+        self.worker = worker
+        # Поиск драйвера нужен только для запуска демона: callable, чтобы не платить за него при подключении
+        self.driver_path = driver_path
+        self.state_dir = state_dir
+        self.idle_timeout = idle_timeout
+        self.max_memory_mb = max_memory_mb
+        self.window_size = window_size
+        self.http = urllib3.PoolManager()
+        self.spawned = 0
+        self._controls = set()
+        self._stop = threading.Event()
+        self._heartbeat = None
+
+    def _post(self, control_url, path, timeout=120):
+        response = self.http.request("POST", control_url + path, body=json.dumps({"client": os.getpid()}),
+                                     headers={"Content-Type": "application/json"}, timeout=timeout, retries=False)
+        if response.status == 409:
+            raise LeaseTaken(f"Browser daemon {control_url} is in use by another pytest process")
+        if response.status != 200:
+            raise RuntimeError(f"Browser daemon {control_url} answered {response.status} to {path}")
+        return json.loads(response.data)
+
+    def _spawn(self, path, profile, network_log):
+        """Запускает демон отдельным процессом и ждет файл состояния"""
+        lock = path + ".lock"
+        try:
+            fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            os.close(fd)
+        except FileExistsError:
+            # Зависший замок старше START_TIMEOUT снимается, и демон запускается заново
+            try:
+                stale = time.time() - os.path.getmtime(lock) > START_TIMEOUT
+            except FileNotFoundError:
+                stale = True
+            if stale:
+                try:
+                    os.remove(lock)
+                except FileNotFoundError:
+                    pass
+                return read_state(path) or self._spawn(path, profile, network_log)
+            # Демон уже запускает другой процесс
+            return self._wait_for_state(path, None)
+
+        log_path = path.replace(".json", ".log")
+        args = [sys.executable, os.path.abspath(__file__), "serve", "--state", path,
+                "--driver-path", self.driver_path(), "--profile", json.dumps(profile._asdict()),
+                "--idle-timeout", str(self.idle_timeout), "--max-memory-mb", str(self.max_memory_mb),
+                "--window-size", f"{self.window_size[0]}x{self.window_size[1]}"]
+        if network_log:
+            args.append("--network-log")
+        detach = ({"creationflags": subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP}
+                  if sys.platform == "win32" else {"start_new_session": True})
+        try:
+            with open(log_path, "a", encoding="utf-8") as log:
+                process = subprocess.Popen(args, stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT,
+                                           cwd=os.path.dirname(os.path.abspath(__file__)), **detach)
+            self.spawned += 1
+            return self._wait_for_state(path, process, log_path)
+        finally:
+            os.remove(lock)
+
+    def _wait_for_state(self, path, process, log_path=None):
+        deadline = time.monotonic() + START_TIMEOUT
+        while time.monotonic() < deadline:
+            state = read_state(path)
+            if state:
+                return state
+            if process is not None and process.poll() is not None:
+                with open(log_path, encoding="utf-8", errors="replace") as f:
+                    tail = f.read()[-2000:]
+                raise RuntimeError(f"Browser daemon exited with code {process.returncode}:\n{tail}")
+            time.sleep(0.1)
+        raise RuntimeError(f"Browser daemon did not start within {START_TIMEOUT:.0f}s, see {path}")
+
+    def attach(self, profile, network_log=False):
+        """Сессия демона профиля; демон запускается, если его еще нет
+
+        Если демон занят другим прогоном, берется следующий по номеру.
+        """
+        os.makedirs(self.state_dir, exist_ok=True)
+        key = daemon_key(profile, network_log, self.worker)
+        for slot in itertools.count():
+            path = os.path.join(self.state_dir, (f"{key}-{slot}" if slot else key) + ".json")
+            state = read_state(path) or self._spawn(path, profile, network_log)
+            try:
+                info = self._post(state["control_url"], "/session")
+            except LeaseTaken:
+                continue
+            break
+        self._controls.add(state["control_url"])
+        if self._heartbeat is None:
+            self._heartbeat = threading.Thread(target=self._beat, name="browser-daemon-heartbeat", daemon=True)
+            self._heartbeat.start()
+        return AttachedChrome(info["executor_url"], info["session_id"], info["capabilities"],
+                              info["chromedriver_pid"])
+
+    def _beat(self):
+        while not self._stop.wait(HEARTBEAT_INTERVAL):
+            for control_url in list(self._controls):
+                try:
+                    self._post(control_url, "/ping", timeout=5)
+                except (urllib3.exceptions.HTTPError, RuntimeError):
+                    self._controls.discard(control_url)
+
+    def close(self):
+        """Снятие аренды: отсчет простоя демонов начинается с конца прогона"""
+        self._stop.set()
+        for control_url in self._controls:
+            try:
+                self._post(control_url, "/release", timeout=5)
+            except (urllib3.exceptions.HTTPError, RuntimeError):
+                pass
+        self.http.clear()
+
+
+def _states(state_dir):
+    for path in sorted(glob.glob(os.path.join(state_dir, "*.json"))):
+        yield path, read_state(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Long-lived Chrome sessions reused across pytest runs")
+    parser.add_argument("--state-dir", default=DEFAULT_STATE_DIR)
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("status", help="list running browser daemons")
+    commands.add_parser("stop", help="stop all browser daemons")
+    serve = commands.add_parser("serve", help="run a daemon (started by pytest --browser-daemon)")
+    serve.add_argument("--state", required=True)
+    serve.add_argument("--driver-path", required=True)
+    serve.add_argument("--profile", required=True, help="browser profile fields as JSON")
+    serve.add_argument("--network-log", action="store_true")
+    serve.add_argument("--idle-timeout", type=float, default=DEFAULT_IDLE_TIMEOUT)
+    serve.add_argument("--max-memory-mb", type=int, default=0)
+    serve.add_argument("--window-size", default="1920x1080")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        profile = browser_profiles.BrowserProfile(**json.loads(args.profile))
+        width, height = (int(value) for value in args.window_size.split("x"))
+        BrowserDaemon(args.state, args.driver_path, profile, args.network_log, args.idle_timeout,
+                      args.max_memory_mb, (width, height)).serve()
+        return 0
+
+    http = urllib3.PoolManager()
+    for path, state in _states(args.state_dir):
+        if state is None:
+            os.remove(path)
+            continue
+        if args.command == "status":
+            print(f"{state['pid']:>7}  {state['profile']}  started {state['started']}  {state['control_url']}")
+        else:
+            http.request("POST", state["control_url"] + "/shutdown", timeout=10, retries=False)
+            print(f"stopped {state['pid']} ({state['profile']})")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
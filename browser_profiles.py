@@ -0,0 +1,122 @@
+"""Именованные профили запуска Chrome
+
+Профиль задает режим headless, стратегию загрузки страницы и отключаемые
+возможности браузера. Профиль прогона выбирается опцией --browser-profile
+(и уточняется опциями --headless, --page-load-strategy, --disable-images),
+а тест может потребовать свой профиль маркером:
+
+    @pytest.mark.browser_profile("default")
+
+Режим headless всегда берется из профиля прогона: это свойство окружения
+(есть ли дисплей), а не требование теста.
+"""
+import atexit
+import os
+import shutil
+import tempfile
+from collections import namedtuple
+
+from selenium.webdriver.chrome.options import Options
+
+
+BASE_ARGUMENTS = [
+    "--no-sandbox",
+    "--disable-dev-shm-usage",
+    "--disable-gpu",
+    "--window-size=1920,1080",
+    "--disable-web-security",
+    "--allow-running-insecure-content",
+    # Фоновые вкладки не притормаживаются: проверки устройств грузят страницы в них одновременно
+    "--disable-background-timer-throttling",
+    "--disable-backgrounding-occluded-windows",
+    "--disable-renderer-backgrounding",
+]
+
+PAGE_LOAD_STRATEGIES = ("normal", "eager", "none")
+
+BrowserProfile = namedtuple(
+    "BrowserProfile",
+    "name headless page_load_strategy disable_images disable_extensions "
+    "disable_background_networking shm_profile")
+
+PROFILES = {
+    # Исходные настройки conftest.py: окно, полная загрузка страницы
+    "default": BrowserProfile("default", False, "normal", False, False, False, False),
+    "headless": BrowserProfile("headless", True, "normal", False, False, False, False),
+    # Без картинок, расширений и фоновых запросов; driver.get ждет только DOMContentLoaded
+    "lean": BrowserProfile("lean", False, "eager", True, True, True, False),
+    # lean + headless + профиль браузера в разделяемой памяти
+    "fast": BrowserProfile("fast", True, "eager", True, True, True, True),
+}
+
+_shm_root = None
+
+
+def from_options(config):
+    """Профиль прогона: --browser-profile с учетом уточняющих опций"""
+    profile = PROFILES[config.getoption("browser_profile")]
+    overrides = {}
+    if config.getoption("headless"):
+        overrides["headless"] = True
+    if config.getoption("page_load_strategy"):
+        overrides["page_load_strategy"] = config.getoption("page_load_strategy")
+    if config.getoption("disable_images"):
+        overrides["disable_images"] = True
+    return with_overrides(profile, **overrides)
+
+
+def with_overrides(profile, **overrides):
+    """Копия профиля с измененными полями; имя отражает изменения"""
+    changed = {field: value for field, value in overrides.items() if getattr(profile, field) != value}
+    if not changed:
+        return profile
+    suffix = ",".join(f"{field}={value}" for field, value in sorted(changed.items()))
+    return profile._replace(name=f"{profile.name}[{suffix}]", **changed)
+
+
+def for_item(item, session_profile):
+    """Профиль для теста: из маркера browser_profile или профиль прогона"""
+    marker = item.get_closest_marker("browser_profile")
+    if marker is None:
+        return session_profile
+    return with_overrides(PROFILES[marker.args[0]], headless=session_profile.headless)
+
+
+def _shm_user_data_dir():
+    """Каталог профиля браузера в /dev/shm; без tmpfs - обычный временный каталог"""
+    global _shm_root
+    if _shm_root is None:
+        base = "/dev/shm" if os.path.isdir("/dev/shm") else None
+        _shm_root = tempfile.mkdtemp(prefix="opencart-autotest-", dir=base)
+        atexit.register(shutil.rmtree, _shm_root, ignore_errors=True)
+    return tempfile.mkdtemp(dir=_shm_root)
+
+
+def chrome_options(profile, network_log=False):
+    """Options для Chrome по профилю; network_log включает журнал сетевых событий CDP"""
+    options = Options()
+    for argument in BASE_ARGUMENTS:
+        options.add_argument(argument)
+
+    if profile.headless:
+        options.add_argument("--headless=new")
+    options.page_load_strategy = profile.page_load_strategy
+    if profile.disable_images:
+        options.add_experimental_option("prefs", {"profile.managed_default_content_settings.images": 2})
+    if profile.disable_extensions:
+        options.add_argument("--disable-extensions")
+    if profile.disable_background_networking:
+        options.add_argument("--disable-background-networking")
+        options.add_argument("--disable-component-update")
+        options.add_argument("--disable-sync")
+        options.add_argument("--no-first-run")
+    if profile.shm_profile:
+        options.add_argument(f"--user-data-dir={_shm_user_data_dir()}")
+    # Консоль копится в chromedriver и читается только для упавших тестов, см. artifacts.py
+    logging_prefs = {"browser": "ALL"}
+    if network_log:
+        # Журнал читается через driver.get_log("performance"), см. network_policy.py
+        logging_prefs["performance"] = "ALL"
+        options.add_experimental_option("perfLoggingPrefs", {"enableNetwork": True, "enablePage": False})
+    options.set_capability("goog:loggingPrefs", logging_prefs)
+    return options
@@ -0,0 +1,121 @@
+"""Замеры загрузки страниц с холодным и прогретым кэшем браузера
+
+Замер идет в отдельной сессии Chrome со свежим профилем, а не в сессии
+из пула, которую предыдущие тесты уже прогрели. Перед холодной загрузкой
+кэш и cookies очищаются через CDP, а сама загрузка идет с отключенным
+кэшем (Network.setCacheDisabled): ответы при этом все равно сохраняются
+в кэш. Следующая загрузка той же страницы - прогретая. Пара повторяется
+N раз, распределения сравниваются рядом: разница между ними - вклад
+кэширования на фронтенде, а холодный TTFB - задержка сервера.
+"""
+import json
+import os
+
+import perf_metrics
+import perf_stats
+import waits
+
+
+MODES = ("cold", "warm")
+
+TARGETS = {
+    "common/home": "",
+    "product/search": "index.php?route=product/search&search=iphone",
+    "product/category": "index.php?route=product/category&path=20",
+    "product/product": "index.php?route=product/product&product_id=40",
+    "information/contact": "index.php?route=information/contact",
+}
+
+METRICS = ("ttfb", "dom_content_loaded", "load", "fcp", "lcp", "transfer_bytes", "resource_count")
+
+
+def parse_targets(value):
+    """'all' или маршруты из TARGETS через запятую"""
+    if value == "all":
+        return list(TARGETS)
+    routes = [route.strip() for route in value.split(",") if route.strip()]
+    unknown = [route for route in routes if route not in TARGETS]
+    if unknown:
+        raise ValueError(f"Unknown cache measurement targets: {', '.join(unknown)}; known: {', '.join(TARGETS)}")
+    return routes
+
+
+class CacheMeasurement:
+    """Пары холодной и прогретой загрузки в одной сессии со свежим профилем"""
+
+    def __init__(self, driver, base_url, test=None):
+        self.driver = driver
+        self.base_url = base_url.rstrip("/") + "/"
+        self.test = test
+        self.samples = []
+        driver.execute_cdp_cmd("Network.enable", {})
+
+    def _load(self, url):
+        # about:blank между загрузками: текущий документ не держит ресурсы в memory cache
+        self.driver.get("about:blank")
+        self.driver.get(url)
+        waits.until(self.driver, lambda d: d.execute_script(perf_metrics.LOAD_EVENT_JS), "load_event")
+        return self.driver.execute_script(perf_metrics.METRICS_JS)
+
+    def cold(self, url):
+        self.driver.execute_cdp_cmd("Network.clearBrowserCache", {})
+        self.driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+        self.driver.execute_cdp_cmd("Network.setCacheDisabled", {"cacheDisabled": True})
+        try:
+            return self._load(url)
+        finally:
+            self.driver.execute_cdp_cmd("Network.setCacheDisabled", {"cacheDisabled": False})
+
+    def warm(self, url):
+        return self._load(url)
+
+    def measure(self, route, runs=3):
+        """runs пар холодная/прогретая загрузка страницы маршрута; возвращает их метрики"""
+        url = self.base_url + TARGETS.get(route, route)
+        measured = []
+        for run in range(runs):
+            for mode, load in (("cold", self.cold), ("warm", self.warm)):
+                metrics = load(url) or {}
+                sample = {"test": self.test, "route": route, "mode": mode, "run": run}
+                sample.update({name: metrics.get(name) for name in METRICS})
+                measured.append(sample)
+        self.samples.extend(measured)
+        return measured
+
+
+def medians(samples, route, mode):
+    """Медианы метрик маршрута в режиме mode - в формате метрик страницы для бюджетов"""
+    values = {"route": route}
+    for name in METRICS:
+        values[name] = perf_stats.median([sample[name] for sample in samples
+                                          if sample["route"] == route and sample["mode"] == mode
+                                          and sample[name] is not None])
+    return values
+
+
+def write_results(path, samples):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"samples": samples}, f, ensure_ascii=False, indent=2)
+
+
+def summary_lines(samples):
+    """Холодные и прогретые распределения рядом: медиана и p95 по каждой метрике"""
+    lines = [f"{'route':<22}{'metric':<20}{'cold p50':>10}{'cold p95':>10}{'warm p50':>10}{'warm p95':>10}{'saved':>8}"]
+    for route in sorted({sample["route"] for sample in samples}):
+        runs = len({sample["run"] for sample in samples if sample["route"] == route})
+        for name in METRICS:
+            stats = {}
+            for mode in MODES:
+                values = [sample[name] for sample in samples
+                          if sample["route"] == route and sample["mode"] == mode and sample[name] is not None]
+                stats[mode] = (perf_stats.median(values), perf_stats.percentile(values, 95))
+            (cold, cold95), (warm, warm95) = stats["cold"], stats["warm"]
+            if cold is None or warm is None:
+                continue
+            scale = 1024 if name == "transfer_bytes" else 1
+            saved = f"{(1 - warm / cold) * 100:.0f}%" if cold else "-"
+            lines.append(f"{route[:21]:<22}{name + (' KiB' if scale > 1 else ''):<20}{cold / scale:>10.0f}"
+                         f"{cold95 / scale:>10.0f}{warm / scale:>10.0f}{warm95 / scale:>10.0f}{saved:>8}")
+        lines.append(f"{'':<22}({runs} runs)")
+    return lines
@@ -0,0 +1,209 @@
+"""Профилировщик команд WebDriver, явных ожиданий и time.sleep
+
+Каждая команда сессии (через driver_hooks) записывается с типом, локатором,
+длительностью и признаком срабатывания implicit wait. WebDriverWait.until
+и time.sleep оборачиваются на время прогона, поэтому команды внутри
+ожиданий и паузы опроса попадают во вложенные кадры. Хранятся только
+агрегаты, так что профилировщик можно не выключать в CI.
+
+Экспорт в формате folded stacks ("тест;кадр;команда микросекунды")
+открывается flamegraph.pl, speedscope и inferno.
+"""
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+from selenium.common.exceptions import NoSuchElementException
+from selenium.webdriver.remote.command import Command
+from selenium.webdriver.support.wait import WebDriverWait
+
+import driver_hooks
+
+
+FIND_COMMANDS = {
+    Command.FIND_ELEMENT,
+    Command.FIND_ELEMENTS,
+    Command.FIND_CHILD_ELEMENT,
+    Command.FIND_CHILD_ELEMENTS,
+}
+
+# Поиск дольше этой доли implicit wait считается дождавшимся таймаута
+IMPLICIT_WAIT_SHARE = 0.9
+
+NO_TEST = "<session>"
+
+
+class CommandProfiler:
+    """Агрегаты по тестам, типам команд и локаторам плюс folded stacks"""
+
+    def __init__(self, implicit_wait=10):
+        self.implicit_wait = implicit_wait
+        self.current_test = None
+        self.folded = defaultdict(float)
+        self.by_kind = defaultdict(lambda: [0, 0.0, 0])
+        self.by_test = defaultdict(lambda: defaultdict(lambda: [0, 0.0]))
+        self.by_locator = defaultdict(lambda: [0, 0.0, 0])
+        self._local = threading.local()
+        self._originals = None
+
+    # --- кадры ---
+
+    def _frames(self):
+        if not hasattr(self._local, "frames"):
+            self._local.frames = []
+        return self._local.frames
+
+    def _path(self, name):
+        return ";".join([self.current_test or NO_TEST] + [frame[0] for frame in self._frames()] + [name])
+
+    def _leaf(self, kind, duration, locator=None, implicit_hit=False):
+        self.folded[self._path(kind)] += duration
+        frames = self._frames()
+        if frames:
+            frames[-1][1] += duration
+
+        stats = self.by_kind[kind]
+        stats[0] += 1
+        stats[1] += duration
+        stats[2] += implicit_hit
+        test_stats = self.by_test[self.current_test or NO_TEST][kind]
+        test_stats[0] += 1
+        test_stats[1] += duration
+        if locator:
+            locator_stats = self.by_locator[f"{kind} {locator}"]
+            locator_stats[0] += 1
+            locator_stats[1] += duration
+            locator_stats[2] += implicit_hit
+
+    def _timed_frame(self, name, func, *args, **kwargs):
+        """Вызов func как вложенного кадра: собственное время = общее - дочерние"""
+        frames = self._frames()
+        frame = [name, 0.0]
+        path = self._path(name)
+        frames.append(frame)
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            total = time.perf_counter() - start
+            frames.pop()
+            self.folded[path] += max(total - frame[1], 0.0)
+            if frames:
+                frames[-1][1] += total
+            stats = self.by_kind[name]
+            stats[0] += 1
+            stats[1] += total
+            test_stats = self.by_test[self.current_test or NO_TEST][name]
+            test_stats[0] += 1
+            test_stats[1] += total
+
+    # --- подключение ---
+
+    def install(self):
+        """Оборачивает time.sleep и WebDriverWait.until/until_not на время прогона"""
+        profiler = self
+        sleep, until, until_not = time.sleep, WebDriverWait.until, WebDriverWait.until_not
+        self._originals = (sleep, until, until_not)
+
+        def profiled_sleep(seconds):
+            if threading.current_thread() is not threading.main_thread():
+                return sleep(seconds)
+            start = time.perf_counter()
+            try:
+                return sleep(seconds)
+            finally:
+                profiler._leaf("time.sleep", time.perf_counter() - start)
+
+        def profiled_until(wait, method, message=""):
+            return profiler._timed_frame("WebDriverWait.until", until, wait, method, message)
+
+        def profiled_until_not(wait, method, message=""):
+            return profiler._timed_frame("WebDriverWait.until_not", until_not, wait, method, message)
+
+        time.sleep = profiled_sleep
+        WebDriverWait.until = profiled_until
+        WebDriverWait.until_not = profiled_until_not
+
+    def uninstall(self):
+        if self._originals:
+            time.sleep, WebDriverWait.until, WebDriverWait.until_not = self._originals
+            self._originals = None
+
+    def attach(self, driver):
+        """Записывает команды сессии; возвращает функцию отключения"""
+        hooks = driver_hooks.hooks(driver)
+
+        def after(command, params, duration, error):
+            locator = None
+            implicit_hit = False
+            if command in FIND_COMMANDS and params:
+                locator = f"{params.get('using')}={params.get('value')}"
+                implicit_hit = (duration >= self.implicit_wait * IMPLICIT_WAIT_SHARE
+                                and (error is None or isinstance(error, NoSuchElementException)))
+            self._leaf(command, duration, locator, implicit_hit)
+
+        hooks.after.append(after)
+        return lambda: hooks.after.remove(after)
+
+    # --- результаты ---
+
+    def as_dict(self):
+        return {
+            "folded": dict(self.folded),
+            "by_kind": {kind: list(stats) for kind, stats in self.by_kind.items()},
+            "by_test": {test: {kind: list(stats) for kind, stats in kinds.items()}
+                        for test, kinds in self.by_test.items()},
+            "by_locator": {locator: list(stats) for locator, stats in self.by_locator.items()},
+        }
+
+    def merge(self, data):
+        """Добавляет агрегаты другого процесса (воркера xdist)"""
+        for path, seconds in data["folded"].items():
+            self.folded[path] += seconds
+        for kind, (count, total, hits) in data["by_kind"].items():
+            stats = self.by_kind[kind]
+            stats[0] += count
+            stats[1] += total
+            stats[2] += hits
+        for test, kinds in data["by_test"].items():
+            for kind, (count, total) in kinds.items():
+                stats = self.by_test[test][kind]
+                stats[0] += count
+                stats[1] += total
+        for locator, (count, total, hits) in data["by_locator"].items():
+            stats = self.by_locator[locator]
+            stats[0] += count
+            stats[1] += total
+            stats[2] += hits
+
+    def write(self, directory):
+        """command_profile.folded (flame graph) и command_profile.json (разбивки)"""
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, "command_profile.folded"), "w", encoding="utf-8") as f:
+            for path, seconds in sorted(self.folded.items()):
+                microseconds = int(seconds * 1_000_000)
+                if microseconds > 0:
+                    f.write(f"{path} {microseconds}\n")
+        with open(os.path.join(directory, "command_profile.json"), "w", encoding="utf-8") as f:
+            json.dump(self.as_dict(), f, ensure_ascii=False, indent=2)
+
+    def summary_lines(self, top=10):
+        lines = [f"{'command':<26}{'calls':>7}{'total, s':>10}{'avg, ms':>9}{'implicit':>10}"]
+        for kind, (count, total, hits) in sorted(self.by_kind.items(), key=lambda item: -item[1][1]):
+            lines.append(f"{kind[:25]:<26}{count:>7}{total:>10.2f}{total / count * 1000:>9.1f}{hits:>10}")
+
+        lines.append("slowest tests by command and sleep time:")
+        totals = {test: sum(stats[1] for kind, stats in kinds.items() if kind not in ("WebDriverWait.until",
+                                                                                     "WebDriverWait.until_not"))
+                  for test, kinds in self.by_test.items()}
+        for test, total in sorted(totals.items(), key=lambda item: -item[1])[:top]:
+            lines.append(f"  {total:>7.2f}s  {test}")
+
+        hits = [(locator, stats) for locator, stats in self.by_locator.items() if stats[2]]
+        if hits:
+            lines.append("locators that waited out the implicit wait:")
+            for locator, (count, total, implicit) in sorted(hits, key=lambda item: -item[1][1])[:top]:
+                lines.append(f"  {implicit}x {total:.2f}s  {locator}")
+        return lines
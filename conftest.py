@@ -1,56 +1,879 @@
 import pytest
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
+from pytest_html import extras as html_extras
+import html
 import os
+import time
+
+import artifacts
+import asset_audit
+import browser_daemon
+import browser_profiles
+import cache_modes
+import command_profiler
+import dom_batch
+import driver_resolver
+import http_probe
+import incremental
+import load_mode
+import memory_monitor
+import network_policy
+import parallel
+import perf_baseline
+import perf_metrics
+import preflight
+import responsive
+import scheduling
+import standin_server
+import waits
+from driver_pool import PoolRegistry, PoolStats
+from locators import LocatorRegistry
+
+
+WINDOW_SIZE = (1920, 1080)
+IMPLICIT_WAIT = 10
+
+
+def create_driver(driver_path, profile, network_log=False):
+    """Запуск Chrome с настройками профиля (см. browser_profiles.py)"""
+    chrome_options = browser_profiles.chrome_options(profile, network_log)
+
+    start = time.perf_counter()
+    service = Service(driver_path)
+    driver = webdriver.Chrome(service=service, options=chrome_options)
+    driver_resolver.startup.launches.append(time.perf_counter() - start)
+
+    driver.implicitly_wait(IMPLICIT_WAIT)
+    # Фиксированный размер вместо maximize_window(): не зависит от экрана воркера
+    driver.set_window_size(*WINDOW_SIZE)
+    waits.install(driver)
+    driver_resolver.time_first_navigation(driver)
+
+    return driver
+
+
+def attach_driver(daemons, profile, network_log=False):
+    """Сессия фонового демона (см. browser_daemon.py) вместо запуска Chrome"""
+    start = time.perf_counter()
+    driver = daemons.attach(profile, network_log)
+    driver_resolver.startup.attaches.append(time.perf_counter() - start)
+
+    driver.implicitly_wait(IMPLICIT_WAIT)
+    driver_resolver.time_first_navigation(driver)
+
+    return driver
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("autotest", "OpenCart autotests")
+    group.addoption("--base-url", default="http://localhost",
+                    help="OpenCart storefront URL (default: http://localhost)")
+    group.addoption("--no-preflight", action="store_true",
+                    help="skip the storefront health check before the run")
+    group.addoption("--preflight-timeout", type=float, default=30.0,
+                    help="seconds to wait for OpenCart to come up before aborting (default: 30)")
+    group.addoption("--standin", action="store_true",
+                    help="run against the local stand-in storefront built from recorded snapshots instead of --base-url")
+    group.addoption("--standin-snapshots", default=standin_server.DEFAULT_SNAPSHOT_DIR,
+                    help="snapshot directory of the stand-in storefront (default: snapshots)")
+    group.addoption("--standin-network", default="none", choices=sorted(standin_server.NETWORK_PROFILES),
+                    help="latency and bandwidth profile of the stand-in storefront (default: none)")
+    group.addoption("--incremental", action="store_true",
+                    help="skip tests whose pages match the fingerprints of their last passing run")
+    group.addoption("--browser-profile", default="default", choices=sorted(browser_profiles.PROFILES),
+                    help="named Chrome launch profile (default: default)")
+    group.addoption("--headless", action="store_true",
+                    help="run Chrome headless regardless of the profile")
+    group.addoption("--page-load-strategy", choices=browser_profiles.PAGE_LOAD_STRATEGIES,
+                    help="override the page load strategy of the profile")
+    group.addoption("--disable-images", action="store_true",
+                    help="do not load images regardless of the profile")
+    group.addoption("--network-policy", default="none", choices=sorted(network_policy.POLICIES),
+                    help="block requests by URL pattern or off-origin via CDP; tests override it with the "
+                         "network_policy marker (default: none)")
+    group.addoption("--perf-budgets", default=None,
+                    help="per-route performance budgets JSON (default: perf_budgets.json in the rootdir)")
+    group.addoption("--perf-metrics-file", default=os.path.join("reports", "perf_metrics.json"),
+                    help="where to write page load metrics of the run (default: reports/perf_metrics.json)")
+    group.addoption("--perf-history", default=os.path.join("reports", "perf_history.jsonl"),
+                    help="JSON-lines history of test durations and page metrics (default: reports/perf_history.jsonl)")
+    group.addoption("--perf-regressions", default="warn", choices=("off", "warn", "fail"),
+                    help="compare the run with the rolling baseline and warn or fail on slowdowns (default: warn)")
+    group.addoption("--perf-baseline-runs", type=int, default=10,
+                    help="number of previous runs in the rolling baseline (default: 10)")
+    group.addoption("--asset-audit", default="warn", choices=("off", "warn", "fail"),
+                    help="audit page assets (weight, image sizes, compression, caching) and warn or fail (default: warn)")
+    group.addoption("--asset-thresholds", default=None,
+                    help="asset audit thresholds JSON over the defaults in asset_thresholds.json")
+    group.addoption("--asset-audit-third-party", action="store_true",
+                    help="also send cache header HEAD requests to third-party hosts (default: store host only)")
+    group.addoption("--asset-audit-file", default=os.path.join("reports", "asset_audit.json"),
+                    help="where to write the asset audit (default: reports/asset_audit.json)")
+    group.addoption("--memory-check", default="warn", choices=("off", "warn", "fail"),
+                    help="sample browser memory and DOM size around each test and warn or fail on growth "
+                         "over the thresholds (default: warn)")
+    group.addoption("--memory-gc", action="store_true",
+                    help="force JS garbage collection before each memory sample to tell leaks from garbage")
+    group.addoption("--memory-thresholds", default=None,
+                    help="per-test memory growth thresholds JSON (default: memory_thresholds.json in the rootdir)")
+    group.addoption("--memory-file", default=os.path.join("reports", "memory.json"),
+                    help="where to write per-test memory samples (default: reports/memory.json)")
+    group.addoption("--artifacts", default="on-failure", choices=("on-failure", "off"),
+                    help="capture a screenshot, the DOM and recent console and network events of failed tests "
+                         "(default: on-failure)")
+    group.addoption("--artifacts-dir", default=os.path.join("reports", "artifacts"),
+                    help="where to write failure artifacts (default: reports/artifacts)")
+    group.addoption("--artifact-log-size", type=int, default=artifacts.DEFAULT_LOG_SIZE,
+                    help="console messages and network events kept for a failed test (default: 200)")
+    group.addoption("--cache-runs", type=int, default=3,
+                    help="cold/warm page load pairs per target in the cache measurement (default: 3)")
+    group.addoption("--cache-targets", default="common/home",
+                    help=f"routes measured cold and warm: 'all' or a comma list of {', '.join(cache_modes.TARGETS)}")
+    group.addoption("--cache-modes-file", default=os.path.join("reports", "cache_modes.json"),
+                    help="where to write cold and warm cache samples (default: reports/cache_modes.json)")
+    group.addoption("--devices", default=responsive.DEFAULT_DEVICES,
+                    help=f"devices of the responsive checks: 'all' or a comma list of {', '.join(responsive.DEVICES)}")
+    group.addoption("--device-tabs", type=int, default=8,
+                    help="devices rendered at once, one browser tab each (default: 8)")
+    group.addoption("--viewports-file", default=os.path.join("reports", "viewports.json"),
+                    help="where to write per-device layout and load results (default: reports/viewports.json)")
+    group.addoption("--pool-size", type=int, default=1,
+                    help="pre-warmed Chrome sessions per worker (default: 1)")
+    group.addoption("--pool-max-uses", type=int, default=0,
+                    help="recycle a session after this many tests (default: 0, unlimited)")
+    group.addoption("--pool-max-memory-mb", type=int, default=1024,
+                    help="recycle a session when browser RSS exceeds this many MB (default: 1024, 0 disables)")
+    group.addoption("--browser-daemon", action="store_true",
+                    help="reuse a long-lived background Chrome across pytest runs instead of launching one per run")
+    group.addoption("--browser-daemon-idle-timeout", type=float, default=browser_daemon.DEFAULT_IDLE_TIMEOUT,
+                    help="seconds without pytest runs before the browser daemon shuts down (default: 900)")
+    group.addoption("--driver-download", action="store_true",
+                    help="allow downloading ChromeDriver when it is not in the cache or PATH")
+    group.addoption("--driver-cache-dir", default=driver_resolver.DEFAULT_CACHE_DIR,
+                    help="ChromeDriver cache directory, keyed by Chrome major version")
+    group.addoption("--schedule", default="duration", choices=("duration", "off"),
+                    help="with xdist, spread tests over workers longest-first using the duration history (default: duration)")
+    group.addoption("--no-command-profile", action="store_true",
+                    help="do not profile WebDriver commands, explicit waits and sleeps")
+    group.addoption("--command-profile-dir", default="reports",
+                    help="where to write command_profile.folded and command_profile.json (default: reports)")
 
 
 @pytest.fixture(scope="session")
-def driver():
-    """Настройка WebDriver для всех тестов"""
-    chrome_options = Options()
-    chrome_options.add_argument("--no-sandbox")
-    chrome_options.add_argument("--disable-dev-shm-usage")
-    chrome_options.add_argument("--disable-gpu")
-    chrome_options.add_argument("--window-size=1920,1080")
-    chrome_options.add_argument("--disable-web-security")
-    chrome_options.add_argument("--allow-running-insecure-content")
-
-    # Для запуска в headless режиме раскомментируйте следующую строку:
-    # chrome_options.add_argument("--headless")
+def driver_pools(request):
+    """Пулы сессий Chrome по профилям на процесс: на весь прогон или на воркер pytest-xdist"""
+    config = request.config
+    resolved = []
+
+    def driver_path():
+        """ChromeDriver ищется при первом запуске браузера: к демону подключаемся без поиска"""
+        if not resolved:
+            resolution = driver_resolver.resolve(config.getoption("driver_cache_dir"),
+                                                 config.getoption("driver_download"))
+            print(f"ChromeDriver path: {resolution.path} ({resolution.source})")
+            resolved.append(resolution.path)
+        return resolved[0]
 
+    config._launch_driver = lambda profile: create_driver(driver_path(), profile, config._network_log)
+    pool_options = {
+        "size": config.getoption("pool_size"),
+        "max_uses": config.getoption("pool_max_uses"),
+        "max_memory_mb": config.getoption("pool_max_memory_mb"),
+    }
+    daemons = None
+    if config.getoption("browser_daemon"):
+        daemons = browser_daemon.DaemonClient(parallel.worker_id(config), driver_path,
+                                              idle_timeout=config.getoption("browser_daemon_idle_timeout"),
+                                              max_memory_mb=config.getoption("pool_max_memory_mb"),
+                                              window_size=WINDOW_SIZE)
+        # У демона одна сессия на профиль и воркер; память и падения браузера проверяет он сам
+        pool_options = {"size": 1, "max_uses": 0, "max_memory_mb": 0}
+
+        def factory(profile):
+            return attach_driver(daemons, profile, config._network_log)
+    else:
+        driver_path()
+        factory = config._launch_driver
+
+    pools = PoolRegistry(factory, window_size=WINDOW_SIZE, **pool_options)
+    # Сессии профиля прогона прогреваются сразу, остальные - по первому запросу
+    pools.pool(config._browser_profile)
+    config._driver_pools = pools
+    print(f"Driver pool started for worker {parallel.worker_id(config)}")
+
+    yield pools
+
+    pools.close()
+    if daemons:
+        daemons.close()
+
+
+@pytest.fixture
+def driver(request, driver_pools, base_url):
+    """WebDriver из пула; после теста сессия сбрасывается в чистое состояние"""
+    config = request.config
+    profile = browser_profiles.for_item(request.node, config._browser_profile)
+    request.node.user_properties.append(("browser_profile", profile.name))
+    policy = network_policy.for_item(request.node, config._network_policy)
+
+    pool = driver_pools.pool(profile)
+    session = pool.acquire()
+    extras = {}
+    if config.getoption("asset_audit") != "off":
+        extras["assets"] = asset_audit.ASSETS_JS
+    if config._incremental:
+        extras["resource_urls"] = incremental.RESOURCE_URLS_JS
+    if config.getoption("memory_check") != "off":
+        # Замер "после" снимается в pytest_runtest_makereport сразу после тела теста
+        sampler = memory_monitor.MemorySampler(session.driver, config.getoption("memory_gc"))
+        request.node._memory = (sampler, sampler.sample())
+    collector = perf_metrics.PageMetricsCollector(session.driver, request.node.nodeid, config._perf_budgets, extras)
+    request.node._page_metrics = collector
+    if config._artifact_writer:
+        request.node._artifacts = artifacts.ArtifactRecorder(session.driver, collector,
+                                                             config.getoption("artifact_log_size"))
+    profiler = config._command_profiler
+    detach = profiler.attach(session.driver) if profiler else None
+    policy_session = None
+    if config._network_log:
+        request.node.user_properties.append(("network_policy", policy.name))
+        policy_session = network_policy.PolicySession(session.driver, policy, base_url, config._network_learning)
+
+    yield session.driver
+
+    # Падение в teardown уже не снять: сессия сбрасывается и уходит в пул
+    request.node._artifacts = None
+    if detach:
+        detach()
+    if policy_session:
+        config._network_stats.add(policy_session.finish())
+    for page in collector.finish():
+        if policy_session:
+            page["network_policy"] = policy.name
+        assets = page.pop("assets", None)
+        if assets:
+            config._page_assets.append({**assets, "test": page["test"], "route": page["route"]})
+        visited = [page["url"]] + (page.pop("resource_urls", None) or [])
+        config._visited.setdefault(scheduling.base_nodeid(request.node.nodeid), set()).update(
+            url for url in visited if url.startswith(("http://", "https://")))
+        config._page_metrics.append(page)
+    pool.release(session)
+
+
+@pytest.fixture
+def cache_measurement(request, driver_pools, base_url):
+    """Замеры с холодным и прогретым кэшем в отдельной сессии Chrome со свежим профилем"""
+    profile = browser_profiles.for_item(request.node, request.config._browser_profile)
+    # Всегда новый Chrome, даже с --browser-daemon: нужен свежий профиль
+    fresh_driver = request.config._launch_driver(profile)
     try:
-        # Пытаемся установить ChromeDriver заново
-        driver_path = ChromeDriverManager().install()
-        print(f"ChromeDriver path: {driver_path}")
+        measurement = cache_modes.CacheMeasurement(fresh_driver, base_url, request.node.nodeid)
 
-        # Проверяем, что файл существует и исполняем
-        if not os.path.exists(driver_path):
-            raise FileNotFoundError(f"ChromeDriver not found at {driver_path}")
+        yield measurement
 
-        service = Service(driver_path)
-        driver = webdriver.Chrome(service=service, options=chrome_options)
+        request.config._cache_samples.extend(measurement.samples)
+    finally:
+        fresh_driver.quit()
 
-    except Exception as e:
-        print(f"Error with ChromeDriverManager: {e}")
-        # Пытаемся использовать системный ChromeDriver
-        try:
-            service = Service()  # Использует системный PATH
-            driver = webdriver.Chrome(service=service, options=chrome_options)
-        except Exception as e2:
-            print(f"Error with system ChromeDriver: {e2}")
-            raise e2
 
-    driver.implicitly_wait(10)
-    driver.maximize_window()
+@pytest.fixture
+def responsive_check(request, driver):
+    """Проверки элементов на наборе устройств (--devices) во вкладках с эмуляцией CDP"""
+    check = responsive.ResponsiveCheck(driver, request.node.nodeid,
+                                       request.config._devices,
+                                       request.config.getoption("device_tabs"),
+                                       collector=request.node._page_metrics)
 
-    yield driver
+    yield check
 
-    driver.quit()
+    request.config._viewports.extend(result._asdict() for result in check.results)
+    request.config._viewport_wall += check.wall
+
+
+@pytest.fixture
+def page_metrics(request, driver):
+    """Сборщик метрик загрузки страниц текущего теста"""
+    return request.node._page_metrics
 
 
 @pytest.fixture(scope="session")
-def base_url():
+def locator_registry(request):
+    """Профиль селекторов темы магазина, общий для всех тестов процесса"""
+    return LocatorRegistry(getattr(request.config, "cache", None))
+
+
+@pytest.fixture
+def locators(driver, locator_registry):
+    """Локаторы темы для текущей сессии WebDriver"""
+    return locator_registry.bind(driver)
+
+
+@pytest.fixture
+def dom(driver):
+    """Пакетные проверки DOM за один запрос к WebDriver"""
+    return dom_batch.DomAssertions(driver)
+
+
+@pytest.fixture(scope="session")
+def page_probe(request, base_url):
+    """HTTP клиент витрины без браузера для тестов с маркером http_only"""
+    probe = http_probe.PageProbe(base_url)
+    request.config._page_probe = probe
+    yield probe
+    probe.close()
+
+
+@pytest.fixture(scope="session")
+def standin(request):
+    """Локальная замена витрины из снимков (см. standin_server.py), своя в каждом процессе"""
+    config = request.config
+    server = standin_server.StandinServer(os.path.join(str(config.rootpath), config.getoption("standin_snapshots")),
+                                          config.getoption("standin_network"))
+    server.start()
+    print(f"Stand-in storefront at {server.url} ({server.profile.name} network profile)")
+    yield server
+    server.stop()
+
+
+@pytest.fixture(scope="session")
+def base_url(request):
     """Базовый URL для тестирования"""
-    return "http://localhost"
+    if request.config.getoption("standin"):
+        return request.getfixturevalue("standin").url
+    return request.config.getoption("base_url")
+
+
+class CommandProfileOutput:
+    """Запись профиля команд после teardown сессионных фикстур: закрытие пула тоже попадает в <session>"""
+
+    def __init__(self, config):
+        self.config = config
+
+    @pytest.hookimpl(trylast=True)
+    def pytest_sessionfinish(self, session):
+        profiler = self.config._command_profiler
+        if parallel.is_worker(self.config):
+            self.config.workeroutput["autotest_commands"] = profiler.as_dict()
+        elif profiler.by_kind:
+            profiler.write(self.config.getoption("command_profile_dir"))
+
+
+def pytest_configure(config):
+    # Ошибка в списке маршрутов или устройств видна сразу, а не падением теста 13 или 12
+    try:
+        config._cache_targets = cache_modes.parse_targets(config.getoption("cache_targets"))
+        config._devices = responsive.parse_devices(config.getoption("devices"))
+    except ValueError as e:
+        raise pytest.UsageError(str(e))
+    if config.getoption("standin"):
+        snapshots = os.path.join(str(config.rootpath), config.getoption("standin_snapshots"))
+        if not os.path.exists(os.path.join(snapshots, standin_server.MANIFEST)):
+            raise pytest.UsageError(f"--standin needs recorded snapshots in {snapshots}: record them once from "
+                                    f"a running store with 'python standin_server.py record "
+                                    f"--base-url http://localhost --out {snapshots}'")
+    config._worker_timer = parallel.WorkerTimer()
+    config._worker_stats = {}
+    config._browser_profile = browser_profiles.from_options(config)
+    config._driver_pools = None
+    config._worker_pool_stats = []
+    config._worker_startup = []
+    config._perf_budgets = perf_metrics.load_budgets(
+        config.getoption("perf_budgets") or os.path.join(str(config.rootpath), "perf_budgets.json"))
+    config._memory_thresholds = memory_monitor.load_thresholds(
+        config.getoption("memory_thresholds") or os.path.join(str(config.rootpath), "memory_thresholds.json"))
+    config._asset_thresholds = asset_audit.load_thresholds(config.getoption("asset_thresholds"))
+    config._page_metrics = []
+    config._page_assets = []
+    config._cache_samples = []
+    config._incremental = None
+    config._incremental_decisions = {}
+    # Контроллер xdist: хэши ответов для воркеров и итоги их тестов для записи отпечатков
+    config._incremental_current = None
+    config._incremental_results = {}
+    config._visited = {}
+    # Маршруты страниц по тестам (с воркеров xdist) для сверки со сценариями load_mode.py
+    config._test_routes = {}
+    config._scenario_drift = []
+    config._outcomes = {}
+    config._page_probe = None
+    # Отпечатки пишутся в каждом прогоне, пропуск по ним включает --incremental.
+    # Без кэша pytest и на заменителе витрины (новый порт в каждом прогоне) отпечатки не ведутся
+    if (getattr(config, "cache", None) is not None and not config.getoption("standin")
+            and not config.option.collectonly):
+        # Опции, от которых зависит, что проверяют тесты (набор устройств теста 12, маршруты теста 13)
+        config._incremental = incremental.IncrementalCache(config.cache, {
+            "base_url": config.getoption("base_url"),
+            "browser_profile": config._browser_profile.name,
+            "network_policy": config.getoption("network_policy"),
+            "devices": config.getoption("devices"),
+            "cache_targets": config.getoption("cache_targets"),
+            "cache_runs": config.getoption("cache_runs"),
+        }, str(config.rootpath), config.getoption("base_url"),
+            [config._perf_budgets, config._memory_thresholds, config._asset_thresholds])
+    config._viewports = []
+    config._viewport_wall = 0.0
+    config._network_policy = network_policy.POLICIES[config.getoption("network_policy")]
+    # Журнал сети нужен, только если хоть один тест блокирует запросы (см. pytest_collection_modifyitems)
+    config._network_log = network_policy.enabled(config._network_policy)
+    # Чужие хосты прошлого прогона блокируются с первой загрузки (см. network_policy.py)
+    known_hosts = config.cache.get(network_policy.CACHE_KEY, []) if getattr(config, "cache", None) is not None else []
+    config._network_learning = network_policy.NetworkLearning(known_hosts)
+    config._network_stats = network_policy.PolicyStats()
+    config._memory = []
+    config._artifact_writer = None
+    if config.getoption("artifacts") != "off" and not config.option.collectonly:
+        config._artifact_writer = artifacts.ArtifactWriter(config.getoption("artifacts_dir"))
+    config._artifacts_written = []
+    config._artifact_errors = []
+    config._asset_audit = None
+    config._perf_regressions = []
+    config._schedule = None
+    # Без явного --dist корзины длительностей раздаются воркерам целиком. xdist сам меняет
+    # "no" на "load" при -n, поэтому явный выбор виден только в исходном разборе опций
+    if (not parallel.is_worker(config) and config.getoption("schedule") == "duration"
+            and getattr(config.option, "dist", "no") == "load"
+            and getattr(config.known_args_namespace, "dist", "no") == "no"):
+        config.option.dist = "loadgroup"
+    # Воркеры заново разбирают командную строку и о замене узнают из workerinput
+    if parallel.is_worker(config) and config.workerinput.get("autotest_loadgroup"):
+        config.option.loadgroup = True
+    config._command_profiler = None
+    if not config.getoption("no_command_profile") and not config.option.collectonly:
+        config._command_profiler = command_profiler.CommandProfiler(IMPLICIT_WAIT)
+        config._command_profiler.install()
+        config.pluginmanager.register(CommandProfileOutput(config), "autotest-command-profile")
+    config.addinivalue_line("markers", "browser_profile(name): run the test under a named Chrome launch profile")
+    config.addinivalue_line("markers", "network_policy(name, block=[], allow=[], same_origin=False): "
+                                       "block requests in the test by URL pattern or off-origin")
+    config.addinivalue_line("markers", "http_only: the test checks server responses with page_probe and never starts Chrome")
+
+
+def pytest_unconfigure(config):
+    # После UsageError в pytest_configure профилировщика еще нет
+    if getattr(config, "_command_profiler", None):
+        config._command_profiler.uninstall()
+
+
+def pytest_sessionstart(session):
+    """Проверка OpenCart до запуска тестов (один раз, на контроллере xdist)"""
+    config = session.config
+    if (parallel.is_worker(config) or config.option.collectonly or config.getoption("no_preflight")
+            or config.getoption("standin")):
+        return
+
+    base_url = config.getoption("base_url")
+    start = time.perf_counter()
+    ok, attempts, results = preflight.check(base_url, deadline=config.getoption("preflight_timeout"))
+    elapsed = time.perf_counter() - start
+    if not ok:
+        pytest.exit(preflight.diagnosis(base_url, attempts, elapsed, results), returncode=3)
+    print(f"\nOpenCart at {base_url} is up ({attempts} attempt(s), {elapsed:.2f}s)")
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_collection_modifyitems(config, items):
+    """Проверка тестов http_only и нужен ли журнал сети; на воркерах xdist - тесты от долгих к коротким и корзины LPT"""
+    for item in items:
+        if item.get_closest_marker("http_only") and "driver" in getattr(item, "fixturenames", ()):
+            raise pytest.UsageError(f"{item.nodeid} is marked http_only but requests the driver fixture")
+        if network_policy.enabled(network_policy.for_item(item, config._network_policy)):
+            config._network_log = True
+
+    if not parallel.is_worker(config) or config.getoption("schedule") == "off":
+        return
+    workers = config.workerinput["workercount"]
+    if workers < 2:
+        return
+
+    schedule = scheduling.Schedule([item.nodeid for item in items], config.getoption("perf_history"),
+                                   workers, window=config.getoption("perf_baseline_runs"))
+    items.sort(key=lambda item: -schedule.durations[item.nodeid])
+    if config.getoption("loadgroup", False):
+        for item in items:
+            item.add_marker(pytest.mark.xdist_group(schedule.group_of(item.nodeid)))
+    config._schedule = schedule.as_dict()
+
+
+def pytest_collection_finish(session):
+    """С --incremental пропуск тестов, чьи страницы не изменились с прошлого успешного прогона (после -k/-m)"""
+    config = session.config
+    if not config._incremental:
+        return
+    # Воркеры xdist получают хэши ответов от контроллера (pytest_configure_node) и не запрашивают их сами
+    current = config.workerinput.get("autotest_fingerprints") if parallel.is_worker(config) else None
+    config._incremental_decisions = config._incremental.plan(session.items, config.getoption("incremental"), current)
+    for item in session.items:
+        decision = config._incremental_decisions[scheduling.base_nodeid(item.nodeid)]
+        if not decision.run:
+            item.add_marker(pytest.mark.skip(reason=f"reused from the fingerprint cache: {decision.reason}"))
+
+
+def pytest_runtest_setup(item):
+    """Привязываем журнал ожиданий, статистику пакетов DOM и профиль команд к текущему тесту"""
+    waits.current_test = item.nodeid
+    dom_batch.current_test = item.nodeid
+    if item.config._command_profiler:
+        item.config._command_profiler.current_test = item.nodeid
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_teardown(item):
+    """После теста паузы и команды (например, в sessionfinish) не приписываются ему"""
+    yield
+    if item.config._command_profiler:
+        item.config._command_profiler.current_test = None
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_makereport(item, call):
+    """Время фаз теста и исходы для отпечатков в процессе, который его выполняет"""
+    outcome = yield
+    report = outcome.get_result()
+    item.config._worker_timer.add(report)
+
+    config = item.config
+    # С --dist loadgroup xdist дописывает к nodeid группу, отпечатки ведутся по исходному
+    nodeid = scheduling.base_nodeid(item.nodeid)
+    if config._incremental and config._incremental_decisions.get(nodeid, (True,))[0]:
+        config._outcomes.setdefault(nodeid, []).append(report.outcome)
+    if report.when == "teardown" and config._page_probe:
+        config._visited.setdefault(nodeid, set()).update(config._page_probe.visited)
+        config._page_probe.visited.clear()
+
+    if report.failed and getattr(item, "_artifacts", None):
+        attach_artifacts(item, report)
+
+    if report.when == "call":
+        roundtrips, source_bytes = dom_batch.saved(item.nodeid)
+        if roundtrips or source_bytes:
+            report.user_properties.append(("dom_roundtrips_saved", roundtrips))
+            report.user_properties.append(("dom_source_bytes_saved", source_bytes))
+        if getattr(item, "_memory", None):
+            sampler, before = item._memory
+            # Переход на about:blank снимает метрики последней страницы через сборщик (команда GET)
+            after, blank = sampler.sample_after()
+            record = memory_monitor.record(nodeid, parallel.worker_id(config), before, after,
+                                           config._memory_thresholds, blank)
+            config._memory.append(record)
+            report.user_properties.append(("memory_growth", memory_monitor.describe(record["delta"])))
+
+
+def attach_artifacts(item, report):
+    """Снимок упавшего теста уходит в фоновую запись, в HTML отчет - ссылки на файлы"""
+    config = item.config
+    paths = config._artifact_writer.submit(scheduling.base_nodeid(item.nodeid), report.when, item._artifacts.capture())
+    htmlpath = getattr(config.option, "htmlpath", None)
+    base = os.path.dirname(os.path.abspath(htmlpath)) if htmlpath else os.getcwd()
+    report.extras = getattr(report, "extras", []) + [
+        html_extras.url(os.path.relpath(os.path.abspath(path), base).replace(os.sep, "/"), name=name)
+        for name, path in sorted(paths.items())]
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_sessionfinish(session):
+    config = session.config
+    if config._artifact_writer:
+        config._artifact_writer.close()
+        config._artifacts_written.extend(config._artifact_writer.written)
+        config._artifact_errors.extend(config._artifact_writer.errors)
+    if config._incremental:
+        results = config._incremental.results(config._outcomes, config._visited)
+        if parallel.is_worker(config):
+            config.workeroutput["autotest_incremental_results"] = results
+        else:
+            results.update(config._incremental_results)
+            if results:
+                config._incremental.record(results)
+    if parallel.is_worker(config):
+        config.workeroutput["autotest_incremental"] = {
+            nodeid: list(decision) for nodeid, decision in config._incremental_decisions.items()}
+        config.workeroutput[parallel.OUTPUT_KEY] = config._worker_timer.as_dict()
+        if config._driver_pools:
+            config.workeroutput["autotest_pool"] = config._driver_pools.stats().as_dict()
+        config.workeroutput["autotest_startup"] = driver_resolver.startup.as_dict()
+        config.workeroutput["autotest_waits"] = [list(record) for record in waits.records()]
+        config.workeroutput["autotest_routes"] = test_routes(config)
+        config.workeroutput["autotest_pages"] = config._page_metrics
+        config.workeroutput["autotest_assets"] = config._page_assets
+        config.workeroutput["autotest_cache"] = config._cache_samples
+        config.workeroutput["autotest_viewports"] = [config._viewports, config._viewport_wall]
+        config.workeroutput["autotest_network"] = config._network_stats.as_dict()
+        config.workeroutput["autotest_foreign_hosts"] = sorted(config._network_learning.seen)
+        config.workeroutput["autotest_memory"] = config._memory
+        config.workeroutput["autotest_artifacts"] = [config._artifacts_written, config._artifact_errors]
+        if config._schedule:
+            config.workeroutput[scheduling.OUTPUT_KEY] = config._schedule
+        return
+
+    config._test_routes.update(test_routes(config))
+    config._scenario_drift = load_mode.scenario_drift(config._test_routes)
+    if config._network_learning.seen and getattr(config, "cache", None) is not None:
+        config.cache.set(network_policy.CACHE_KEY, sorted(config._network_learning.seen))
+    if config._viewports:
+        responsive.write_results(config.getoption("viewports_file"), config._viewports)
+    if config._cache_samples:
+        cache_modes.write_results(config.getoption("cache_modes_file"), config._cache_samples)
+    if config._page_metrics:
+        perf_metrics.write_results(config.getoption("perf_metrics_file"), config._page_metrics, config._perf_budgets)
+    record_perf_history(session)
+    run_asset_audit(session)
+    check_memory_growth(session)
+
+
+
+def test_routes(config):
+    """{nodeid: маршруты} страниц, открытых тестами этого процесса"""
+    return {nodeid: sorted({perf_metrics.route_of(url) for url in urls}) for nodeid, urls in config._visited.items()}
+
+
+def run_asset_audit(session):
+    """Аудит ресурсов страниц всех тестов; в режиме fail находки роняют прогон"""
+    config = session.config
+    if not config._page_assets:
+        return
+    config._asset_audit = asset_audit.audit(config._page_assets, config._asset_thresholds,
+                                            config.getoption("asset_audit_third_party"))
+    asset_audit.write_results(config.getoption("asset_audit_file"), config._asset_audit)
+    if (config._asset_audit["findings"] and config.getoption("asset_audit") == "fail"
+            and session.exitstatus == pytest.ExitCode.OK):
+        session.exitstatus = pytest.ExitCode.TESTS_FAILED
+
+
+def check_memory_growth(session):
+    """Записывает замеры памяти; в режиме fail рост выше порогов роняет прогон"""
+    config = session.config
+    if not config._memory:
+        return
+    memory_monitor.write_results(config.getoption("memory_file"), config._memory)
+    if (any(record["violations"] for record in config._memory) and config.getoption("memory_check") == "fail"
+            and session.exitstatus == pytest.ExitCode.OK):
+        session.exitstatus = pytest.ExitCode.TESTS_FAILED
+
+
+def record_perf_history(session):
+    """Дописывает прогон в историю и ищет регрессии относительно скользящей базы"""
+    config = session.config
+    reporter = config.pluginmanager.get_plugin("terminalreporter")
+    if config.option.collectonly or reporter is None:
+        return
+
+    # Берем только прошедшие тесты: время упавших искажено таймаутами
+    durations = {scheduling.base_nodeid(report.nodeid): report.duration for report in reporter.stats.get("passed", [])
+                 if report.when == "call"}
+    # Метрики снимаются после каждой навигации браузера: без них прогон был только HTTP (test_http_probe.py)
+    if not config._page_metrics:
+        return
+
+    path = config.getoption("perf_history")
+    history = perf_baseline.load_history(path)
+    revision, dirty = perf_baseline.git_revision(str(config.rootpath))
+    if config.getoption("standin"):
+        target = f"standin:{config.getoption('standin_network')}"
+    else:
+        target = config.getoption("base_url")
+    env = perf_baseline.environment(target, config._browser_profile, getattr(config.option, "numprocesses", None) or 0)
+    run = perf_baseline.build_run(durations, config._page_metrics, revision, dirty, env)
+
+    mode = config.getoption("perf_regressions")
+    if mode != "off":
+        config._perf_regressions = perf_baseline.compare(run, history, window=config.getoption("perf_baseline_runs"))
+        if config._perf_regressions and mode == "fail" and session.exitstatus == pytest.ExitCode.OK:
+            session.exitstatus = pytest.ExitCode.TESTS_FAILED
+    perf_baseline.append_run(path, run)
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_html_results_table_header(cells):
+    cells.insert(2, "<th>Browser profile</th>")
+    cells.insert(3, "<th>Round-trips saved</th>")
+    cells.insert(4, "<th>Memory growth</th>")
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_html_results_table_row(report, cells):
+    properties = dict(report.user_properties)
+    cells.insert(2, f"<td>{properties.get('browser_profile', '')}</td>")
+    cells.insert(3, f"<td>{properties.get('dom_roundtrips_saved', '')}</td>")
+    cells.insert(4, f"<td>{html.escape(properties.get('memory_growth', ''))}</td>")
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_html_results_summary(prefix, session):
+    """Регрессии производительности, рост памяти, политики сети и аудит ресурсов в шапке HTML отчета"""
+    config = session.config
+    for regression in config._perf_regressions:
+        prefix.append(f"<p>Performance regression: {html.escape(perf_baseline.describe(regression))}</p>")
+    for record in config._memory:
+        for problem in record["violations"]:
+            prefix.append(f"<p>Memory growth: {html.escape(problem)} in {html.escape(record['test'])}</p>")
+    policy_lines = network_policy.summary_lines(config._network_stats.as_dict(), config._page_metrics)
+    if len(policy_lines) > 1:
+        prefix.append(f"<p>Network policies:</p><pre>{html.escape(chr(10).join(policy_lines))}</pre>")
+    if config._asset_audit:
+        lines = asset_audit.summary_lines(config._asset_audit)
+        prefix.append(f"<p>Asset audit:</p><pre>{html.escape(chr(10).join(lines))}</pre>")
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_configure_node(node):
+    config = node.config
+    node.workerinput["autotest_loadgroup"] = config.option.dist == "loadgroup"
+    # Ответы для отпечатков запрашиваются один раз на прогон, а не каждым воркером
+    if config._incremental and config.getoption("incremental"):
+        if config._incremental_current is None:
+            config._incremental_current = config._incremental.current()
+        node.workerinput["autotest_fingerprints"] = config._incremental_current
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_testnodedown(node, error):
+    """Контроллер xdist собирает время воркеров и статистику их пулов"""
+    workeroutput = getattr(node, "workeroutput", {})
+    stats = workeroutput.get(parallel.OUTPUT_KEY)
+    if stats:
+        node.config._worker_stats[node.workerinput["workerid"]] = stats
+    if "autotest_pool" in workeroutput:
+        node.config._worker_pool_stats.append(workeroutput["autotest_pool"])
+    if "autotest_startup" in workeroutput:
+        node.config._worker_startup.append(workeroutput["autotest_startup"])
+    waits.merge(workeroutput.get("autotest_waits", []))
+    node.config._test_routes.update(workeroutput.get("autotest_routes", {}))
+    node.config._page_metrics.extend(workeroutput.get("autotest_pages", []))
+    node.config._page_assets.extend(workeroutput.get("autotest_assets", []))
+    node.config._cache_samples.extend(workeroutput.get("autotest_cache", []))
+    for nodeid, decision in workeroutput.get("autotest_incremental", {}).items():
+        node.config._incremental_decisions[nodeid] = incremental.Decision(*decision)
+    node.config._incremental_results.update(workeroutput.get("autotest_incremental_results", {}))
+    viewports, wall = workeroutput.get("autotest_viewports", ([], 0.0))
+    node.config._viewports.extend(viewports)
+    node.config._viewport_wall += wall
+    node.config._network_stats.merge(workeroutput.get("autotest_network", {}))
+    node.config._network_learning.seen.update(workeroutput.get("autotest_foreign_hosts", []))
+    node.config._memory.extend(workeroutput.get("autotest_memory", []))
+    written, errors = workeroutput.get("autotest_artifacts", ([], []))
+    node.config._artifacts_written.extend(tuple(item) for item in written)
+    node.config._artifact_errors.extend(errors)
+    # План у всех воркеров одинаковый: они собирают те же тесты по той же истории
+    if node.config._schedule is None:
+        node.config._schedule = workeroutput.get(scheduling.OUTPUT_KEY)
+    if "autotest_commands" in workeroutput and node.config._command_profiler:
+        node.config._command_profiler.merge(workeroutput["autotest_commands"])
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    """Сводки по ожиданиям, воркерам, пулу сессий и времени старта"""
+    summary = waits.summary()
+    if summary:
+        terminalreporter.section("wait timings")
+        terminalreporter.write_line(f"{'wait':<16}{'calls':>7}{'total, s':>11}{'avg, s':>9}{'max, s':>9}{'timeouts':>10}")
+        for name, (calls, total, longest, timeouts) in sorted(summary.items()):
+            terminalreporter.write_line(
+                f"{name:<16}{calls:>7}{total:>11.2f}{total / calls:>9.3f}{longest:>9.3f}{timeouts:>10}")
+
+        slowest = sorted(waits.records(), key=lambda record: record.duration, reverse=True)[:5]
+        terminalreporter.write_line("slowest waits:")
+        for record in slowest:
+            terminalreporter.write_line(f"  {record.duration:.3f}s {record.name} in {record.test}")
+
+    if config._worker_stats:
+        terminalreporter.section("parallel workers")
+        wall = config._worker_timer.as_dict()["wall"]
+        for line in parallel.summary_lines(config._worker_stats, wall):
+            terminalreporter.write_line(line)
+
+    if config._schedule and not parallel.is_worker(config):
+        terminalreporter.section("test scheduling")
+        for line in scheduling.summary_lines(config._schedule, config._worker_stats):
+            terminalreporter.write_line(line)
+
+    pool_stats = config._driver_pools.stats() if config._driver_pools else None
+    if config._worker_pool_stats:
+        pool_stats = PoolStats.merge(config._worker_pool_stats)
+    if pool_stats:
+        terminalreporter.section("driver pool")
+        for line in pool_stats.summary_lines():
+            terminalreporter.write_line(line)
+
+    startup_lines = driver_resolver.StartupTimes.summary_lines(
+        config._worker_startup or [driver_resolver.startup.as_dict()])
+    if startup_lines:
+        terminalreporter.section("browser startup")
+        for line in startup_lines:
+            terminalreporter.write_line(line)
+
+    batched = []
+    for reports in terminalreporter.stats.values():
+        for report in reports:
+            properties = dict(getattr(report, "user_properties", []))
+            if getattr(report, "when", None) == "call" and "dom_roundtrips_saved" in properties:
+                batched.append((report.nodeid, properties["dom_roundtrips_saved"], properties["dom_source_bytes_saved"]))
+    if batched:
+        terminalreporter.section("batched DOM checks")
+        for nodeid, roundtrips, source_bytes in sorted(batched):
+            terminalreporter.write_line(f"{roundtrips:>4} round-trips, {source_bytes / 1024:>7.1f} KiB page source saved  {nodeid}")
+        terminalreporter.write_line(f"total: {sum(item[1] for item in batched)} round-trips saved")
+
+    profiler = config._command_profiler
+    if profiler and profiler.by_kind:
+        terminalreporter.section("WebDriver command profile")
+        for line in profiler.summary_lines():
+            terminalreporter.write_line(line)
+        terminalreporter.write_line(
+            f"flame graph: {os.path.join(config.getoption('command_profile_dir'), 'command_profile.folded')}")
+
+    if config._scenario_drift:
+        terminalreporter.section("load scenarios")
+        for line in config._scenario_drift:
+            terminalreporter.write_line(line)
+
+    if config._page_metrics:
+        terminalreporter.section("page load metrics")
+        for line in perf_metrics.summary_lines(config._page_metrics, config._perf_budgets):
+            terminalreporter.write_line(line)
+        terminalreporter.write_line(f"details: {config.getoption('perf_metrics_file')}")
+
+    if config._cache_samples:
+        terminalreporter.section("cold vs warm cache")
+        for line in cache_modes.summary_lines(config._cache_samples):
+            terminalreporter.write_line(line)
+        terminalreporter.write_line(f"details: {config.getoption('cache_modes_file')}")
+
+    if config._incremental_decisions and config.getoption("incremental") and not parallel.is_worker(config):
+        terminalreporter.section("incremental run")
+        for line in incremental.summary_lines(config._incremental_decisions):
+            terminalreporter.write_line(line)
+
+    if config._viewports:
+        terminalreporter.section("responsive checks")
+        for line in responsive.summary_lines(config._viewports, config._viewport_wall):
+            terminalreporter.write_line(line)
+        terminalreporter.write_line(f"details: {config.getoption('viewports_file')}")
+
+    policy_lines = network_policy.summary_lines(config._network_stats.as_dict(), config._page_metrics)
+    if len(policy_lines) > 1:
+        terminalreporter.section("network policies")
+        for line in policy_lines:
+            terminalreporter.write_line(line)
+
+    if config._memory:
+        terminalreporter.section("memory growth")
+        for line in memory_monitor.summary_lines(config._memory):
+            terminalreporter.write_line(line)
+        terminalreporter.write_line(f"details: {config.getoption('memory_file')}")
+
+    if config._asset_audit:
+        terminalreporter.section("asset audit")
+        for line in asset_audit.summary_lines(config._asset_audit):
+            terminalreporter.write_line(line)
+        terminalreporter.write_line(f"details: {config.getoption('asset_audit_file')}")
+
+    if config._artifacts_written or config._artifact_errors:
+        terminalreporter.section("failure artifacts")
+        for line in artifacts.summary_lines(config._artifacts_written, config._artifact_errors):
+            terminalreporter.write_line(line)
+
+    if config._perf_regressions:
+        terminalreporter.section("performance regressions", red=True)
+        for regression in config._perf_regressions:
+            terminalreporter.write_line(perf_baseline.describe(regression))
@@ -0,0 +1,232 @@
+"""Обход витрины по ссылкам: статусы, время ответа и цепочки редиректов
+
+Обход начинается с base_url и идет по ссылкам меню, футера и списков
+категорий (локаторы nav_links, footer_links, categories из locators.py)
+в пределах того же хоста, до заданной глубины и числа страниц. Страницы
+загружаются параллельно через общий пул соединений aiohttp. Адреса
+нормализуются перед дедупликацией: параметры сортируются, для маршрутов
+OpenCart отбрасываются параметры, которые не меняют страницу.
+
+    python crawler.py --base-url http://localhost --depth 3 --max-pages 300
+
+Код возврата 1, если найдены битые ссылки (4xx, 5xx или ошибка соединения).
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from collections import namedtuple
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+
+import aiohttp
+
+import http_probe
+from locators import LOCATORS
+
+
+LINK_SOURCES = ("nav_links", "footer_links", "categories")
+
+# Параметры, которые сохраняются для маршрута; остальные не меняют содержимое страницы
+ROUTE_PARAMS = {
+    "common/home": (),
+    "product/product": ("product_id",),
+    "product/category": ("path", "page"),
+    "product/manufacturer.info": ("manufacturer_id", "page"),
+    "product/search": ("search", "tag", "category_id", "description", "page"),
+    "information/information": ("information_id",),
+}
+
+# Параметры представления списков: сортировка и размер страницы дают те же товары
+VIEW_PARAMS = {"sort", "order", "limit"}
+
+# Маршруты, которые меняют состояние или не являются страницами
+SKIPPED_ROUTES = {"account/logout", "checkout/cart.add", "checkout/cart.remove", "common/currency", "common/language"}
+
+PageResult = namedtuple("PageResult", "url status elapsed size redirects depth referrer error")
+
+
+def canonical_route(route):
+    """Маршрут в виде OpenCart 4: метод через '.' ('checkout/cart/add' -> 'checkout/cart.add')"""
+    route = route.replace("|", ".")
+    if route.count("/") == 2:
+        head, _, method = route.rpartition("/")
+        route = f"{head}.{method}"
+    return route
+
+
+def normalize(url):
+    """Ключ дедупликации: хост в нижнем регистре, без фрагмента, с каноническим route=..."""
+    parts = urlsplit(url)
+    params = [(key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True) if key not in VIEW_PARAMS]
+    route = dict(params).get("route")
+    path = parts.path or "/"
+    if route is not None:
+        route = canonical_route(route)
+        kept = ROUTE_PARAMS.get(route)
+        params = [(key, value) for key, value in params if key != "route" and (kept is None or key in kept)]
+        if route == "product/category":
+            # path=20_27 и path=27 - одна и та же категория
+            params = [(key, value.split("_")[-1] if key == "path" else value) for key, value in params]
+        if route == "common/home":
+            params, route = [], None
+        else:
+            params.append(("route", route))
+    if path == "/index.php" and route is None and not params:
+        path = "/"
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, urlencode(sorted(params)), ""))
+
+
+def _route(url):
+    route = dict(parse_qsl(urlsplit(url).query)).get("route")
+    return canonical_route(route) if route else None
+
+
+class Crawler:
+    """Параллельный обход одного хоста с ограничением глубины и числа страниц"""
+
+    def __init__(self, base_url, depth=3, max_pages=300, concurrency=8, timeout=30, all_links=False):
+        self.base_url = base_url
+        self.host = urlsplit(self.base_url).netloc.lower()
+        self.depth = depth
+        self.max_pages = max_pages
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.selector = "a[href]" if all_links else ", ".join(
+            variant for source in LINK_SOURCES for variant in LOCATORS[source])
+        self.results = {}
+        self.duplicates = 0
+        self._seen = set()
+
+    def _follow(self, url):
+        parts = urlsplit(url)
+        return (parts.scheme in ("http", "https") and parts.netloc.lower() == self.host
+                and _route(url) not in SKIPPED_ROUTES)
+
+    def _enqueue(self, queue, url, depth, referrer):
+        key = normalize(url)
+        if key in self._seen:
+            self.duplicates += 1
+            return
+        if len(self._seen) >= self.max_pages:
+            return
+        self._seen.add(key)
+        queue.put_nowait((url, depth, referrer))
+
+    async def _fetch(self, session, url, depth, referrer):
+        start = time.perf_counter()
+        try:
+            async with session.get(url) as response:
+                body = await response.read()
+                elapsed = time.perf_counter() - start
+                redirects = [str(item.url) for item in response.history]
+                result = PageResult(str(response.url), response.status, elapsed, len(body), redirects,
+                                    depth, referrer, None)
+                html = body.decode(response.charset or "utf-8", "replace") \
+                    if "html" in response.headers.get("Content-Type", "") else None
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            return PageResult(url, None, time.perf_counter() - start, 0, [], depth, referrer, repr(e)), []
+
+        links = []
+        if html and depth < self.depth and response.status < 400:
+            page = http_probe.ProbedPage(result.url, result.status, {}, html, elapsed, redirects)
+            links = [urljoin(result.url, element.get("href")) for element in page.select(self.selector)
+                     if element.get("href")]
+        return result, links
+
+    async def _worker(self, session, queue):
+        while True:
+            url, depth, referrer = await queue.get()
+            try:
+                try:
+                    result, links = await self._fetch(session, url, depth, referrer)
+                except Exception as e:
+                    # Например, LookupError для неизвестной кодировки: воркер не должен умирать,
+                    # иначе queue.join() не дождется оставшихся адресов
+                    result, links = PageResult(url, None, 0.0, 0, [], depth, referrer, repr(e)), []
+                self.results[normalize(url)] = result
+                for link in links:
+                    if self._follow(link):
+                        self._enqueue(queue, link, depth + 1, result.url)
+            finally:
+                queue.task_done()
+
+    async def _crawl(self):
+        queue = asyncio.Queue()
+        connector = aiohttp.TCPConnector(limit=self.concurrency)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout,
+                                         headers={"User-Agent": "opencart-autotest-crawler"}) as session:
+            self._enqueue(queue, self.base_url, 0, None)
+            workers = [asyncio.ensure_future(self._worker(session, queue)) for _ in range(self.concurrency)]
+            await queue.join()
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+    def run(self):
+        start = time.perf_counter()
+        asyncio.run(self._crawl())
+        return time.perf_counter() - start
+
+    @property
+    def broken(self):
+        return [result for result in self.results.values() if result.error or result.status >= 400]
+
+    def as_dict(self, elapsed):
+        return {
+            "base_url": self.base_url,
+            "elapsed": elapsed,
+            "pages": [result._asdict() for result in sorted(self.results.values(), key=lambda result: result.url)],
+            "duplicates_skipped": self.duplicates,
+            "budget_exhausted": len(self._seen) >= self.max_pages,
+        }
+
+    def summary_lines(self, elapsed, top=10):
+        statuses = {}
+        for result in self.results.values():
+            key = str(result.status) if result.status else "error"
+            statuses[key] = statuses.get(key, 0) + 1
+        lines = [f"{len(self.results)} pages in {elapsed:.1f}s, {self.duplicates} duplicate links skipped"
+                 + (" (page budget exhausted)" if len(self._seen) >= self.max_pages else ""),
+                 "statuses: " + ", ".join(f"{status}: {count}" for status, count in sorted(statuses.items()))]
+
+        lines.append("slowest pages:")
+        for result in sorted(self.results.values(), key=lambda result: -result.elapsed)[:top]:
+            lines.append(f"  {result.elapsed * 1000:>7.0f}ms {result.size / 1024:>7.1f}KiB  {result.url}")
+
+        redirected = [result for result in self.results.values() if result.redirects]
+        if redirected:
+            lines.append("redirect chains:")
+            for result in redirected[:top]:
+                lines.append("  " + " -> ".join(result.redirects + [result.url]))
+
+        for result in sorted(self.broken, key=lambda result: result.url):
+            lines.append(f"broken: {result.status or result.error} {result.url} (linked from {result.referrer})")
+        return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Crawl the OpenCart storefront and check every linked page")
+    parser.add_argument("--base-url", default="http://localhost")
+    parser.add_argument("--depth", type=int, default=3, help="link depth from the home page (default: 3)")
+    parser.add_argument("--max-pages", type=int, default=300, help="page budget (default: 300)")
+    parser.add_argument("--concurrency", type=int, default=8, help="parallel requests (default: 8)")
+    parser.add_argument("--all-links", action="store_true",
+                        help="follow every same-origin link, not only menu, footer and category links")
+    parser.add_argument("--out", default=os.path.join("reports", "crawl.json"))
+    args = parser.parse_args()
+
+    crawler = Crawler(args.base_url, args.depth, args.max_pages, args.concurrency, all_links=args.all_links)
+    elapsed = crawler.run()
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(crawler.as_dict(elapsed), f, ensure_ascii=False, indent=2)
+    for line in crawler.summary_lines(elapsed):
+        print(line)
+    print(f"details: {args.out}")
+    return 1 if crawler.broken else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,146 @@
+"""Пакетные проверки DOM за один вызов execute_script
+
+Вместо отдельного запроса WebDriver на каждый элемент (is_displayed,
+value_of_css_property, execute_script по картинке) или выгрузки всей
+страницы через page_source проверки собираются в пакет и выполняются
+на странице одним скриптом:
+
+    result = (dom.batch()
+              .count("links", "footer a")
+              .visible("first_links", "footer a", limit=3)
+              .run())
+
+Для каждого теста считается, сколько запросов к WebDriver сэкономлено.
+"""
+
+# Тест, к которому относится статистика (выставляется из conftest.py)
+current_test = None
+
+# nodeid -> [сэкономленные запросы, несостоявшаяся выгрузка page_source в байтах]
+_saved = {}
+
+BATCH_JS = """
+var checks = arguments[0], results = {}, sourceBytes = 0;
+
+function visible(el) {
+  if (el.checkVisibility) {
+    return el.checkVisibility({checkOpacity: true, checkVisibilityCSS: true});
+  }
+  var style = getComputedStyle(el), rect = el.getBoundingClientRect();
+  return rect.width > 0 && rect.height > 0 && style.visibility !== 'hidden' && style.display !== 'none';
+}
+
+function first(selector, limit) {
+  var elements = Array.from(document.querySelectorAll(selector));
+  return limit ? elements.slice(0, limit) : elements;
+}
+
+checks.forEach(function (check) {
+  var value;
+  switch (check.kind) {
+    case 'present':
+      value = document.querySelector(check.selector) !== null;
+      break;
+    case 'count':
+      value = document.querySelectorAll(check.selector).length;
+      break;
+    case 'visible':
+      value = first(check.selector, check.limit).map(visible);
+      break;
+    case 'images_complete':
+      value = first(check.selector, check.limit).map(function (img) {
+        return img.complete && img.naturalHeight !== 0;
+      });
+      break;
+    case 'style':
+      var el = document.querySelector(check.selector);
+      value = el ? getComputedStyle(el).getPropertyValue(check.property) : null;
+      break;
+    case 'text_contains':
+      var source = document.documentElement.outerHTML;
+      sourceBytes += source.length;
+      source = source.toLowerCase();
+      value = check.texts.some(function (text) { return source.indexOf(text.toLowerCase()) !== -1; });
+      break;
+    case 'evaluate':
+      value = (new Function('return (' + check.expression + ');'))();
+      break;
+  }
+  results[check.name] = value;
+});
+return {results: results, sourceBytes: sourceBytes};
+"""
+
+
+class DomBatch:
+    """Набор проверок, выполняемых на странице одним запросом"""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.checks = []
+
+    def _add(self, name, kind, **params):
+        self.checks.append(dict(name=name, kind=kind, **params))
+        return self
+
+    def present(self, name, selector):
+        """Есть ли элемент (bool)"""
+        return self._add(name, "present", selector=selector)
+
+    def count(self, name, selector):
+        """Количество элементов (int)"""
+        return self._add(name, "count", selector=selector)
+
+    def visible(self, name, selector, limit=None):
+        """Видимость первых limit элементов (list of bool)"""
+        return self._add(name, "visible", selector=selector, limit=limit)
+
+    def images_complete(self, name, selector="img", limit=None):
+        """Загружены ли первые limit картинок (list of bool)"""
+        return self._add(name, "images_complete", selector=selector, limit=limit)
+
+    def style(self, name, selector, css_property):
+        """Вычисленное значение CSS-свойства первого элемента (str или None)"""
+        return self._add(name, "style", selector=selector, property=css_property)
+
+    def text_contains(self, name, *texts):
+        """Есть ли в HTML страницы хотя бы одна из подстрок, без учета регистра (bool)"""
+        return self._add(name, "text_contains", texts=list(texts))
+
+    def evaluate(self, name, expression):
+        """Значение произвольного JS-выражения"""
+        return self._add(name, "evaluate", expression=expression)
+
+    def run(self):
+        """Выполняет все проверки одним скриптом и возвращает {name: value}"""
+        response = self.driver.execute_script(BATCH_JS, self.checks)
+        results = response["results"]
+
+        # Сколько запросов потребовалось бы без пакета
+        equivalent = 0
+        for check in self.checks:
+            if check["kind"] in ("visible", "images_complete"):
+                equivalent += 1 + len(results[check["name"]])
+            elif check["kind"] == "style":
+                equivalent += 2
+            else:
+                equivalent += 1
+        saved = _saved.setdefault(current_test, [0, 0])
+        saved[0] += equivalent - 1
+        saved[1] += response["sourceBytes"]
+        return results
+
+
+class DomAssertions:
+    """Фабрика пакетов для сессии WebDriver, которую получают тесты"""
+
+    def __init__(self, driver):
+        self.driver = driver
+
+    def batch(self):
+        return DomBatch(self.driver)
+
+
+def saved(nodeid):
+    """(сэкономленные запросы, байты page_source) для теста"""
+    return tuple(_saved.get(nodeid, (0, 0)))
@@ -0,0 +1,48 @@
+"""Перехват команд WebDriver одной сессии
+
+Все команды Selenium (get, find_element, execute_script, click, ...) проходят
+через WebDriver.execute, поэтому хуки ставятся на этот метод экземпляра.
+Команды, которые отправляют сами хуки, повторно через хуки не проходят.
+"""
+import time
+
+
+class CommandHooks:
+    """before(command, params) и after(command, params, duration, error) для сессии"""
+
+    def __init__(self, driver):
+        self.before = []
+        self.after = []
+        self._inside = False
+        self._execute = driver.execute
+        driver.execute = self._dispatch
+
+    def _run(self, hooks, *args):
+        self._inside = True
+        try:
+            for hook in list(hooks):
+                hook(*args)
+        finally:
+            self._inside = False
+
+    def _dispatch(self, driver_command, params=None):
+        if self._inside:
+            return self._execute(driver_command, params)
+
+        self._run(self.before, driver_command, params)
+        start = time.perf_counter()
+        error = None
+        try:
+            return self._execute(driver_command, params)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self._run(self.after, driver_command, params, time.perf_counter() - start, error)
+
+
+def hooks(driver):
+    """Хуки сессии; устанавливаются при первом обращении"""
+    if not hasattr(driver, "_autotest_hooks"):
+        driver._autotest_hooks = CommandHooks(driver)
+    return driver._autotest_hooks
@@ -0,0 +1,249 @@
+"""Пул заранее запущенных сессий Chrome с быстрым сбросом состояния между тестами
+
+Сессия пересоздается только если сброс не удался или она исчерпала лимит
+использований или памяти. Взамен выбывшей сессии новая запускается в фоне,
+чтобы следующий тест получил уже прогретый браузер.
+"""
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import psutil
+from selenium.common.exceptions import WebDriverException
+
+
+class PooledSession:
+    """Сессия WebDriver из пула вместе с ее исходной вкладкой"""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.main_handle = driver.current_window_handle
+        self.uses = 0
+
+
+class PoolStats:
+    """Попадания/промахи пула, ожидания прогрева, время сбросов и причины пересоздания сессий"""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        # Сессия еще запускалась в фоне, и тест ждал ее старта
+        self.waited = 0
+        self.wait_times = []
+        self.reset_times = []
+        self.recycled = {}
+
+    def recycle(self, reason):
+        self.recycled[reason] = self.recycled.get(reason, 0) + 1
+
+    def as_dict(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "waited": self.waited,
+            "wait_times": list(self.wait_times),
+            "reset_times": list(self.reset_times),
+            "recycled": dict(self.recycled),
+        }
+
+    @classmethod
+    def merge(cls, dicts):
+        """Объединяет статистику нескольких воркеров"""
+        stats = cls()
+        for data in dicts:
+            stats.hits += data["hits"]
+            stats.misses += data["misses"]
+            stats.waited += data["waited"]
+            stats.wait_times.extend(data["wait_times"])
+            stats.reset_times.extend(data["reset_times"])
+            for reason, count in data["recycled"].items():
+                stats.recycled[reason] = stats.recycled.get(reason, 0) + count
+        return stats
+
+    def summary_lines(self):
+        total = self.hits + self.waited + self.misses
+        hit_rate = self.hits / total if total else 0.0
+        lines = [f"acquired {total}: {self.hits} hits, {self.waited} waited for warm-up, "
+                 f"{self.misses} misses ({hit_rate:.0%} hit rate)"]
+        if self.wait_times:
+            lines.append(f"warm-up waits: total {sum(self.wait_times):.2f}s, max {max(self.wait_times):.2f}s")
+        if self.reset_times:
+            times = sorted(self.reset_times)
+            lines.append(f"resets {len(times)}: avg {sum(times) / len(times) * 1000:.0f}ms, "
+                         f"median {times[len(times) // 2] * 1000:.0f}ms, max {times[-1] * 1000:.0f}ms")
+        if self.recycled:
+            reasons = ", ".join(f"{reason}={count}" for reason, count in sorted(self.recycled.items()))
+            lines.append(f"recycled sessions: {reasons}")
+        return lines
+
+
+def _origin(url):
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}" if parts.scheme in ("http", "https") else None
+
+
+def leave_page(driver):
+    """Уводит вкладку на about:blank до сброса; источник страницы запоминается для очистки storage"""
+    origin = _origin(driver.current_url)
+    if origin:
+        driver._autotest_origin = origin
+    driver.get("about:blank")
+
+
+def reset_driver(driver, main_handle, window_size):
+    """Cookies, storage, лишние вкладки, размер окна и about:blank"""
+    for handle in driver.window_handles:
+        if handle != main_handle:
+            driver.switch_to.window(handle)
+            driver.close()
+    driver.switch_to.window(main_handle)
+
+    # Вкладка могла уже уйти на about:blank (leave_page), тогда источник запомнен
+    origins = {_origin(driver.current_url), getattr(driver, "_autotest_origin", None)} - {None}
+    driver._autotest_origin = None
+    for origin in sorted(origins):
+        driver.execute_cdp_cmd("Storage.clearDataForOrigin", {
+            "origin": origin,
+            "storageTypes": "local_storage,session_storage,indexeddb,cache_storage,service_workers",
+        })
+    driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+
+    size = driver.get_window_size()
+    if (size["width"], size["height"]) != tuple(window_size):
+        driver.set_window_size(*window_size)
+
+    driver.get("about:blank")
+
+
+def memory_mb(driver):
+    """RSS браузера (chromedriver и все процессы Chrome) в мегабайтах"""
+    # У сессии демона (browser_daemon.py) нет своего service: известен только pid chromedriver
+    pid = getattr(driver, "chromedriver_pid", None) or driver.service.process.pid
+    process = psutil.Process(pid)
+    processes = [process] + process.children(recursive=True)
+    total = 0
+    for proc in processes:
+        try:
+            total += proc.memory_info().rss
+        except psutil.Error:
+            pass
+    return total / (1024 * 1024)
+
+
+class DriverPool:
+    """Пул сессий WebDriver; factory() создает новую настроенную сессию"""
+
+    def __init__(self, factory, size=1, max_uses=0, max_memory_mb=0, window_size=(1920, 1080)):
+        self.factory = factory
+        self.size = size
+        self.max_uses = max_uses
+        self.max_memory_mb = max_memory_mb
+        self.window_size = window_size
+        self.stats = PoolStats()
+        self._idle = deque()
+        self._warming = deque()
+        self._executor = ThreadPoolExecutor(max_workers=max(size, 1), thread_name_prefix="driver-pool")
+
+    def warm_up(self):
+        """Запускает сессии в фоне до заданного размера пула"""
+        while len(self._idle) + len(self._warming) < self.size:
+            self._warming.append(self._executor.submit(self._create))
+
+    def _create(self):
+        return PooledSession(self.factory())
+
+    def acquire(self):
+        """Выдает прогретую сессию (попадание), дожидается запускаемой (ожидание) или запускает новую (промах)"""
+        if self._idle:
+            session = self._idle.popleft()
+            self.stats.hits += 1
+        elif self._warming:
+            future = self._warming.popleft()
+            if future.done():
+                self.stats.hits += 1
+                session = future.result()
+            else:
+                start = time.perf_counter()
+                session = future.result()
+                self.stats.waited += 1
+                self.stats.wait_times.append(time.perf_counter() - start)
+        else:
+            session = self._create()
+            self.stats.misses += 1
+        session.uses += 1
+        return session
+
+    def release(self, session):
+        """Сбрасывает сессию после теста и возвращает ее в пул или пересоздает"""
+        start = time.perf_counter()
+        try:
+            self.reset(session)
+        except WebDriverException:
+            self._recycle(session, "reset_failed")
+            return
+        self.stats.reset_times.append(time.perf_counter() - start)
+
+        if self.max_uses and session.uses >= self.max_uses:
+            self._recycle(session, "max_uses")
+            return
+        try:
+            over_memory = self.max_memory_mb and memory_mb(session.driver) > self.max_memory_mb
+        except psutil.Error:
+            # Процесс chromedriver или браузера уже завершился
+            self._recycle(session, "process_gone")
+            return
+        if over_memory:
+            self._recycle(session, "memory")
+        else:
+            self._idle.append(session)
+
+    def reset(self, session):
+        reset_driver(session.driver, session.main_handle, self.window_size)
+
+    def _recycle(self, session, reason):
+        self.stats.recycle(reason)
+        try:
+            session.driver.quit()
+        except WebDriverException:
+            pass
+        self.warm_up()
+
+    def close(self):
+        """Закрывает все сессии пула"""
+        for future in self._warming:
+            try:
+                self._idle.append(future.result())
+            except Exception:
+                pass
+        self._warming.clear()
+        while self._idle:
+            try:
+                self._idle.popleft().driver.quit()
+            except WebDriverException:
+                pass
+        self._executor.shutdown()
+
+
+class PoolRegistry:
+    """Отдельный пул на каждый профиль браузера; factory(profile) создает сессию"""
+
+    def __init__(self, factory, **pool_options):
+        self.factory = factory
+        self.pool_options = pool_options
+        self._pools = {}
+
+    def pool(self, profile):
+        """Пул профиля; создается и прогревается при первом обращении"""
+        if profile not in self._pools:
+            pool = DriverPool(lambda: self.factory(profile), **self.pool_options)
+            pool.warm_up()
+            self._pools[profile] = pool
+        return self._pools[profile]
+
+    def stats(self):
+        return PoolStats.merge(pool.stats.as_dict() for pool in self._pools.values())
+
+    def close(self):
+        for pool in self._pools.values():
+            pool.close()
@@ -0,0 +1,164 @@
+"""Поиск ChromeDriver без обращения к сети
+
+Порядок: локальный кэш по мажорной версии установленного Chrome, затем
+системный PATH. Загрузка через webdriver-manager выполняется только
+по явному запросу (--driver-download), и скачанный файл кладется в кэш.
+Здесь же собирается разбивка времени старта: поиск драйвера, запуск
+браузера и первая навигация.
+"""
+import os
+import re
+import shutil
+import subprocess
+import sys
+import time
+from collections import namedtuple
+
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "opencart-autotest", "chromedriver")
+DRIVER_NAME = "chromedriver.exe" if sys.platform == "win32" else "chromedriver"
+
+LINUX_BROWSERS = ["google-chrome", "google-chrome-stable", "chromium", "chromium-browser"]
+MAC_BROWSER = "/Applications/Google Chrome.app/Contents/MacOS/Google Chrome"
+
+Resolution = namedtuple("Resolution", "path source chrome_version duration")
+
+
+class StartupTimes:
+    """Разбивка времени старта сессий браузера в текущем процессе"""
+
+    def __init__(self):
+        self.resolution = None
+        self.launches = []
+        # Подключения к сессиям демона (browser_daemon.py) вместо запуска
+        self.attaches = []
+        self.first_navigations = []
+
+    def as_dict(self):
+        return {
+            "resolution": self.resolution._asdict() if self.resolution else None,
+            "launches": list(self.launches),
+            "attaches": list(self.attaches),
+            "first_navigations": list(self.first_navigations),
+        }
+
+    @staticmethod
+    def summary_lines(dicts):
+        """Сводка по одному или нескольким процессам (воркерам xdist)"""
+        lines = []
+        launches, attaches, navigations = [], [], []
+        for data in dicts:
+            resolution = data["resolution"]
+            if resolution:
+                lines.append(f"driver resolution {resolution['duration'] * 1000:.0f}ms "
+                             f"via {resolution['source']} (Chrome {resolution['chrome_version'] or 'unknown'}): "
+                             f"{resolution['path']}")
+            launches.extend(data["launches"])
+            attaches.extend(data.get("attaches", []))
+            navigations.extend(data["first_navigations"])
+        for name, values in (("browser launch", launches), ("daemon attach", attaches),
+                             ("first navigation", navigations)):
+            if values:
+                lines.append(f"{name}: {len(values)} x avg {sum(values) / len(values):.2f}s, max {max(values):.2f}s")
+        return lines
+
+
+startup = StartupTimes()
+
+
+def chrome_version():
+    """Версия установленного Chrome ('120.0.6099.109') или None"""
+    if sys.platform == "win32":
+        import winreg
+        for root in (winreg.HKEY_CURRENT_USER, winreg.HKEY_LOCAL_MACHINE):
+            try:
+                with winreg.OpenKey(root, r"Software\Google\Chrome\BLBeacon") as key:
+                    return winreg.QueryValueEx(key, "version")[0]
+            except OSError:
+                continue
+        return None
+
+    candidates = [MAC_BROWSER] if sys.platform == "darwin" else LINUX_BROWSERS
+    for browser in candidates:
+        executable = shutil.which(browser) or (browser if os.path.isfile(browser) else None)
+        if not executable:
+            continue
+        try:
+            output = subprocess.run([executable, "--version"], capture_output=True, text=True, timeout=5).stdout
+        except (OSError, subprocess.SubprocessError):
+            continue
+        match = re.search(r"\d+\.\d+\.\d+\.\d+", output)
+        if match:
+            return match.group(0)
+    return None
+
+
+def _major(version):
+    return version.split(".")[0] if version else None
+
+
+def _driver_version(path):
+    try:
+        output = subprocess.run([path, "--version"], capture_output=True, text=True, timeout=5).stdout
+    except (OSError, subprocess.SubprocessError):
+        return None
+    match = re.search(r"\d+\.\d+\.\d+\.\d+", output)
+    return match.group(0) if match else None
+
+
+def cache_path(version, cache_dir=DEFAULT_CACHE_DIR):
+    """Путь к драйверу в кэше для мажорной версии Chrome"""
+    return os.path.join(cache_dir, _major(version) or "unknown", DRIVER_NAME)
+
+
+def _download(version, cache_dir):
+    """Загрузка через webdriver-manager с сохранением в кэш"""
+    from webdriver_manager.chrome import ChromeDriverManager
+
+    downloaded = ChromeDriverManager().install()
+    target = cache_path(version or _driver_version(downloaded), cache_dir)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    shutil.copy2(downloaded, target)
+    os.chmod(target, 0o755)
+    return target
+
+
+def resolve(cache_dir=DEFAULT_CACHE_DIR, download=False):
+    """Находит ChromeDriver: кэш, затем PATH, затем (если разрешено) загрузка"""
+    start = time.perf_counter()
+    version = chrome_version()
+
+    cached = cache_path(version, cache_dir)
+    if version and os.access(cached, os.X_OK):
+        path, source = cached, "cache"
+    else:
+        path, source = shutil.which(DRIVER_NAME), "PATH"
+        # Драйвер из PATH подходит, только если его мажорная версия совпадает с Chrome
+        if path and version and _major(_driver_version(path)) != _major(version):
+            path = None
+
+    if not path:
+        if not download:
+            raise FileNotFoundError(
+                f"No ChromeDriver for Chrome {version or '(version unknown)'} in cache {cached} or PATH; "
+                f"run once with --driver-download or put a matching chromedriver into the cache")
+        path, source = _download(version, cache_dir), "download"
+
+    resolution = Resolution(path, source, version, time.perf_counter() - start)
+    startup.resolution = resolution
+    return resolution
+
+
+def time_first_navigation(driver):
+    """Замеряет первый driver.get() новой сессии и снимает обертку после него"""
+    original_get = driver.get
+
+    def timed_get(url):
+        del driver.get
+        start = time.perf_counter()
+        try:
+            return original_get(url)
+        finally:
+            startup.first_navigations.append(time.perf_counter() - start)
+
+    driver.get = timed_get
@@ -0,0 +1,212 @@
+"""Проверки страниц по HTTP без браузера
+
+Для тестов, которым от Chrome нужен только ответ сервера (статус, URL
+после редиректов, текст и ссылки страницы). Запросы идут через общий пул
+keep-alive соединений urllib3, HTML разбирается стандартным html.parser.
+Поддерживается подмножество CSS: теги, #id, .class, [attr], [attr='v'],
+[attr*='v'] (значение может содержать пробелы и запятые), потомки через
+пробел и группы через запятую - этого хватает для вариантов из locators.py.
+"""
+import re
+import time
+from html.parser import HTMLParser
+from urllib.parse import urlencode, urljoin
+
+import urllib3
+
+import preflight
+
+
+VOID_ELEMENTS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+HIDDEN_TEXT = {"script", "style", "template", "noscript"}
+
+_SIMPLE = re.compile(r"""([a-zA-Z][\w-]*)|#([\w-]+)|\.([\w-]+)"""
+                     r"""|\[([\w-]+)(?:([*^$]?=)(?:'([^']*)'|"([^"]*)"|([^\]]*)))?\]""")
+
+
+class Element:
+    """Элемент разобранной страницы: тег, атрибуты, предки и текст"""
+
+    def __init__(self, tag, attrs, parent):
+        self.tag = tag
+        self.attrs = attrs
+        self.parent = parent
+        self.text_parts = []
+
+    @property
+    def text(self):
+        return " ".join("".join(self.text_parts).split())
+
+    @property
+    def classes(self):
+        return self.attrs.get("class", "").split()
+
+    def get(self, name, default=None):
+        return self.attrs.get(name, default)
+
+
+class _PageParser(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.elements = []
+        self._open = []
+        self._hidden = 0
+
+    def handle_starttag(self, tag, attrs):
+        element = Element(tag, {name: value or "" for name, value in attrs}, self._open[-1] if self._open else None)
+        self.elements.append(element)
+        if tag not in VOID_ELEMENTS:
+            self._open.append(element)
+            self._hidden += tag in HIDDEN_TEXT
+
+    def handle_endtag(self, tag):
+        # Незакрытые вложенные теги закрываются вместе с родителем
+        for index in range(len(self._open) - 1, -1, -1):
+            if self._open[index].tag == tag:
+                for element in self._open[index:]:
+                    self._hidden -= element.tag in HIDDEN_TEXT
+                del self._open[index:]
+                return
+
+    def handle_data(self, data):
+        if not self._hidden:
+            for element in self._open:
+                element.text_parts.append(data)
+
+
+def _split(selector, separator):
+    """Части селектора между separator (',' или ' ') вне [...] и кавычек"""
+    parts, current, depth, quote = [], [], 0, None
+    for char in selector:
+        if quote:
+            quote = None if char == quote else quote
+        elif char in "'\"":
+            quote = char
+        elif char == "[":
+            depth += 1
+        elif char == "]":
+            depth -= 1
+        elif not depth and (char.isspace() if separator == " " else char == separator):
+            parts.append("".join(current))
+            current = []
+            continue
+        current.append(char)
+    parts.append("".join(current))
+    return [part.strip() for part in parts if part.strip()]
+
+
+def _parse_compound(compound):
+    checks = []
+    for tag, element_id, class_name, attr, operator, single, double, bare in _SIMPLE.findall(compound):
+        value = single or double or bare
+        if tag:
+            checks.append(lambda element, tag=tag.lower(): element.tag == tag)
+        elif element_id:
+            checks.append(lambda element, element_id=element_id: element.get("id") == element_id)
+        elif class_name:
+            checks.append(lambda element, class_name=class_name: class_name in element.classes)
+        elif not operator:
+            checks.append(lambda element, attr=attr: attr in element.attrs)
+        else:
+            compare = {"=": str.__eq__, "*=": str.__contains__, "^=": str.startswith, "$=": str.endswith}[operator]
+            checks.append(lambda element, attr=attr, compare=compare, value=value:
+                          attr in element.attrs and compare(element.attrs[attr], value))
+    return lambda element: all(check(element) for check in checks)
+
+
+def _matches(element, parts):
+    """parts - составные селекторы слева направо, последний относится к самому элементу"""
+    if not parts[-1](element):
+        return False
+    ancestor = element.parent
+    for part in reversed(parts[:-1]):
+        while ancestor is not None and not part(ancestor):
+            ancestor = ancestor.parent
+        if ancestor is None:
+            return False
+        ancestor = ancestor.parent
+    return True
+
+
+class ProbedPage:
+    """Ответ сервера и разобранный HTML"""
+
+    def __init__(self, url, status, headers, body, elapsed, redirects):
+        self.url = url
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.elapsed = elapsed
+        self.redirects = redirects
+        parser = _PageParser()
+        parser.feed(body)
+        parser.close()
+        self.elements = parser.elements
+
+    @property
+    def text(self):
+        """Видимый текст страницы в нижнем регистре (без script и style)"""
+        root = next((element for element in self.elements if element.tag == "body"), None)
+        return (root.text if root else "").lower()
+
+    def select(self, selector):
+        """Элементы по селектору в порядке документа"""
+        groups = [[_parse_compound(part) for part in _split(group, " ")] for group in _split(selector, ",")]
+        return [element for element in self.elements if any(_matches(element, parts) for parts in groups)]
+
+    def links(self, partial_text=None):
+        """Ссылки (абсолютный href, текст), по желанию с фрагментом текста"""
+        found = []
+        for element in self.select("a[href]"):
+            if partial_text is None or partial_text.lower() in element.text.lower():
+                found.append((urljoin(self.url, element.get("href")), element.text))
+        return found
+
+    def broken(self):
+        """Диагноз полурабочего магазина (preflight.BROKEN_MARKERS) или None"""
+        for marker, problem in preflight.BROKEN_MARKERS.items():
+            if marker in self.body:
+                return problem
+        return None
+
+
+class PageProbe:
+    """Клиент витрины на общем пуле keep-alive соединений"""
+
+    def __init__(self, base_url, timeout=10, pool_size=4):
+        self.base_url = base_url.rstrip("/") + "/"
+        self.timeout = urllib3.Timeout(connect=timeout, read=timeout)
+        self.http = urllib3.PoolManager(maxsize=pool_size, headers={"User-Agent": "opencart-autotest-probe"})
+        self.requests = 0
+        self.elapsed = 0.0
+        # Запрошенные адреса; conftest.py забирает их после каждого теста для отпечатков
+        self.visited = []
+
+    def get(self, path="", **params):
+        """GET относительно base_url (или абсолютного URL) с переходом по редиректам"""
+        url = urljoin(self.base_url, path)
+        if params:
+            url += ("&" if "?" in url else "?") + urlencode(params)
+
+        start = time.perf_counter()
+        response = self.http.request("GET", url, timeout=self.timeout, redirect=True, retries=urllib3.Retry(
+            total=3, redirect=5, status_forcelist=(), raise_on_redirect=True, raise_on_status=False))
+        elapsed = time.perf_counter() - start
+        self.requests += 1
+        self.elapsed += elapsed
+        self.visited.append(url)
+
+        redirects = [entry.redirect_location for entry in response.retries.history if entry.redirect_location]
+        charset = response.headers.get("Content-Type", "").partition("charset=")[2] or "utf-8"
+        body = response.data.decode(charset.split(";")[0].strip(), "replace")
+        final_url = url
+        for location in redirects:
+            final_url = urljoin(final_url, location)
+        return ProbedPage(final_url, response.status, dict(response.headers), body, elapsed, redirects)
+
+    def search(self, query):
+        """Страница результатов поиска OpenCart - то же, что отправка поля поиска в шапке"""
+        return self.get("index.php", route="product/search", search=query)
+
+    def close(self):
+        self.http.clear()
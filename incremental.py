@@ -0,0 +1,229 @@
+"""Инкрементальные прогоны: пропуск тестов, чьи страницы не изменились
+
+Для каждого теста в кэше pytest (.pytest_cache) хранится отпечаток: адреса
+страниц и ресурсов магазина (только источник base_url - чужие хосты не
+опрашиваются), хэши ответов сервера на них, хэш кода теста,
+вспомогательных модулей и настроек (бюджеты и пороги из JSON), окружение
+и результат. Хэши снимаются в конце каждого прогона отдельными GET-запросами
+без cookies. С --incremental те же адреса запрашиваются заново, и тест
+пропускается, если в прошлый раз он прошел, код и окружение те же, а все
+ответы совпали. Тесты, исход которых зависит от времени (TIMING_FIXTURES),
+запускаются всегда: те же ответы не означают то же время загрузки. Из ответов перед
+хэшированием вырезаются токены сессии и формы, которые меняются от
+запроса к запросу.
+
+С xdist адреса запрашивает один раз контроллер и передает хэши воркерам,
+а отпечатки воркеров записывает он же, одним ключом кэша.
+"""
+import glob
+import hashlib
+import inspect
+import json
+import os
+import re
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import urllib3
+
+import scheduling
+
+
+# {nodeid: отпечаток}; пишет только процесс без воркеров или контроллер xdist
+CACHE_KEY = "opencart/incremental"
+
+RESOURCE_URLS_JS = """
+return performance.getEntriesByType('resource').map(function (entry) { return entry.name; });
+"""
+
+# Значения, которые OpenCart генерирует заново для каждого ответа
+VOLATILE_PATTERNS = [
+    re.compile(rb"((?:user|customer|api)_token=)[\w-]+"),
+    re.compile(rb"(name=\"[\w-]*token[\w-]*\"\s+value=\")[^\"]*"),
+    re.compile(rb"(OCSESSID=)\w+"),
+]
+
+# Фикстуры замеров времени: тест 13 (бюджеты perf_budgets.json) и тесты с метриками страниц
+TIMING_FIXTURES = ("cache_measurement", "page_metrics")
+
+Decision = namedtuple("Decision", "run reason")
+
+
+def support_hash(rootdir, settings=()):
+    """Хэш вспомогательных модулей (все .py кроме тестов) и настроек: их изменение затрагивает все тесты
+
+    settings - загруженные JSON настройки (бюджеты, пороги), а не пути: так учитываются и свои файлы из опций.
+    """
+    digest = hashlib.sha1()
+    for path in sorted(glob.glob(os.path.join(rootdir, "*.py"))):
+        if not os.path.basename(path).startswith("test_"):
+            with open(path, "rb") as f:
+                digest.update(f.read())
+    for setting in settings:
+        digest.update(json.dumps(setting, sort_keys=True).encode())
+    return digest.hexdigest()[:12]
+
+
+def timing_dependent(item):
+    return any(name in getattr(item, "fixturenames", ()) for name in TIMING_FIXTURES)
+
+
+def code_hash(item, support):
+    try:
+        source = inspect.getsource(item.obj)
+    except (OSError, TypeError, AttributeError):
+        source = item.nodeid
+    return hashlib.sha1((support + source).encode()).hexdigest()[:12]
+
+
+def response_hash(status, body):
+    for pattern in VOLATILE_PATTERNS:
+        body = pattern.sub(rb"\1", body)
+    return f"{status}:{hashlib.sha1(body).hexdigest()[:16]}"
+
+
+def _fetch(http, url):
+    try:
+        response = http.request("GET", url, timeout=10, retries=urllib3.Retry(total=1, redirect=5))
+    except urllib3.exceptions.HTTPError as e:
+        return url, f"error:{type(e).__name__}"
+    return url, response_hash(response.status, response.data)
+
+
+def origin_of(url):
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def fingerprints(urls, workers=8):
+    """Текущие хэши ответов {url: 'статус:хэш'}, запросы идут параллельно"""
+    http = urllib3.PoolManager(maxsize=workers, headers={"User-Agent": "opencart-autotest-fingerprint"})
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return dict(pool.map(lambda url: _fetch(http, url), sorted(urls)))
+    finally:
+        http.clear()
+
+
+class IncrementalCache:
+    """Отпечатки тестов в кэше pytest и решение, какие тесты можно не запускать"""
+
+    def __init__(self, cache, environment, rootdir, base_url, settings=()):
+        self.cache = cache
+        self.environment = environment
+        self.origin = origin_of(base_url)
+        self.support = support_hash(rootdir, settings)
+        self.codes = {}
+        self.timing = set()
+        self.decisions = {}
+
+    def _own(self, urls):
+        return {url for url in urls if origin_of(url) == self.origin}
+
+    def current(self):
+        """Хэши ответов для всех отпечатков этого окружения, которые могут позволить пропуск теста
+
+        Контроллер xdist снимает их до запуска воркеров: коды тестов ему неизвестны,
+        поэтому берутся все прошедшие тесты.
+        """
+        records = self.cache.get(CACHE_KEY, {})
+        return fingerprints(self._own(url for record in records.values()
+                                      if record.get("environment") == self.environment
+                                      and record.get("outcome") == "passed"
+                                      for url in record.get("urls", {})))
+
+    def plan(self, items, reuse=False, current=None):
+        """Решения {nodeid: Decision} для отобранных тестов; ответы перезапрашиваются один раз на адрес
+
+        Без reuse (--incremental) запускаются все тесты, а хэши кода нужны для записи
+        отпечатков. nodeid - без суффикса группы xdist (scheduling.base_nodeid). current -
+        хэши, уже снятые контроллером (current()); без них адреса запрашиваются здесь.
+        """
+        stored = self.cache.get(CACHE_KEY, {}) if reuse else {}
+        records = {}
+        for item in items:
+            nodeid = scheduling.base_nodeid(item.nodeid)
+            self.codes[nodeid] = code_hash(item, self.support)
+            records[nodeid] = stored.get(nodeid)
+            if timing_dependent(item):
+                self.timing.add(nodeid)
+        if not reuse:
+            self.decisions = {nodeid: Decision(True, "without --incremental") for nodeid in records}
+            return self.decisions
+
+        if current is None:
+            candidates = [record for nodeid, record in records.items()
+                          if record and self._reason_to_run(nodeid, record) is None]
+            current = fingerprints(self._own(url for record in candidates for url in record["urls"]))
+
+        for nodeid, record in records.items():
+            if nodeid in self.timing:
+                reason = "outcome depends on timing"
+            else:
+                reason = self._reason_to_run(nodeid, record) if record else "no fingerprint from a previous run"
+            if reason is None:
+                changed = [url for url, value in record["urls"].items() if current.get(url) != value]
+                if changed:
+                    reason = f"{len(changed)} of {len(record['urls'])} responses changed, e.g. {changed[0]}"
+            if reason is None:
+                self.decisions[nodeid] = Decision(False, f"all {len(record['urls'])} responses unchanged "
+                                                         f"since it passed at {record['timestamp']}")
+            else:
+                self.decisions[nodeid] = Decision(True, reason)
+        return self.decisions
+
+    def _reason_to_run(self, nodeid, record):
+        if nodeid in self.timing:
+            return "outcome depends on timing"
+        if record.get("code") != self.codes[nodeid]:
+            return "test or helper code changed"
+        if record.get("environment") != self.environment:
+            return "environment changed"
+        if record.get("outcome") != "passed":
+            return f"last run {record.get('outcome')}"
+        if not record.get("urls"):
+            return "the test visits no pages that can be fingerprinted"
+        return None
+
+    def results(self, outcomes, visited):
+        """Итоги тестов этого процесса для record(): {nodeid: [исход, адреса, хэш кода]}"""
+        return {nodeid: [outcome(phases), sorted(self._own(visited.get(nodeid, ()))), self.codes.get(nodeid)]
+                for nodeid, phases in outcomes.items()}
+
+    def record(self, results):
+        """Сохраняет отпечатки тестов прогона, results - из results() этого процесса и воркеров"""
+        current = fingerprints({url for _, urls, _ in results.values() for url in urls})
+        timestamp = time.strftime("%Y-%m-%dT%H:%M:%S")
+        records = self.cache.get(CACHE_KEY, {})
+        for nodeid, (outcome, urls, code) in results.items():
+            records[nodeid] = {
+                "timestamp": timestamp,
+                "outcome": outcome,
+                "code": code,
+                "environment": self.environment,
+                "urls": {url: current[url] for url in urls},
+            }
+        self.cache.set(CACHE_KEY, records)
+
+
+def outcome(phases):
+    """Итог теста по исходам фаз setup, call и teardown"""
+    if "failed" in phases:
+        return "failed"
+    if "skipped" in phases:
+        return "skipped"
+    return "passed"
+
+
+def summary_lines(decisions):
+    """Какие тесты взяты из кэша отпечатков, какие запущены, и почему"""
+    reused = sorted((nodeid, decision) for nodeid, decision in decisions.items() if not decision.run)
+    rerun = sorted((nodeid, decision) for nodeid, decision in decisions.items() if decision.run)
+    lines = [f"{len(reused)} tests reused from the fingerprint cache, {len(rerun)} run"]
+    for nodeid, decision in reused:
+        lines.append(f"  reused {nodeid}: {decision.reason}")
+    for nodeid, decision in rerun:
+        lines.append(f"  run    {nodeid}: {decision.reason}")
+    return lines
@@ -0,0 +1,346 @@
+"""Нагрузочный режим: сценарии тестов от многих покупателей одновременно
+
+Сценарии повторяют путь тестов TestOpenCart и TestOpenCartAdvanced по
+страницам магазина (главная, поиск, каталог, товар, корзина, аккаунт,
+контакты, 404) на уровне HTTP. Это приближение: шаги записаны вручную по
+маршрутам, которые открывают тесты, а клики и проверки элементов не
+повторяются. Чтобы сценарии не разошлись с тестами молча, прогон pytest
+сверяет маршруты шагов с маршрутами, которые тесты сценария открыли
+(scenario_drift, сводка "load scenarios"). Смесь сценариев задается весами.
+Нагрузка подается либо фиксированным числом виртуальных покупателей
+(закрытая модель), либо потоком новых покупателей с заданной
+интенсивностью (открытая модель) в течение заданного времени. Запросы
+идут через asyncio и aiohttp с общим пулом соединений; у каждого
+покупателя свои cookies. Небольшой пул настоящих браузеров параллельно
+проходит те же сценарии и дает фронтенд-метрики (load, FCP, LCP).
+
+    python load_mode.py --users 20 --duration 60
+    python load_mode.py --rate 5 --duration 120 --mix search --browsers 2
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from collections import defaultdict
+from urllib.parse import parse_qs, urlencode, urljoin, urlsplit
+
+import aiohttp
+
+import http_probe
+import perf_metrics
+import perf_stats
+
+
+# Сценарий - тесты, которые он повторяет, и шаги по страницам
+SCENARIOS = {
+    "home": ("test_01", ["home"]),
+    "search": ("test_02, test_14, test_15", ["home", "search"]),
+    "catalog": ("test_04", ["home", "category"]),
+    "product": ("test_05", ["home", "product"]),
+    "cart": ("test_06", ["home", "cart_info", "cart"]),
+    "account": ("test_07", ["home", "login"]),
+    "contact": ("test_11", ["home", "contact"]),
+    "not_found": ("test_23", ["not_found"]),
+}
+
+MIXES = {
+    "browse": {"home": 3, "catalog": 2, "product": 3, "search": 2, "cart": 1, "contact": 1},
+    "search": {"search": 6, "product": 3, "home": 1},
+    "checkout": {"product": 3, "cart": 3, "account": 1, "home": 1},
+    "all": {name: 1 for name in SCENARIOS},
+}
+
+STATIC_STEPS = {
+    "home": "",
+    "cart_info": "index.php?route=common/cart/info",
+    "cart": "index.php?route=checkout/cart",
+    "login": "index.php?route=account/login",
+    "contact": "index.php?route=information/contact",
+    "not_found": "nonexistent-page-12345",
+}
+
+# Маршрут шага по perf_metrics.route_of; None - шаг не сверяется: XHR корзины тест делает не
+# навигацией, а кнопка корзины в тесте 6 открывает выпадающий список или страницу, смотря по теме
+STEP_ROUTES = {"search": "product/search", "product": "product/product", "category": "product/category",
+               "cart_info": None, "cart": None}
+STEP_ROUTES.update({step: perf_metrics.route_of(urljoin("http://localhost/", path))
+                    for step, path in STATIC_STEPS.items() if step not in STEP_ROUTES})
+
+# Запросы из тестов поиска (02, 14, 15)
+SEARCH_QUERIES = ["iphone", "mac", "samsung", "", "<script>", "'; DROP TABLE", "café", "smartphone's"]
+
+# Шаги, для которых 404 - ожидаемый ответ
+EXPECTED_NOT_FOUND = {"not_found"}
+
+PERCENTILES = (50, 95, 99)
+
+
+def scenario_drift(visited):
+    """Шаги сценариев, маршрутов которых нет среди открытых их тестами
+
+    visited - {nodeid: маршруты страниц теста}; сценарий проверяется, только если запускались все его тесты.
+    """
+    lines = []
+    for name, (tests, steps) in SCENARIOS.items():
+        prefixes = [f"{test.strip()}_" for test in tests.split(",")]
+        matched = {prefix: [routes for nodeid, routes in visited.items() if nodeid.split("::")[-1].startswith(prefix)]
+                   for prefix in prefixes}
+        if not all(matched.values()):
+            continue
+        routes = {route for runs in matched.values() for visited_routes in runs for route in visited_routes}
+        missing = [STEP_ROUTES[step] for step in steps if STEP_ROUTES[step] and STEP_ROUTES[step] not in routes]
+        if missing:
+            lines.append(f"scenario {name}: {tests} did not open {', '.join(missing)}; update load_mode.SCENARIOS")
+    return lines
+
+
+def parse_mix(value):
+    """Имя смеси из MIXES или веса вида 'search=3,product=1'"""
+    if value in MIXES:
+        return dict(MIXES[value])
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"unknown scenario {name.strip()!r}, known: {', '.join(SCENARIOS)}")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+class Catalog:
+    """Ссылки на товары и категории с главной страницы - для шагов product и category"""
+
+    def __init__(self, base_url):
+        probe = http_probe.PageProbe(base_url)
+        try:
+            links = [url for url, text in probe.get().links()]
+        finally:
+            probe.close()
+        self.base_url = base_url.rstrip("/") + "/"
+        self.products = sorted({url for url in links if _route(url) == "product/product"})
+        self.categories = sorted({url for url in links if _route(url) == "product/category"})
+
+    def url(self, step, rng):
+        if step == "search":
+            return self.base_url + "index.php?" + urlencode({"route": "product/search",
+                                                             "search": rng.choice(SEARCH_QUERIES)})
+        if step == "product":
+            return rng.choice(self.products) if self.products else \
+                self.base_url + "index.php?route=product/product&product_id=40"
+        if step == "category":
+            return rng.choice(self.categories) if self.categories else \
+                self.base_url + "index.php?route=product/category&path=20"
+        return urljoin(self.base_url, STATIC_STEPS[step])
+
+
+def _route(url):
+    route = parse_qs(urlsplit(url).query).get("route")
+    return route[0] if route else None
+
+
+class Recorder:
+    """Задержки и ошибки по шагам и сценариям"""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+        self.bytes = defaultdict(int)
+        self.scenarios = defaultdict(list)
+
+    def step(self, step, latency, status, size, error=None):
+        self.latencies[step].append(latency)
+        self.bytes[step] += size
+        self.statuses[step][str(status or type(error).__name__)] += 1
+        failed = error is not None or status >= 500 or (status >= 400 and step not in EXPECTED_NOT_FOUND)
+        self.errors[step] += failed
+
+    def as_dict(self, elapsed):
+        steps = {}
+        for step, values in sorted(self.latencies.items()):
+            steps[step] = {
+                "requests": len(values),
+                "errors": self.errors[step],
+                "throughput": len(values) / elapsed if elapsed else 0.0,
+                "avg_bytes": self.bytes[step] / len(values),
+                "statuses": dict(self.statuses[step]),
+                **{f"p{p}": perf_stats.percentile(values, p) * 1000 for p in PERCENTILES},
+            }
+        scenarios = {name: {"runs": len(values), **{f"p{p}": perf_stats.percentile(values, p) * 1000
+                                                    for p in PERCENTILES}}
+                     for name, values in sorted(self.scenarios.items())}
+        total = sum(len(values) for values in self.latencies.values())
+        return {"elapsed": elapsed, "requests": total, "throughput": total / elapsed if elapsed else 0.0,
+                "errors": sum(self.errors.values()), "steps": steps, "scenarios": scenarios}
+
+
+class LoadRun:
+    """Один нагрузочный прогон по HTTP и, по желанию, в браузерах"""
+
+    def __init__(self, base_url, mix, duration, users=0, rate=0.0, think=0.0, browsers=0, seed=None, timeout=30):
+        self.base_url = base_url
+        self.mix = mix
+        self.duration = duration
+        self.users = users
+        self.rate = rate
+        self.think = think
+        self.browsers = browsers
+        self.timeout = timeout
+        self.rng = random.Random(seed)
+        self.recorder = Recorder()
+        self.browser_metrics = defaultdict(lambda: defaultdict(list))
+        self.catalog = None
+        self._in_flight = 0
+        self.peak_in_flight = 0
+
+    def _pick(self, rng):
+        names = list(self.mix)
+        return rng.choices(names, weights=[self.mix[name] for name in names])[0]
+
+    async def _scenario(self, session, name, rng):
+        start = time.perf_counter()
+        for step in SCENARIOS[name][1]:
+            step_start = time.perf_counter()
+            self._in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self._in_flight)
+            try:
+                async with session.get(self.catalog.url(step, rng)) as response:
+                    body = await response.read()
+                self.recorder.step(step, time.perf_counter() - step_start, response.status, len(body))
+            # Любая ошибка шага - неудачный запрос, а не конец всего прогона в asyncio.gather
+            except Exception as e:
+                self.recorder.step(step, time.perf_counter() - step_start, None, 0, e)
+            finally:
+                self._in_flight -= 1
+        self.recorder.scenarios[name].append(time.perf_counter() - start)
+
+    async def _user(self, connector, deadline, rng):
+        """Закрытая модель: покупатель проходит сценарии один за другим до конца прогона"""
+        async with self._session(connector) as session:
+            while time.perf_counter() < deadline:
+                await self._scenario(session, self._pick(rng), rng)
+                if self.think:
+                    await asyncio.sleep(self.think)
+
+    async def _arrivals(self, connector, deadline):
+        """Открытая модель: новые покупатели по пуассоновскому потоку с интенсивностью rate"""
+        tasks = set()
+
+        async def shopper(rng):
+            async with self._session(connector) as session:
+                await self._scenario(session, self._pick(rng), rng)
+
+        while time.perf_counter() < deadline:
+            task = asyncio.ensure_future(shopper(random.Random(self.rng.random())))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            await asyncio.sleep(self.rng.expovariate(self.rate))
+        if tasks:
+            await asyncio.gather(*tasks)
+
+    def _session(self, connector):
+        return aiohttp.ClientSession(connector=connector, connector_owner=False,
+                                     timeout=aiohttp.ClientTimeout(total=self.timeout),
+                                     headers={"User-Agent": "opencart-autotest-load"})
+
+    def _browser(self, deadline, seed):
+        """Сценарии в настоящем браузере: метрики загрузки каждого шага"""
+        from selenium import webdriver
+        from selenium.webdriver.chrome.service import Service
+
+        import browser_profiles
+        import driver_resolver
+        import perf_metrics
+
+        rng = random.Random(seed)
+        service = Service(driver_resolver.resolve().path)
+        driver = webdriver.Chrome(service=service,
+                                  options=browser_profiles.chrome_options(browser_profiles.PROFILES["headless"]))
+        try:
+            while time.perf_counter() < deadline:
+                for step in SCENARIOS[self._pick(rng)][1]:
+                    driver.get(self.catalog.url(step, rng))
+                    metrics = driver.execute_script(perf_metrics.METRICS_JS) or {}
+                    for name in ("ttfb", "load", "fcp", "lcp"):
+                        if metrics.get(name) is not None:
+                            self.browser_metrics[step][name].append(metrics[name])
+        finally:
+            driver.quit()
+
+    async def _run(self):
+        self.catalog = Catalog(self.base_url)
+        connector = aiohttp.TCPConnector(limit=max(self.users, 100), ttl_dns_cache=300)
+        deadline = time.perf_counter() + self.duration
+        jobs = [asyncio.to_thread(self._browser, deadline, self.rng.random()) for _ in range(self.browsers)]
+        if self.rate:
+            jobs.append(self._arrivals(connector, deadline))
+        else:
+            jobs += [self._user(connector, deadline, random.Random(self.rng.random())) for _ in range(self.users)]
+        try:
+            await asyncio.gather(*jobs)
+        finally:
+            await connector.close()
+
+    def run(self):
+        start = time.perf_counter()
+        asyncio.run(self._run())
+        return self.results(time.perf_counter() - start)
+
+    def results(self, elapsed):
+        results = self.recorder.as_dict(elapsed)
+        results["config"] = {"base_url": self.base_url, "mix": self.mix, "duration": self.duration,
+                             "users": self.users, "rate": self.rate, "think": self.think, "browsers": self.browsers}
+        results["peak_in_flight"] = self.peak_in_flight
+        results["browser"] = {step: {name: {f"p{p}": perf_stats.percentile(values, p) for p in PERCENTILES}
+                                     for name, values in metrics.items()}
+                              for step, metrics in sorted(self.browser_metrics.items())}
+        return results
+
+
+def summary_lines(results):
+    lines = [f"{results['requests']} requests in {results['elapsed']:.1f}s, "
+             f"{results['throughput']:.1f} req/s, {results['errors']} errors, "
+             f"peak {results['peak_in_flight']} in flight"]
+    lines.append(f"{'step':<12}{'requests':>9}{'errors':>8}{'req/s':>8}{'p50':>8}{'p95':>8}{'p99':>8}{'KiB':>8}  (ms)")
+    for step, stats in results["steps"].items():
+        lines.append(f"{step:<12}{stats['requests']:>9}{stats['errors']:>8}{stats['throughput']:>8.1f}"
+                     f"{stats['p50']:>8.0f}{stats['p95']:>8.0f}{stats['p99']:>8.0f}{stats['avg_bytes'] / 1024:>8.1f}")
+    if results["browser"]:
+        lines.append("browser timings (p50/p95, ms):")
+        for step, metrics in results["browser"].items():
+            lines.append(f"  {step:<12}" + "  ".join(
+                f"{name} {values['p50']:.0f}/{values['p95']:.0f}" for name, values in metrics.items()))
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run OpenCart test scenarios as concurrent load")
+    parser.add_argument("--base-url", default="http://localhost")
+    parser.add_argument("--mix", type=parse_mix, default=MIXES["browse"],
+                        help=f"named mix ({', '.join(MIXES)}) or weights like 'search=3,product=1' (default: browse)")
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds of load (default: 60)")
+    load = parser.add_mutually_exclusive_group()
+    load.add_argument("--users", type=int, default=10, help="concurrent virtual shoppers (default: 10)")
+    load.add_argument("--rate", type=float, default=0.0, help="new shoppers per second instead of --users")
+    parser.add_argument("--think", type=float, default=0.0, help="pause between scenarios of one shopper, seconds")
+    parser.add_argument("--browsers", type=int, default=0, help="real Chrome sessions for front-end timings")
+    parser.add_argument("--seed", type=int, default=None, help="seed for scenario choice and arrivals")
+    parser.add_argument("--out", default=os.path.join("reports", "load_results.json"))
+    args = parser.parse_args()
+
+    run = LoadRun(args.base_url, args.mix, args.duration, users=args.users, rate=args.rate,
+                  think=args.think, browsers=args.browsers, seed=args.seed)
+    results = run.run()
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    for line in summary_lines(results):
+        print(line)
+    print(f"details: {args.out}")
+    return 1 if results["errors"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,175 @@
+"""Реестр локаторов с учетом темы магазина
+
+У каждого логического элемента (логотип, поле поиска, корзина, ...) есть
+список вариантов селектора для разных тем OpenCart. Реестр один раз за прогон
+определяет тему, одним скриптом проверяет, какие варианты есть на странице,
+и сохраняет профиль в кэш pytest (.pytest_cache) с ключом по теме и версии.
+Дальше тесты используют только совпавшие варианты и не ждут implicit wait
+на поиск отсутствующих. Если сохраненный селектор не находит элемент,
+варианты проверяются заново, и профиль обновляется совпавшими. Проверки
+ждут, пока документ разобран: со стратегиями загрузки eager и none
+driver.get возвращается раньше.
+"""
+from selenium.webdriver.common.by import By
+
+import waits
+
+
+LOCATORS = {
+    "logo": ["img[alt*='Your Store']", "img[alt*='Store']", ".logo img", "#logo img"],
+    "search_button": ["button[type='submit'].btn-default", ".btn-search", "button.btn.btn-default"],
+    "nav_menu": [".navbar-nav", ".nav", ".menu"],
+    "nav_links": [".navbar-nav a", ".nav a", ".menu a"],
+    "categories": [".list-group-item", ".category-link"],
+    "product": [".product-thumb", ".product-item", ".product"],
+    "product_link": [".product-thumb a", ".product-item a", ".product a"],
+    "price": [".price", ".price-new", ".price-old"],
+    "cart_button": [".btn-inverse", "#cart", ".cart", "[title*='cart']", "[title*='Cart']"],
+    "cart_content": [".dropdown-menu", ".cart-content", ".shopping-cart"],
+    "currency_form": [".currency", "#form-currency"],
+    "currency_options": [".currency option", ".currency a"],
+    "language_form": [".language", "#form-language"],
+    "footer": ["footer", ".footer"],
+    "footer_links": ["footer a", ".footer a"],
+    "header": ["header", ".header", "nav"],
+    "dropdown": [".dropdown", ".dropdown-toggle"],
+    "dropdown_menu": [".dropdown-menu", ".dropdown-content"],
+}
+
+CACHE_PREFIX = "opencart/locators/"
+
+THEME_JS = """
+if (document.readyState === 'loading') { return null; }
+var assets = Array.prototype.map.call(
+  document.querySelectorAll('link[rel=stylesheet][href], script[src]'),
+  function (el) { return el.getAttribute('href') || el.getAttribute('src'); });
+var theme = null;
+assets.forEach(function (url) {
+  var match = url.match(/catalog\\/view\\/theme\\/([\\w-]+)\\//);
+  if (match && !theme) { theme = match[1]; }
+});
+var family = document.querySelector('[data-oc-toggle], [data-oc-target]') ? 'oc4'
+  : (document.querySelector('#form-currency, #form-language') ? 'oc2-3' : 'unknown');
+return [theme || 'unknown', family];
+"""
+
+PROBE_JS = """
+if (document.readyState === 'loading') { return null; }
+var locators = arguments[0], result = {};
+Object.keys(locators).forEach(function (name) {
+  result[name] = locators[name].filter(function (selector) {
+    return document.querySelector(selector) !== null;
+  });
+});
+return result;
+"""
+
+# Элементы по сохраненному селектору, а если их нет - по совпавшим вариантам:
+# [селектор или null, элементы или null, если они не нужны]
+LOOKUP_JS = """
+if (document.readyState === 'loading') { return null; }
+var cached = arguments[0], variants = arguments[1], withElements = arguments[2];
+function found(selector) {
+  return [selector, withElements ? Array.from(document.querySelectorAll(selector)) : null];
+}
+if (cached && document.querySelector(cached) !== null) { return found(cached); }
+var matched = variants.filter(function (selector) { return document.querySelector(selector) !== null; });
+return matched.length ? found(matched.join(', ')) : [null, withElements ? [] : null];
+"""
+
+
+class LocatorRegistry:
+    """Профиль темы на прогон: логическое имя -> селектор из совпавших вариантов"""
+
+    def __init__(self, cache=None, locators=LOCATORS):
+        self.cache = cache
+        self.locators = locators
+        self.profile_key = None
+        self.from_cache = False
+        self.resolved = {}
+
+    def bind(self, driver):
+        """Локаторы для конкретной сессии WebDriver"""
+        return PageLocators(self, driver)
+
+    def detect(self, driver):
+        """Определяет тему по текущей странице и загружает профиль из кэша"""
+        # Ключ не зависит от страницы: ресурсы на страницах разные, а тема и семейство OpenCart - одни
+        theme, family = waits.until(driver, lambda d: d.execute_script(THEME_JS), "locator_probe")
+        self.profile_key = f"{theme}-{family}"
+
+        cached = self.cache.get(CACHE_PREFIX + self.profile_key, None) if self.cache is not None else None
+        if cached:
+            self.resolved.update(cached)
+            self.from_cache = True
+        print(f"Locator profile {self.profile_key} ({'cached' if self.from_cache else 'new'})")
+
+    def probe(self, driver, names):
+        """Проверяет варианты неизвестных элементов на текущей странице одним скриптом"""
+        locators = {name: self.locators[name] for name in names}
+        matched = waits.until(driver, lambda d: d.execute_script(PROBE_JS, locators), "locator_probe")
+        self._update({name: ", ".join(selectors) for name, selectors in matched.items() if selectors})
+
+    def _update(self, found):
+        changed = {name: selector for name, selector in found.items() if self.resolved.get(name) != selector}
+        if changed:
+            self.resolved.update(changed)
+            if self.cache is not None:
+                self.cache.set(CACHE_PREFIX + self.profile_key, self.resolved)
+
+    def lookup(self, driver, name, with_elements=False):
+        """Селектор элемента на текущей странице и, если нужны, его элементы
+
+        Сохраненный селектор перепроверяется; если он ничего не нашел, проверяются
+        все варианты, и совпавшие заменяют его в профиле. Отсутствие не кэшируется:
+        элемента может не быть только на этой странице.
+        """
+        if self.profile_key is None:
+            self.detect(driver)
+        if name not in self.resolved:
+            # Неизвестные элементы проверяются все сразу: профиль заполняется за одну проверку
+            self.probe(driver, [other for other in self.locators if other not in self.resolved])
+            if not with_elements or name not in self.resolved:
+                return self.resolved.get(name), [] if with_elements else None
+        cached, variants = self.resolved.get(name), self.locators[name]
+        selector, elements = waits.until(
+            driver, lambda d: d.execute_script(LOOKUP_JS, cached, variants, with_elements), "locator_probe")
+        if selector:
+            self._update({name: selector})
+        return selector, elements
+
+    def selector(self, driver, name):
+        return self.lookup(driver, name)[0]
+
+
+class PageLocators:
+    """Обертка реестра над сессией WebDriver, которую получают тесты"""
+
+    def __init__(self, registry, driver):
+        self.registry = registry
+        self.driver = driver
+
+    def selector(self, name):
+        """Селектор темы для элемента или None, если его нет на текущей странице"""
+        return self.registry.selector(self.driver, name)
+
+    def css(self, name):
+        """CSS-селектор элемента
+
+        Если вариант пока не найден, возвращается полный список вариантов,
+        чтобы явное ожидание могло дождаться появления элемента.
+        """
+        return self.selector(name) or ", ".join(self.registry.locators[name])
+
+    def by(self, name):
+        """Локатор для find_element/expected_conditions"""
+        return By.CSS_SELECTOR, self.css(name)
+
+    def find_all(self, name):
+        """Все элементы без implicit wait: пустой список, если элемента нет"""
+        return self.registry.lookup(self.driver, name, with_elements=True)[1]
+
+    def find(self, name):
+        """Первый элемент или None без implicit wait"""
+        elements = self.find_all(name)
+        return elements[0] if elements else None
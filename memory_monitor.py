@@ -0,0 +1,159 @@
+"""Рост памяти браузера и DOM за тест
+
+Сессия из пула проходит через много тестов в одном браузере, поэтому утечка
+в JS магазина или брошенные вкладки проявляются только медленным концом
+прогона. До и после каждого теста снимаются метрики CDP
+Performance.getMetrics текущей вкладки (куча JS, узлы DOM, обработчики
+событий, документы), RSS браузера и число вкладок. Замер "до" делается
+на about:blank после сброса сессии пулом, замер "после" - на странице,
+где тест закончился: утечка JS или DOM страницы видна только там. Еще
+один замер на about:blank после ухода со страницы - базовый для браузера:
+его рост показывает то, что пережило документ (вкладки, RSS, документы
+в памяти). Рост на странице сравнивается с
+порогами из memory_thresholds.json. С --memory-gc перед каждым замером
+вызывается сборка мусора (HeapProfiler.collectGarbage): остается только
+то, что страница действительно удерживает.
+"""
+import json
+import os
+
+import psutil
+from selenium.common.exceptions import WebDriverException
+
+import driver_pool
+
+
+METRICS = ("JSHeapUsedSize", "Nodes", "JSEventListeners", "Documents")
+
+DEFAULT_THRESHOLDS = {
+    "JSHeapUsedSize": 30 * 1024 * 1024,
+    "Nodes": 10000,
+    "JSEventListeners": 2000,
+    "Documents": 5,
+    # RSS chromedriver и всех процессов Chrome, МиБ
+    "rss_mb": 200,
+    # Вкладки, оставленные тестом (пул их закроет, но до сброса они живут)
+    "windows": 0,
+}
+
+UNITS = {"JSHeapUsedSize": 1024 * 1024}
+
+
+def load_thresholds(path):
+    thresholds = dict(DEFAULT_THRESHOLDS)
+    if path and os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            thresholds.update(json.load(f))
+    return thresholds
+
+
+class MemorySampler:
+    """Замеры памяти одной сессии WebDriver"""
+
+    def __init__(self, driver, force_gc=False):
+        self.driver = driver
+        self.force_gc = force_gc
+
+    def _metrics(self):
+        if self.force_gc:
+            self.driver.execute_cdp_cmd("HeapProfiler.collectGarbage", {})
+        if not getattr(self.driver, "_autotest_performance_enabled", False):
+            self.driver.execute_cdp_cmd("Performance.enable", {})
+            self.driver._autotest_performance_enabled = True
+        metrics = self.driver.execute_cdp_cmd("Performance.getMetrics", {})["metrics"]
+        return {item["name"]: item["value"] for item in metrics}
+
+    def sample(self):
+        """Метрики текущей вкладки, RSS браузера в МиБ и число вкладок; None для недоступных"""
+        try:
+            metrics = self._metrics()
+        except WebDriverException:
+            metrics = {}
+        values = {name: metrics.get(name) for name in METRICS}
+        try:
+            values["rss_mb"] = round(driver_pool.memory_mb(self.driver), 1)
+        except (psutil.Error, AttributeError):
+            values["rss_mb"] = None
+        try:
+            values["windows"] = len(self.driver.window_handles)
+        except WebDriverException:
+            values["windows"] = None
+        return values
+
+    def sample_after(self):
+        """Замеры на странице, где тест закончился, и на about:blank после ухода с нее"""
+        page = self.sample()
+        try:
+            driver_pool.leave_page(self.driver)
+        except WebDriverException:
+            pass
+        return page, self.sample()
+
+
+def growth(before, after):
+    return {name: after[name] - before[name] for name in before
+            if before[name] is not None and after.get(name) is not None}
+
+
+def record(test, worker, before, after, thresholds, blank=None):
+    """Запись теста для отчета: замеры до и после, рост на странице и на about:blank, превышения порогов"""
+    delta = growth(before, after)
+    return {"test": test, "worker": worker, "before": before, "after": after, "delta": delta,
+            "blank": blank, "blank_delta": growth(before, blank) if blank else {},
+            "violations": violations(delta, thresholds)}
+
+
+def _amount(name, value):
+    if name in UNITS:
+        return f"{value / UNITS[name]:+.1f} MiB"
+    if name == "rss_mb":
+        return f"{value:+.1f} MiB"
+    return f"{value:+.0f}"
+
+
+def violations(delta, thresholds):
+    """Метрики, рост которых выше порога"""
+    return [f"{name} {_amount(name, value)} > {_amount(name, thresholds[name]).lstrip('+')}"
+            for name, value in sorted(delta.items())
+            if thresholds.get(name) is not None and value > thresholds[name]]
+
+
+def describe(delta):
+    """Короткая строка роста для отчета"""
+    return ", ".join(f"{name} {_amount(name, delta[name])}"
+                     for name in METRICS + ("rss_mb", "windows") if delta.get(name))
+
+
+def write_results(path, records):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"tests": records}, f, ensure_ascii=False, indent=2)
+
+
+def summary_lines(records, top=10):
+    """Тесты с наибольшим ростом кучи, RSS браузера от начала к концу прогона и превышения порогов"""
+    lines = [f"{'test':<60}{'heap MiB':>10}{'nodes':>8}{'listeners':>11}{'docs':>6}{'rss MiB':>9}{'tabs':>6}"]
+
+    def cell(record, name, scale=1, digits=0):
+        value = record["delta"].get(name)
+        return f"{value / scale:+.{digits}f}" if value is not None else "-"
+
+    by_heap = sorted(records, key=lambda record: -(record["delta"].get("JSHeapUsedSize") or 0))
+    for record in by_heap[:top]:
+        lines.append(f"{record['test'][-59:]:<60}{cell(record, 'JSHeapUsedSize', 1024 * 1024, 1):>10}"
+                     f"{cell(record, 'Nodes'):>8}{cell(record, 'JSEventListeners'):>11}"
+                     f"{cell(record, 'Documents'):>6}{cell(record, 'rss_mb', 1, 1):>9}{cell(record, 'windows'):>6}")
+
+    # Сессии живут в своем процессе, поэтому тренд RSS считается по воркерам
+    by_worker = {}
+    for record in records:
+        if record["before"]["rss_mb"] is not None:
+            by_worker.setdefault(record["worker"], []).append(record["before"]["rss_mb"])
+    for worker, rss in sorted(by_worker.items()):
+        if len(rss) > 1:
+            lines.append(f"{worker}: browser RSS before the first and the last of {len(rss)} tests: "
+                         f"{rss[0]:.0f} -> {rss[-1]:.0f} MiB")
+    for record in records:
+        for problem in record["violations"]:
+            lines.append(f"memory growth: {problem} in {record['test']}")
+    return lines
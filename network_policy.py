@@ -0,0 +1,246 @@
+"""Политики сетевых запросов: блокировка лишних ресурсов через CDP
+
+Функциональным тестам обычно не нужны шрифты, сторонние скрипты и
+картинки товаров, а driver.get ждет и их. Политика - список шаблонов
+адресов для Network.setBlockedURLs (поддерживается '*') и, по желанию,
+запрет запросов к чужим хостам. Политика прогона задается опцией
+--network-policy, тест уточняет ее маркером:
+
+    @pytest.mark.network_policy("none")
+    @pytest.mark.network_policy("no_images", block=["*.woff2*"], allow=["cdn.example.com"])
+
+Шаблоны в setBlockedURLs не умеют исключений, поэтому запрет чужих хостов
+строится по хостам, замеченным в журнале производительности Chrome:
+новый сторонний хост блокируется со следующей навигации. Хосты прошлого
+прогона хранятся в кэше pytest и блокируются с первой загрузки; запросы к
+еще не известным хостам считаются утечками и выводятся в сводке. allow -
+чужие хосты, которые остаются разрешены. Из того же журнала считаются
+заблокированные запросы, а их размер берется из загрузок этих же адресов
+без блокировки в текущем процессе.
+"""
+import json
+from collections import namedtuple
+from urllib.parse import urlsplit
+
+from selenium.common.exceptions import WebDriverException
+
+import driver_hooks
+import perf_metrics
+import perf_stats
+
+
+IMAGE_PATTERNS = ("*.jpg*", "*.jpeg*", "*.png*", "*.gif*", "*.webp*", "*.avif*", "*.svg*", "*.ico*")
+FONT_PATTERNS = ("*.woff*", "*.ttf*", "*.otf*", "*.eot*")
+
+NetworkPolicy = namedtuple("NetworkPolicy", "name block same_origin allow")
+
+POLICIES = {
+    "none": NetworkPolicy("none", (), False, ()),
+    "no_images": NetworkPolicy("no_images", IMAGE_PATTERNS, False, ()),
+    "no_fonts": NetworkPolicy("no_fonts", FONT_PATTERNS, False, ()),
+    "same_origin": NetworkPolicy("same_origin", (), True, ()),
+    # Только HTML, CSS и скрипты самого магазина
+    "lean": NetworkPolicy("lean", IMAGE_PATTERNS + FONT_PATTERNS, True, ()),
+}
+
+# Причина блокировки в Network.loadingFailed для Network.setBlockedURLs
+BLOCKED_REASON = "inspector"
+
+# Ключ кэша pytest с чужими хостами прошлого прогона
+CACHE_KEY = "opencart/foreign_hosts"
+
+
+def for_item(item, session_policy):
+    """Политика теста: маркер network_policy поверх политики прогона"""
+    marker = item.get_closest_marker("network_policy")
+    if marker is None:
+        return session_policy
+    policy = POLICIES[marker.args[0]] if marker.args else session_policy
+    block = tuple(marker.kwargs.get("block", ()))
+    allow = tuple(marker.kwargs.get("allow", ()))
+    same_origin = marker.kwargs.get("same_origin", policy.same_origin)
+    if not block and not allow and same_origin == policy.same_origin:
+        return policy
+    return NetworkPolicy(f"{policy.name}+custom", policy.block + block, same_origin, policy.allow + allow)
+
+
+def enabled(policy):
+    return bool(policy.block or policy.same_origin)
+
+
+class NetworkLearning:
+    """Что процесс узнал о сети за прогон: чужие хосты и размеры ресурсов по адресам
+
+    known_hosts - хосты прошлого прогона, они блокируются сразу; seen - хосты,
+    запрошенные в этом прогоне, их сохраняют для следующего.
+    """
+
+    def __init__(self, known_hosts=()):
+        self.foreign_hosts = set(known_hosts)
+        self.seen = set()
+        self.sizes = {}
+
+
+class PolicySession:
+    """Политика в одной сессии WebDriver на время теста
+
+    Перед каждой навигацией журнал производительности вычитывается, а список
+    блокировок обновляется, если появились новые сторонние хосты. В конце
+    теста блокировки снимаются: сессия возвращается в пул чистой.
+    """
+
+    def __init__(self, driver, policy, base_url, learning):
+        self.driver = driver
+        self.policy = policy
+        self.host = urlsplit(base_url).hostname
+        self.learning = learning
+        self.requests = 0
+        self.blocked = []
+        self.leaked = 0
+        self._urls = {}
+        self._applied = ()
+        # Записи журнала от предыдущего теста этой сессии не считаются
+        self._drain()
+        self.requests, self.blocked, self.leaked = 0, [], 0
+        self._hooks = driver_hooks.hooks(driver)
+        self._hooks.before.append(self._before_command)
+
+    def _before_command(self, command, params):
+        if command in perf_metrics.NAVIGATION_COMMANDS:
+            self.sync()
+
+    def patterns(self):
+        patterns = list(self.policy.block)
+        if self.policy.same_origin:
+            allowed = set(self.policy.allow)
+            patterns += [f"*://{host}/*" for host in sorted(self.learning.foreign_hosts - allowed)]
+        return tuple(patterns)
+
+    def _set_blocked(self, patterns):
+        if not getattr(self.driver, "_autotest_network_enabled", False):
+            self.driver.execute_cdp_cmd("Network.enable", {})
+            self.driver._autotest_network_enabled = True
+        self.driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": list(patterns)})
+        self._applied = patterns
+
+    def sync(self):
+        """Разбор журнала и обновление блокировок перед навигацией"""
+        self._drain()
+        patterns = self.patterns()
+        if patterns != self._applied:
+            try:
+                self._set_blocked(patterns)
+            except WebDriverException:
+                pass
+
+    def _drain(self):
+        try:
+            entries = self.driver.get_log("performance")
+        except WebDriverException:
+            return
+        for entry in entries:
+            message = json.loads(entry["message"])["message"]
+            method, params = message.get("method"), message.get("params", {})
+            if method == "Network.requestWillBeSent":
+                url = params["request"]["url"]
+                self._urls[params["requestId"]] = url
+                self.requests += 1
+                host = urlsplit(url).hostname
+                if url.startswith("http") and host and host != self.host:
+                    self.learning.foreign_hosts.add(host)
+                    self.learning.seen.add(host)
+                    # Хост еще не был в списке блокировок: запрос ушел в сеть
+                    if (self.policy.same_origin and host not in self.policy.allow
+                            and f"*://{host}/*" not in self._applied):
+                        self.leaked += 1
+            elif method == "Network.loadingFinished":
+                url = self._urls.get(params["requestId"])
+                if url and params.get("encodedDataLength"):
+                    self.learning.sizes[url] = params["encodedDataLength"]
+            elif method == "Network.loadingFailed" and params.get("blockedReason") == BLOCKED_REASON:
+                url = self._urls.get(params["requestId"])
+                if url:
+                    self.blocked.append(url)
+
+    def finish(self):
+        """Снимает блокировки и возвращает итоги теста для PolicyStats.add"""
+        self._hooks.before.remove(self._before_command)
+        self._drain()
+        if self._applied:
+            try:
+                self._set_blocked(())
+            except WebDriverException:
+                pass
+        sizes = [self.learning.sizes.get(url) for url in self.blocked]
+        return {
+            "policy": self.policy.name,
+            "requests": self.requests,
+            "blocked": len(self.blocked),
+            "leaked": self.leaked,
+            "bytes_avoided": sum(size for size in sizes if size),
+            "unknown_size": sum(1 for size in sizes if not size),
+            "blocked_hosts": sorted({urlsplit(url).hostname for url in self.blocked if urlsplit(url).hostname}),
+        }
+
+
+class PolicyStats:
+    """Итоги политик за прогон: тесты, запросы, заблокированные запросы и байты"""
+
+    def __init__(self):
+        self.by_policy = {}
+
+    def _add(self, name, tests, result):
+        stats = self.by_policy.setdefault(name, {
+            "tests": 0, "requests": 0, "blocked": 0, "leaked": 0, "bytes_avoided": 0, "unknown_size": 0,
+            "blocked_hosts": []})
+        stats["tests"] += tests
+        for key in ("requests", "blocked", "leaked", "bytes_avoided", "unknown_size"):
+            stats[key] += result[key]
+        stats["blocked_hosts"] = sorted(set(stats["blocked_hosts"]) | set(result["blocked_hosts"]))
+
+    def add(self, result):
+        self._add(result["policy"], 1, result)
+
+    def as_dict(self):
+        return self.by_policy
+
+    def merge(self, other):
+        """Добавляет итоги воркера xdist (as_dict)"""
+        for name, stats in other.items():
+            self._add(name, stats["tests"], stats)
+
+
+def time_saved(pages, policy):
+    """Экономия времени загрузки под политикой, мс: медиана маршрута без политики минус load страницы
+
+    Берутся только маршруты, которые в этом прогоне открывались и без блокировок.
+    """
+    baseline = {}
+    for page in pages:
+        if page.get("network_policy", "none") == "none" and page.get("load") is not None:
+            baseline.setdefault(page["route"], []).append(page["load"])
+    saved = [perf_stats.median(baseline[page["route"]]) - page["load"] for page in pages
+             if page.get("network_policy") == policy and page.get("load") is not None and page["route"] in baseline]
+    if not saved:
+        return None, 0
+    return sum(saved), len(saved)
+
+
+def summary_lines(stats, pages):
+    lines = [f"{'policy':<24}{'tests':>6}{'requests':>10}{'blocked':>9}{'KiB avoided':>13}{'load saved, s':>15}{'pages':>7}"]
+    for name, item in sorted(stats.items()):
+        if name == "none":
+            continue
+        saved, compared = time_saved(pages, name)
+        kib = f"{item['bytes_avoided'] / 1024:.0f}" + ("+" if item["unknown_size"] else "")
+        seconds = f"{saved / 1000:.2f}" if saved is not None else "-"
+        lines.append(f"{name[:23]:<24}{item['tests']:>6}{item['requests']:>10}{item['blocked']:>9}{kib:>13}"
+                     f"{seconds:>15}{compared:>7}")
+        if item["blocked_hosts"]:
+            lines.append(f"  blocked hosts: {', '.join(item['blocked_hosts'][:8])}")
+        if item["leaked"]:
+            lines.append(f"  leaked: {item['leaked']} request(s) to foreign hosts not yet known to the block list")
+    if len(lines) > 1:
+        lines.append("KiB avoided counts blocked URLs seen unblocked in the same process; '+' marks unknown sizes")
+        lines.append("load saved: route median without a policy minus page load, summed over compared pages")
+    return lines
@@ -0,0 +1,57 @@
+"""Учет времени воркеров pytest-xdist и оценка выигрыша от параллельного запуска
+
+Каждый воркер считает свое время (занятость тестами и общее время жизни)
+и передает его контроллеру через config.workeroutput. Контроллер сравнивает
+сумму занятости воркеров (оценка последовательного прогона) с фактическим
+временем всего прогона.
+"""
+import time
+
+
+OUTPUT_KEY = "autotest_timing"
+
+
+def worker_id(config):
+    """Идентификатор воркера xdist ('gw0', 'gw1', ...) или 'master' без xdist"""
+    workerinput = getattr(config, "workerinput", None)
+    return workerinput["workerid"] if workerinput else "master"
+
+
+def is_worker(config):
+    return hasattr(config, "workerinput")
+
+
+class WorkerTimer:
+    """Время одного процесса pytest: сколько он жил и сколько был занят тестами"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.busy = 0.0
+        self.tests = 0
+
+    def add(self, report):
+        """Учитывает отчет одной фазы теста (setup/call/teardown)"""
+        self.busy += report.duration
+        if report.when == "teardown":
+            self.tests += 1
+
+    def as_dict(self):
+        return {
+            "tests": self.tests,
+            "busy": self.busy,
+            "wall": time.perf_counter() - self.started,
+        }
+
+
+def summary_lines(workers, wall):
+    """Строки сводки по воркерам; workers - {worker_id: WorkerTimer.as_dict()}"""
+    lines = [f"{'worker':<8}{'tests':>7}{'busy, s':>10}{'wall, s':>10}{'load':>7}"]
+    for name, stats in sorted(workers.items()):
+        load = stats["busy"] / stats["wall"] if stats["wall"] else 0.0
+        lines.append(f"{name:<8}{stats['tests']:>7}{stats['busy']:>10.2f}{stats['wall']:>10.2f}{load:>7.0%}")
+
+    serial = sum(stats["busy"] for stats in workers.values())
+    speedup = serial / wall if wall else 0.0
+    lines.append(f"serial estimate {serial:.2f}s, parallel wall {wall:.2f}s, "
+                 f"saved {serial - wall:.2f}s (x{speedup:.2f} on {len(workers)} workers)")
+    return lines
@@ -0,0 +1,135 @@
+"""История замеров и поиск регрессий производительности
+
+Каждый прогон дописывает строку JSON в reports/perf_history.jsonl: время
+вызова каждого теста и медианы метрик загрузки по маршрутам, с git-ревизией
+и окружением (адрес витрины или профиль сети заменителя, профиль браузера,
+стратегия загрузки, число воркеров). Текущий прогон сравнивается со скользящей
+базой из последних N прогонов того же окружения:
+значение считается регрессией, если оно выше медианы базы больше чем на
+threshold * MAD (масштабированное к σ) и одновременно превышает ее на
+заданную долю и абсолютный порог, чтобы не реагировать на шум.
+"""
+import json
+import os
+import subprocess
+import time
+from collections import namedtuple
+
+import perf_stats
+
+
+# Метрики страниц, которые попадают в историю
+PAGE_METRICS = ("ttfb", "dom_content_loaded", "load", "fcp", "lcp")
+
+# Пороги шума: (минимальный относительный рост, минимальный абсолютный рост)
+NOISE_FLOOR = {
+    "duration": (0.2, 0.1),   # секунды
+    "page": (0.2, 50.0),      # миллисекунды
+}
+
+Regression = namedtuple("Regression", "kind key metric current baseline spread runs")
+
+
+def git_revision(cwd=None):
+    """Короткий хэш HEAD и признак незакоммиченных изменений"""
+    try:
+        revision = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=cwd,
+                                  capture_output=True, text=True, timeout=5).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=cwd,
+                                    capture_output=True, text=True, timeout=5).stdout.strip())
+    except (OSError, subprocess.SubprocessError):
+        return "unknown", False
+    return revision or "unknown", dirty
+
+
+def environment(target, profile, workers):
+    """Ключ окружения: замеры с разных витрин, профилей и числа воркеров не сравниваются"""
+    return {
+        "target": target,
+        "browser_profile": profile.name,
+        "page_load_strategy": profile.page_load_strategy,
+        "workers": workers,
+    }
+
+
+def build_run(durations, pages, revision, dirty, env):
+    """Запись прогона: durations - {nodeid: секунды}, pages - метрики из perf_metrics, env - из environment()"""
+    by_route = {}
+    for page in pages:
+        by_route.setdefault(page["route"], []).append(page)
+
+    routes = {}
+    for route, route_pages in by_route.items():
+        routes[route] = {}
+        for metric in PAGE_METRICS:
+            value = perf_stats.median([page[metric] for page in route_pages if page.get(metric) is not None])
+            if value is not None:
+                routes[route][metric] = value
+
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "revision": revision,
+        "dirty": dirty,
+        "environment": env,
+        "tests": durations,
+        "pages": routes,
+    }
+
+
+def load_history(path):
+    if not os.path.exists(path):
+        return []
+    runs = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                runs.append(json.loads(line))
+    return runs
+
+
+def append_run(path, run):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(run, ensure_ascii=False) + "\n")
+
+
+def _is_regression(current, history, kind, threshold):
+    baseline = perf_stats.median(history)
+    spread = perf_stats.mad(history) * perf_stats.MAD_SCALE
+    min_relative, min_absolute = NOISE_FLOOR[kind]
+    limit = max(baseline + threshold * spread, baseline * (1 + min_relative), baseline + min_absolute)
+    return current > limit, baseline, spread
+
+
+def compare(run, history, window=10, min_runs=3, threshold=3.0):
+    """Регрессии текущего прогона относительно последних window прогонов того же окружения"""
+    recent = [past for past in history if past.get("environment") == run["environment"]][-window:]
+    regressions = []
+
+    for nodeid, current in run["tests"].items():
+        values = [past["tests"][nodeid] for past in recent if nodeid in past["tests"]]
+        if len(values) < min_runs:
+            continue
+        regressed, baseline, spread = _is_regression(current, values, "duration", threshold)
+        if regressed:
+            regressions.append(Regression("test", nodeid, "duration", current, baseline, spread, len(values)))
+
+    for route, metrics in run["pages"].items():
+        for metric, current in metrics.items():
+            values = [past["pages"][route][metric] for past in recent
+                      if metric in past["pages"].get(route, {})]
+            if len(values) < min_runs:
+                continue
+            regressed, baseline, spread = _is_regression(current, values, "page", threshold)
+            if regressed:
+                regressions.append(Regression("page", route, metric, current, baseline, spread, len(values)))
+
+    return regressions
+
+
+def describe(regression):
+    unit = "s" if regression.kind == "test" else "ms"
+    return (f"{regression.key} {regression.metric}: {regression.current:.2f}{unit} vs baseline median "
+            f"{regression.baseline:.2f}{unit} ±{regression.spread:.2f} over {regression.runs} runs "
+            f"(+{(regression.current / regression.baseline - 1) * 100 if regression.baseline else 0:.0f}%)")
@@ -0,0 +1,255 @@
+"""Метрики загрузки страниц: Navigation Timing, Resource Timing, Paint и Web Vitals
+
+Метрики текущего документа снимаются перед командой, которая может увести
+со страницы (get, back, forward, refresh, click, закрытие вкладки), и в
+конце теста, но только если документ мог смениться после прошлого снимка:
+после тех же команд или смены вкладки. Метрики и дополнительные скрипты
+снимаются одним запросом. Результаты всех тестов пишутся в JSON файл,
+а бюджеты по маршрутам OpenCart задаются в perf_budgets.json.
+"""
+import contextlib
+import json
+import os
+from urllib.parse import parse_qs, urlsplit
+
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.remote.command import Command
+
+import driver_hooks
+import perf_stats
+import waits
+
+
+NAVIGATION_COMMANDS = {
+    Command.GET,
+    Command.GO_BACK,
+    Command.GO_FORWARD,
+    Command.REFRESH,
+    Command.CLICK_ELEMENT,
+    Command.CLOSE,
+    Command.SWITCH_TO_WINDOW,
+}
+
+# Перед ними снимается текущий документ, если он еще не снят
+HARVEST_COMMANDS = {
+    Command.GET,
+    Command.GO_BACK,
+    Command.GO_FORWARD,
+    Command.REFRESH,
+    Command.CLICK_ELEMENT,
+    Command.CLOSE,
+}
+
+# После них текущий документ может быть другим
+DOCUMENT_COMMANDS = HARVEST_COMMANDS | {Command.SWITCH_TO_WINDOW}
+
+# Метрики, для которых задаются бюджеты (мс, байты, CLS без единиц)
+BUDGET_METRICS = ("ttfb", "dom_content_loaded", "load", "fcp", "lcp", "cls", "transfer_bytes", "resource_count")
+
+METRICS_JS = """
+var nav = performance.getEntriesByType('navigation')[0];
+if (!nav || location.protocol.indexOf('http') !== 0) { return null; }
+
+function buffered(type) {
+  try {
+    var observer = new PerformanceObserver(function () {});
+    observer.observe({type: type, buffered: true});
+    var entries = observer.takeRecords();
+    observer.disconnect();
+    return entries;
+  } catch (e) {
+    return [];
+  }
+}
+
+function ms(value) { return value > 0 ? Math.round(value * 10) / 10 : null; }
+
+var paints = {};
+performance.getEntriesByType('paint').forEach(function (entry) { paints[entry.name] = entry.startTime; });
+var lcp = buffered('largest-contentful-paint');
+var cls = buffered('layout-shift').reduce(function (sum, entry) {
+  return entry.hadRecentInput ? sum : sum + entry.value;
+}, 0);
+
+var resources = performance.getEntriesByType('resource'), byType = {};
+var transfer = nav.transferSize, encoded = nav.encodedBodySize, decoded = nav.decodedBodySize;
+resources.forEach(function (entry) {
+  byType[entry.initiatorType] = (byType[entry.initiatorType] || 0) + 1;
+  transfer += entry.transferSize;
+  encoded += entry.encodedBodySize;
+  decoded += entry.decodedBodySize;
+});
+
+return {
+  url: location.href,
+  time_origin: performance.timeOrigin,
+  status: nav.responseStatus || null,
+  ttfb: ms(nav.responseStart - nav.startTime),
+  dom_content_loaded: ms(nav.domContentLoadedEventEnd),
+  load: ms(nav.loadEventEnd),
+  fcp: ms(paints['first-contentful-paint']),
+  lcp: lcp.length ? ms(lcp[lcp.length - 1].startTime) : null,
+  cls: Math.round(cls * 10000) / 10000,
+  transfer_bytes: transfer,
+  encoded_bytes: encoded,
+  decoded_bytes: decoded,
+  resource_count: resources.length,
+  resources_by_type: byType
+};
+"""
+
+LOAD_EVENT_JS = """
+var nav = performance.getEntriesByType('navigation')[0];
+return !!nav && nav.loadEventEnd > 0;
+"""
+
+
+def snapshot_script(extras):
+    """METRICS_JS и дополнительные скрипты {ключ: JS} одним скриптом; ошибка скрипта дает null в ключе"""
+    parts = ["var metrics = (function () {" + METRICS_JS + "})();", "if (!metrics) { return null; }"]
+    for key, script in extras.items():
+        parts.append(f"try {{ metrics[{json.dumps(key)}] = (function () {{{script}}})(); }} "
+                     f"catch (e) {{ metrics[{json.dumps(key)}] = null; }}")
+    parts.append("return metrics;")
+    return "\n".join(parts)
+
+
+def route_of(url):
+    """Маршрут OpenCart: параметр route, 'common/home' для главной или путь"""
+    parts = urlsplit(url)
+    route = parse_qs(parts.query).get("route")
+    if route:
+        # OpenCart 4 добавляет к маршруту метод через '|' или '.'
+        return route[0].replace("|", ".").split(".")[0]
+    if parts.path in ("", "/", "/index.php"):
+        return "common/home"
+    return parts.path
+
+
+def load_budgets(path):
+    """Бюджеты из JSON: {"default": {...}, "<route>": {...}}"""
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def budget_for(budgets, route):
+    budget = dict(budgets.get("default", {}))
+    budget.update(budgets.get(route, {}))
+    return budget
+
+
+def violations(metrics, budgets):
+    """Список нарушений бюджета маршрута для метрик одной страницы"""
+    budget = budget_for(budgets, metrics["route"])
+    problems = []
+    for name in BUDGET_METRICS:
+        value, limit = metrics.get(name), budget.get(name)
+        if value is not None and limit is not None and value > limit:
+            problems.append(f"{metrics['route']} {name} {value} > {limit}")
+    return problems
+
+
+class PageMetricsCollector:
+    """Снимает метрики страниц одной сессии WebDriver в рамках теста"""
+
+    def __init__(self, driver, test, budgets, extras=None):
+        self.driver = driver
+        self.test = test
+        self.budgets = budgets
+        # Дополнительные скрипты снимка страницы: {ключ в метриках: JS}
+        self.extras = extras or {}
+        self.script = snapshot_script(self.extras)
+        # (time_origin, url) -> метрики; повторный снимок документа заменяет прежний
+        self.pages = {}
+        # Документ мог смениться после прошлого снимка
+        self._stale = True
+        # Команды служебных вкладок (например, эмуляции устройств) не снимаются
+        self._paused = False
+        self._hooks = driver_hooks.hooks(driver)
+        self._hooks.before.append(self._before_command)
+        self._hooks.after.append(self._after_command)
+
+    def _before_command(self, command, params):
+        if command in HARVEST_COMMANDS and self._stale and not self._paused:
+            self.harvest()
+
+    def _after_command(self, command, params, duration, error):
+        if command in DOCUMENT_COMMANDS and not self._paused:
+            self._stale = True
+
+    @contextlib.contextmanager
+    def paused(self):
+        """Команды внутри блока не снимаются; после него исходная вкладка должна быть снова текущей"""
+        if self._stale:
+            self.harvest()
+        stale, self._paused = self._stale, True
+        try:
+            yield
+        finally:
+            self._paused = False
+            self._stale = stale
+
+    def harvest(self):
+        """Снимок метрик текущего документа (None для about:blank и ошибок)"""
+        try:
+            metrics = self.driver.execute_script(self.script)
+        except WebDriverException:
+            return None
+        self._stale = False
+        if metrics:
+            metrics["test"] = self.test
+            metrics["route"] = route_of(metrics["url"])
+            self.pages[(metrics["time_origin"], metrics["url"])] = metrics
+        return metrics
+
+    def collect(self, timeout=waits.DEFAULT_TIMEOUT):
+        """Метрики текущей страницы после события load - для проверок в тесте"""
+        waits.until(self.driver, lambda d: d.execute_script(LOAD_EVENT_JS), "load_event", timeout)
+        return self.harvest()
+
+    def violations(self, metrics):
+        return violations(metrics, self.budgets)
+
+    def finish(self):
+        """Последний снимок и отключение от сессии; возвращает метрики всех страниц теста"""
+        if self._stale:
+            self.harvest()
+        self._hooks.before.remove(self._before_command)
+        self._hooks.after.remove(self._after_command)
+        return list(self.pages.values())
+
+
+def write_results(path, pages, budgets):
+    """Пишет метрики всех страниц прогона и нарушения бюджетов в JSON"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    results = {
+        "pages": pages,
+        "violations": [problem for page in pages for problem in violations(page, budgets)],
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+def summary_lines(pages, budgets):
+    """Медианы по маршрутам и нарушения бюджетов для итоговой сводки"""
+    by_route = {}
+    for page in pages:
+        by_route.setdefault(page["route"], []).append(page)
+
+    def median(route_pages, name, scale=1):
+        value = perf_stats.median([page[name] for page in route_pages if page.get(name) is not None])
+        return f"{value / scale:.0f}" if value is not None else "-"
+
+    lines = [f"{'route':<24}{'pages':>6}{'ttfb':>7}{'dcl':>7}{'load':>7}{'fcp':>7}{'lcp':>7}{'KiB':>8}  (median, ms)"]
+    for route, route_pages in sorted(by_route.items()):
+        lines.append(f"{route[:23]:<24}{len(route_pages):>6}{median(route_pages, 'ttfb'):>7}"
+                     f"{median(route_pages, 'dom_content_loaded'):>7}{median(route_pages, 'load'):>7}"
+                     f"{median(route_pages, 'fcp'):>7}{median(route_pages, 'lcp'):>7}"
+                     f"{median(route_pages, 'transfer_bytes', 1024):>8}")
+
+    problems = [(page["test"], problem) for page in pages for problem in violations(page, budgets)]
+    for test, problem in problems:
+        lines.append(f"budget exceeded: {problem} in {test}")
+    return lines
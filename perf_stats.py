@@ -0,0 +1,34 @@
+"""Статистики для замеров производительности"""
+import math
+
+
+# Масштаб MAD к стандартному отклонению для нормального распределения
+MAD_SCALE = 1.4826
+
+
+def median(values):
+    values = sorted(values)
+    if not values:
+        return None
+    middle = len(values) // 2
+    if len(values) % 2:
+        return values[middle]
+    return (values[middle - 1] + values[middle]) / 2
+
+
+def mad(values):
+    """Медианное абсолютное отклонение"""
+    center = median(values)
+    if center is None:
+        return None
+    return median([abs(value - center) for value in values])
+
+
+def percentile(values, p):
+    """Перцентиль p (0-100) с линейной интерполяцией"""
+    values = sorted(values)
+    if not values:
+        return None
+    rank = (len(values) - 1) * p / 100
+    low, high = math.floor(rank), math.ceil(rank)
+    return values[low] + (values[high] - values[low]) * (rank - low)
@@ -0,0 +1,88 @@
+"""Проверка доступности OpenCart до запуска тестов
+
+Витрина, поиск и страница контактов опрашиваются по HTTP с короткими
+таймаутами. Пока контейнер прогревается, проверка повторяется с растущей
+паузой; если магазин так и не ответил, прогон прерывается с одним понятным
+диагнозом вместо десятков медленных таймаутов в тестах.
+"""
+import socket
+import time
+import urllib.error
+import urllib.request
+from collections import namedtuple
+
+
+ROUTES = {
+    "storefront": "/",
+    "search": "/index.php?route=product/search&search=test",
+    "contact": "/index.php?route=information/contact",
+}
+
+# Признаки наполовину запущенного магазина: PHP работает, а база или код - нет
+BROKEN_MARKERS = {
+    "Could not make a database link": "database is not reachable yet",
+    "Fatal error": "PHP fatal error",
+    "Exception: Error: ": "OpenCart raised an exception",
+}
+
+ProbeResult = namedtuple("ProbeResult", "name url ok problem duration")
+
+
+def probe(name, url, timeout):
+    """Один запрос к маршруту; problem - текст диагноза или None"""
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            body = response.read(256 * 1024).decode("utf-8", "replace")
+            status = response.status
+    except urllib.error.HTTPError as e:
+        return ProbeResult(name, url, False, f"HTTP {e.code} {e.reason}", time.perf_counter() - start)
+    except urllib.error.URLError as e:
+        reason = e.reason
+        if isinstance(reason, ConnectionRefusedError):
+            problem = "connection refused - nothing is listening, is the Docker container running?"
+        elif isinstance(reason, socket.timeout):
+            problem = f"no response within {timeout}s - the server accepts connections but hangs"
+        elif isinstance(reason, socket.gaierror):
+            problem = f"cannot resolve host: {reason}"
+        else:
+            problem = f"connection failed: {reason}"
+        return ProbeResult(name, url, False, problem, time.perf_counter() - start)
+    except (socket.timeout, ConnectionError) as e:
+        return ProbeResult(name, url, False, f"connection dropped: {e!r}", time.perf_counter() - start)
+
+    duration = time.perf_counter() - start
+    for marker, problem in BROKEN_MARKERS.items():
+        if marker in body:
+            return ProbeResult(name, url, False, f"HTTP {status}, {problem}", duration)
+    if "<html" not in body.lower():
+        return ProbeResult(name, url, False, f"HTTP {status}, response is not an HTML page", duration)
+    return ProbeResult(name, url, True, None, duration)
+
+
+def check(base_url, timeout=2.0, deadline=30.0, backoff=0.5, max_backoff=5.0):
+    """Опрашивает все маршруты до успеха или до истечения deadline секунд
+
+    Возвращает (ok, attempts, results последней попытки).
+    """
+    started = time.perf_counter()
+    attempts = 0
+    delay = backoff
+    while True:
+        attempts += 1
+        results = [probe(name, base_url.rstrip("/") + route, timeout) for name, route in ROUTES.items()]
+        if all(result.ok for result in results):
+            return True, attempts, results
+        if time.perf_counter() - started + delay > deadline:
+            return False, attempts, results
+        time.sleep(delay)
+        delay = min(delay * 2, max_backoff)
+
+
+def diagnosis(base_url, attempts, elapsed, results):
+    """Текст для прерывания прогона"""
+    lines = [f"OpenCart at {base_url} is not ready after {attempts} attempts in {elapsed:.1f}s:"]
+    for result in results:
+        status = "ok" if result.ok else result.problem
+        lines.append(f"  {result.name:<11} {result.url} -> {status}")
+    return "\n".join(lines)
@@ -0,0 +1,227 @@
+"""Проверки верстки на наборе устройств через эмуляцию CDP
+
+Вместо смены размера окна (медленно, оконный менеджер может ограничить
+размер, особенно в headless) каждое устройство получает свою вкладку с
+Emulation.setDeviceMetricsOverride. Навигация во вкладках запускается
+скриптом без ожидания, поэтому страницы всех устройств пачки грузятся
+одновременно, а затем в каждой вкладке одним скриптом проверяются одни
+и те же элементы. Для устройства снимаются размеры и видимость элементов,
+горизонтальная прокрутка, метрики загрузки и время layout из
+Performance.getMetrics. Вкладки закрываются после пачки, исходная вкладка
+эмуляцию не получает. Сборщик метрик страниц на время проверки
+приостанавливается, чтобы страницы устройств не попали в метрики теста.
+"""
+import contextlib
+import json
+import os
+import time
+from collections import namedtuple
+
+from selenium.common.exceptions import WebDriverException
+
+import perf_metrics
+import perf_stats
+import waits
+
+
+Device = namedtuple("Device", "name width height scale mobile")
+
+DEVICES = {
+    "desktop-fhd": Device("desktop-fhd", 1920, 1080, 1, False),
+    "desktop-hd": Device("desktop-hd", 1366, 768, 1, False),
+    "laptop": Device("laptop", 1280, 800, 2, False),
+    "ipad-pro": Device("ipad-pro", 1024, 1366, 2, True),
+    "ipad": Device("ipad", 768, 1024, 2, True),
+    "galaxy-tab": Device("galaxy-tab", 800, 1280, 2, True),
+    "pixel-7": Device("pixel-7", 412, 915, 2.625, True),
+    "iphone-14": Device("iphone-14", 390, 844, 3, True),
+    "iphone-se": Device("iphone-se", 375, 667, 2, True),
+    "galaxy-s8": Device("galaxy-s8", 360, 740, 4, True),
+    "small-phone": Device("small-phone", 320, 568, 2, True),
+}
+
+# Размеры исходного теста 12: десктоп, планшет, телефон
+DEFAULT_DEVICES = "desktop-fhd,ipad,iphone-se"
+
+# Метрики Performance.getMetrics, которые попадают в результат (секунды и счетчики)
+LAYOUT_METRICS = ("LayoutCount", "LayoutDuration", "RecalcStyleCount", "RecalcStyleDuration", "ScriptDuration")
+
+LOADED_JS = """
+var nav = performance.getEntriesByType('navigation')[0];
+return location.protocol.indexOf('http') === 0 && !!nav && nav.loadEventEnd > 0;
+"""
+
+LAYOUT_JS = """
+var elements = arguments[0], result = {};
+
+function visible(el) {
+  if (el.checkVisibility) {
+    return el.checkVisibility({checkOpacity: true, checkVisibilityCSS: true});
+  }
+  var style = getComputedStyle(el), rect = el.getBoundingClientRect();
+  return rect.width > 0 && rect.height > 0 && style.visibility !== 'hidden' && style.display !== 'none';
+}
+
+Object.keys(elements).forEach(function (name) {
+  var el = document.querySelector(elements[name]);
+  if (!el) {
+    result[name] = {present: false, visible: false, rect: null, overflows: false};
+    return;
+  }
+  var rect = el.getBoundingClientRect();
+  result[name] = {
+    present: true,
+    visible: visible(el),
+    rect: {x: Math.round(rect.left), y: Math.round(rect.top + scrollY),
+           width: Math.round(rect.width), height: Math.round(rect.height)},
+    overflows: rect.right > innerWidth + 1
+  };
+});
+return {
+  viewport: {width: innerWidth, height: innerHeight, dpr: devicePixelRatio},
+  scroll_width: document.documentElement.scrollWidth,
+  horizontal_scroll: document.documentElement.scrollWidth > innerWidth + 1,
+  elements: result
+};
+"""
+
+ViewportResult = namedtuple("ViewportResult", "test device url elements layout timings wall error")
+
+
+def parse_devices(value):
+    """'all' или имена из DEVICES через запятую"""
+    if value == "all":
+        return list(DEVICES.values())
+    names = [name.strip() for name in value.split(",") if name.strip()]
+    unknown = [name for name in names if name not in DEVICES]
+    if unknown:
+        raise ValueError(f"Unknown devices: {', '.join(unknown)}; known: {', '.join(DEVICES)}")
+    return [DEVICES[name] for name in names]
+
+
+class ResponsiveCheck:
+    """Страница на наборе устройств в отдельных вкладках одной сессии"""
+
+    def __init__(self, driver, test=None, devices=None, max_tabs=8, timeout=waits.DEFAULT_TIMEOUT, collector=None):
+        self.driver = driver
+        self.test = test
+        # PageMetricsCollector сессии: вкладки устройств не должны попасть в метрики теста
+        self.collector = collector
+        self.devices = devices or parse_devices(DEFAULT_DEVICES)
+        # Больше вкладок одновременно - больше памяти браузера; устройства идут пачками
+        self.max_tabs = max_tabs
+        self.timeout = timeout
+        self.results = []
+        self.wall = 0.0
+
+    def _open(self, device, url):
+        """Вкладка с эмуляцией устройства; навигация без ожидания загрузки"""
+        self.driver.switch_to.new_window("tab")
+        handle = self.driver.current_window_handle
+        self.driver.execute_cdp_cmd("Emulation.setDeviceMetricsOverride", {
+            "width": device.width, "height": device.height,
+            "deviceScaleFactor": device.scale, "mobile": device.mobile,
+        })
+        self.driver.execute_cdp_cmd("Emulation.setTouchEmulationEnabled", {
+            "enabled": device.mobile, "maxTouchPoints": 5 if device.mobile else 1})
+        self.driver.execute_cdp_cmd("Performance.enable", {})
+        self.driver.execute_script("location.href = arguments[0];", url)
+        return handle
+
+    def _inspect(self, device, handle, url, elements, start):
+        self.driver.switch_to.window(handle)
+        try:
+            waits.until(self.driver, lambda d: d.execute_script(LOADED_JS), "viewport_load", self.timeout)
+        except WebDriverException as e:
+            return ViewportResult(self.test, device.name, url, {}, {}, {}, time.perf_counter() - start, repr(e))
+        wall = time.perf_counter() - start
+        page = self.driver.execute_script(LAYOUT_JS, elements)
+        metrics = self.driver.execute_script(perf_metrics.METRICS_JS) or {}
+        performance = {item["name"]: item["value"]
+                       for item in self.driver.execute_cdp_cmd("Performance.getMetrics", {})["metrics"]}
+        layout = {"viewport": page["viewport"], "scroll_width": page["scroll_width"],
+                  "horizontal_scroll": page["horizontal_scroll"]}
+        layout.update({name: performance.get(name) for name in LAYOUT_METRICS})
+        timings = {name: metrics.get(name) for name in ("ttfb", "dom_content_loaded", "load", "fcp", "lcp", "cls")}
+        return ViewportResult(self.test, device.name, url, page["elements"], layout, timings, wall, None)
+
+    def run(self, url, elements, devices=None):
+        """Проверяет элементы {имя: CSS-селектор} на странице url для каждого устройства"""
+        devices = devices or self.devices
+        original = self.driver.current_window_handle
+        start = time.perf_counter()
+        results = []
+        pause = self.collector.paused() if self.collector else contextlib.nullcontext()
+        try:
+            with pause:
+                for offset in range(0, len(devices), self.max_tabs):
+                    tabs = []
+                    try:
+                        for device in devices[offset:offset + self.max_tabs]:
+                            tabs.append((device, self._open(device, url), time.perf_counter()))
+                        for device, handle, opened in tabs:
+                            results.append(self._inspect(device, handle, url, elements, opened))
+                    finally:
+                        # Упавшая вкладка не должна скрыть исходную ошибку
+                        for _, handle, _ in tabs:
+                            try:
+                                self.driver.switch_to.window(handle)
+                                self.driver.close()
+                            except WebDriverException:
+                                pass
+                        self.driver.switch_to.window(original)
+        finally:
+            self.wall += time.perf_counter() - start
+            self.results.extend(results)
+        return results
+
+
+def write_results(path, results):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"viewports": results}, f, ensure_ascii=False, indent=2)
+
+
+def summary_lines(results, wall=None):
+    """По устройствам: медианы загрузки и layout, прокрутка по горизонтали и скрытые элементы
+
+    results - ViewportResult._asdict() всех проверок прогона.
+    """
+    lines = [f"{'device':<14}{'size':>11}{'checks':>7}{'load':>7}{'lcp':>7}{'layouts':>9}{'layout ms':>11}"
+             f"{'wall, s':>9}  (median)"]
+    by_device = {}
+    for result in results:
+        by_device.setdefault(result["device"], []).append(result)
+
+    def median(values, scale=1):
+        value = perf_stats.median([value for value in values if value is not None])
+        return f"{value * scale:.0f}" if value is not None else "-"
+
+    order = list(DEVICES)
+    for name, device_results in sorted(by_device.items(),
+                                       key=lambda item: order.index(item[0]) if item[0] in order else len(order)):
+        device = DEVICES.get(name)
+        size = f"{device.width}x{device.height}" if device else "-"
+        ok = [result for result in device_results if not result["error"]]
+        timings = [result["timings"] for result in ok]
+        layouts = [result["layout"] for result in ok]
+        lines.append(f"{name[:13]:<14}{size:>11}{len(device_results):>7}"
+                     f"{median([item.get('load') for item in timings]):>7}"
+                     f"{median([item.get('lcp') for item in timings]):>7}"
+                     f"{median([item.get('LayoutCount') for item in layouts]):>9}"
+                     f"{median([item.get('LayoutDuration') for item in layouts], 1000):>11}"
+                     f"{perf_stats.median([result['wall'] for result in device_results]):>9.2f}")
+        for result in device_results:
+            url = result["url"]
+            if result["error"]:
+                lines.append(f"  {url}: {result['error']}")
+                continue
+            hidden = [element for element, state in sorted(result["elements"].items()) if not state["visible"]]
+            if result["layout"]["horizontal_scroll"]:
+                lines.append(f"  {url}: horizontal scroll ({result['layout']['scroll_width']}px wide)")
+            if hidden:
+                lines.append(f"  {url}: hidden {', '.join(hidden)}")
+    if wall:
+        loads = sum(result["timings"].get("load") or 0 for result in results) / 1000
+        lines.append(f"{len(results)} viewports checked in {wall:.2f}s (page loads alone add up to {loads:.2f}s)")
+    return lines
@@ -0,0 +1,98 @@
+"""Распределение тестов по воркерам xdist с учетом их длительности
+
+Оценка длительности теста - медиана времени вызова за последние прогоны
+из reports/perf_history.jsonl (см. perf_baseline.py). Для новых тестов
+берется медиана известных оценок. Тесты раскладываются по корзинам
+жадно, начиная с самых долгих (LPT): каждый следующий тест уходит в
+наименее загруженную корзину. Корзина становится группой xdist_group,
+и при --dist loadgroup каждый воркер получает свою корзину целиком.
+"""
+import perf_baseline
+import perf_stats
+
+
+OUTPUT_KEY = "autotest_schedule"
+
+GROUP_PREFIX = "duration-bin-"
+
+# Оценка для нового теста, когда в истории нет ни одного замера, секунды
+DEFAULT_ESTIMATE = 5.0
+
+
+def base_nodeid(nodeid):
+    """nodeid без суффикса группы, который добавляет xdist при --dist loadgroup"""
+    head, sep, group = nodeid.rpartition("@")
+    return head if sep and group.startswith(GROUP_PREFIX) else nodeid
+
+
+def estimates(nodeids, history_path, window=10):
+    """{nodeid: секунды} и множество тестов, оцененных по умолчанию"""
+    runs = perf_baseline.load_history(history_path)[-window:]
+    known = {}
+    for nodeid in nodeids:
+        values = [run["tests"][nodeid] for run in runs if nodeid in run["tests"]]
+        if values:
+            known[nodeid] = perf_stats.median(values)
+
+    fallback = perf_stats.median(list(known.values())) or DEFAULT_ESTIMATE
+    guessed = {nodeid for nodeid in nodeids if nodeid not in known}
+    return {nodeid: known.get(nodeid, fallback) for nodeid in nodeids}, guessed
+
+
+def longest_first(nodeids, durations, workers):
+    """Корзины LPT: список (нагрузка, [nodeid, ...]) на каждого воркера"""
+    bins = [[0.0, []] for _ in range(workers)]
+    for nodeid in sorted(nodeids, key=lambda nodeid: -durations[nodeid]):
+        target = min(bins, key=lambda item: item[0])
+        target[0] += durations[nodeid]
+        target[1].append(nodeid)
+    return bins
+
+
+def round_robin_makespan(nodeids, durations, workers):
+    """Оценка без учета длительности: тесты по порядку сбора, по кругу"""
+    loads = [0.0] * workers
+    for index, nodeid in enumerate(nodeids):
+        loads[index % workers] += durations[nodeid]
+    return max(loads) if loads else 0.0
+
+
+class Schedule:
+    """План распределения одного прогона"""
+
+    def __init__(self, nodeids, history_path, workers, window=10):
+        self.durations, self.guessed = estimates(nodeids, history_path, window)
+        self.bins = longest_first(nodeids, self.durations, workers)
+        self.naive = round_robin_makespan(nodeids, self.durations, workers)
+
+    def group_of(self, nodeid):
+        for index, (load, nodeids) in enumerate(self.bins):
+            if nodeid in nodeids:
+                return f"{GROUP_PREFIX}{index}"
+        return None
+
+    @property
+    def makespan(self):
+        return max(load for load, nodeids in self.bins)
+
+    def as_dict(self):
+        return {
+            "makespan": self.makespan,
+            "naive": self.naive,
+            "bins": [load for load, nodeids in self.bins],
+            "tests": len(self.durations),
+            "guessed": len(self.guessed),
+        }
+
+
+def summary_lines(schedule, workers):
+    """Предсказанное и фактическое время; workers - {worker_id: WorkerTimer.as_dict()}"""
+    lines = [f"predicted makespan {schedule['makespan']:.2f}s longest-first vs "
+             f"{schedule['naive']:.2f}s in collection order "
+             f"({schedule['tests']} tests, {schedule['guessed']} without history)"]
+    lines.append("predicted load per bin: " + ", ".join(f"{load:.2f}s" for load in schedule["bins"]))
+    if workers:
+        actual = max(stats["busy"] for stats in workers.values())
+        lines.append(f"actual makespan {actual:.2f}s (busiest worker), "
+                     f"prediction error {actual - schedule['makespan']:+.2f}s")
+    return lines
@@ -0,0 +1,306 @@
+"""Бенчмарк поиска витрины: задержки по видам запросов на большом корпусе
+
+Тесты 02 и 15 отправляют через интерфейс несколько запросов по одному и
+ничего не говорят о том, как поиск OpenCart ведет себя на запросах разной
+формы. Здесь корпус из тысяч запросов (короткие, длинные, unicode,
+похожие на шаблоны LIKE, без результатов, со спецсимволами и слова из
+каталога) идет на маршрут product/search через общий пул соединений
+aiohttp с заданным числом одновременных запросов. По каждому виду
+считаются перцентили задержки, размер ответа и число найденных товаров.
+Результаты пишутся в JSON вместе с размером каталога, чтобы сравнивать
+прогоны между собой и магазины с разным числом товаров; прошлый файл
+результатов остается рядом с суффиксом .prev. Прогрев идет поровну по
+всем видам, чтобы теплые кэши сервера не достались первым видам корпуса.
+
+    python search_bench.py --queries 5000 --concurrency 16
+    python search_bench.py --compare
+    python search_bench.py --corpus my_queries.json --compare reports/search_bench_old.json
+
+Код возврата 1, если были ошибки (5xx или ошибка соединения).
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import string
+import time
+from collections import namedtuple
+from urllib.parse import urlencode
+
+import aiohttp
+
+import http_probe
+import perf_stats
+from locators import LOCATORS
+
+
+PERCENTILES = (50, 90, 95, 99)
+
+# Слова из демо-каталога OpenCart: запросы, которые находят товары
+CATALOG_WORDS = ["iphone", "ipod", "mac", "macbook", "imac", "samsung", "galaxy", "canon", "nikon", "sony",
+                 "htc", "palm", "apple", "hp", "lp3065", "cinema", "monitor", "camera", "laptop", "phone",
+                 "desktop", "tablet", "touch", "nano", "shuffle", "classic", "air", "pro", "syncmaster"]
+
+FILLER_WORDS = ["best", "cheap", "new", "black", "white", "with", "for", "and", "the", "case", "screen",
+                "inch", "gb", "wireless", "original", "warranty", "fast", "delivery", "discount", "model"]
+
+UNICODE_QUERIES = ["café", "naïve", "Ünïcödé", "straße", "Ноутбук", "смартфон", "東京", "日本語", "手机",
+                   "ελληνικά", "עברית", "العربية", "हिन्दी", "😀", "📱 phone", "ｆｕｌｌｗｉｄｔｈ", "é",
+                   "İstanbul", "ǅ", "ﬁle"]
+
+# Символы шаблонов LIKE и похожие на шаблоны: OpenCart подставляет слова в LIKE '%...%'
+WILDCARD_QUERIES = ["%", "_", "%%", "__", "*", "?", "mac%", "%phone", "i_od", "a%b", "%_%", "*pod*", "[a-z]",
+                    "\\%", ".*", "mac*", "^i", "$"]
+
+SPECIAL_QUERIES = ["<script>", "<script>alert(1)</script>", "'; DROP TABLE", "\" OR \"1\"=\"1", "' OR 1=1 --",
+                   "smartphone's", "a&b", "#hash", "100%", "a+b", "a/b", "a\\b", "{{7*7}}", "${7*7}", "../../etc",
+                   "<img src=x>", "&amp;", "null", "\t", "   "]
+
+CATEGORIES = ("catalog", "short", "long", "unicode", "wildcard", "zero_result", "special")
+
+Sample = namedtuple("Sample", "category query status elapsed size results error")
+
+
+def generate_corpus(size, seed=None):
+    """Корпус {вид: [запросы]} примерно из size запросов, поровну на вид"""
+    rng = random.Random(seed)
+    per_category = max(size // len(CATEGORIES), 1)
+    letters = string.ascii_lowercase + string.digits
+
+    def words(count):
+        return " ".join(rng.choice(CATALOG_WORDS + FILLER_WORDS) for _ in range(count))
+
+    def with_word(query, separator=" "):
+        """Половина запросов вида дополняется словом из каталога"""
+        return query if rng.random() < 0.5 else query + separator + rng.choice(CATALOG_WORDS)
+
+    generators = {
+        "catalog": lambda: rng.choice(CATALOG_WORDS) if rng.random() < 0.6 else words(2),
+        "short": lambda: "".join(rng.choice(letters) for _ in range(rng.randint(1, 3))),
+        "long": lambda: words(rng.randint(8, 30)),
+        "unicode": lambda: with_word(rng.choice(UNICODE_QUERIES)),
+        "wildcard": lambda: with_word(rng.choice(WILDCARD_QUERIES), ""),
+        "zero_result": lambda: "zq" + "".join(rng.choice(letters) for _ in range(rng.randint(6, 14))),
+        "special": lambda: with_word(rng.choice(SPECIAL_QUERIES)),
+    }
+    return {category: [generators[category]() for _ in range(per_category)] for category in CATEGORIES}
+
+
+def load_corpus(path):
+    """Корпус из JSON {вид: [запросы]}"""
+    with open(path, encoding="utf-8") as f:
+        corpus = json.load(f)
+    if not isinstance(corpus, dict) or not all(isinstance(queries, list) for queries in corpus.values()):
+        raise ValueError(f"{path}: expected an object of query lists by category")
+    return corpus
+
+
+# "Showing 1 to 15 of 42 (3 Pages)" под списком результатов
+TOTAL_RE = re.compile(r"\d+\s+\w+\s+\d+\s+\w+\s+(\d+)\s+\(\d+\s+\w+\)")
+
+
+def result_count(html):
+    """Число найденных товаров: итог из пагинации или число карточек на странице"""
+    match = TOTAL_RE.search(html)
+    if match:
+        return int(match.group(1))
+    page = http_probe.ProbedPage("", 200, {}, html, 0.0, [])
+    for selector in LOCATORS["product"]:
+        cards = page.select(selector)
+        if cards:
+            return len(cards)
+    return 0
+
+
+class SearchBenchmark:
+    """Прогон корпуса по маршруту поиска с ограничением одновременных запросов"""
+
+    def __init__(self, base_url, corpus, concurrency=8, repeat=1, warmup=20, timeout=30, seed=None):
+        self.base_url = base_url.rstrip("/") + "/"
+        self.corpus = corpus
+        self.concurrency = concurrency
+        self.repeat = repeat
+        self.warmup = warmup
+        self.timeout = timeout
+        self.seed = seed
+        self.samples = []
+
+    def url(self, query):
+        return self.base_url + "index.php?" + urlencode({"route": "product/search", "search": query})
+
+    def _jobs(self):
+        # Вперемешку: иначе виды запросов попадут на разные фазы прогрева кэшей сервера
+        jobs = [(category, query) for category, queries in self.corpus.items() for query in queries] * self.repeat
+        random.Random(self.seed).shuffle(jobs)
+        return jobs
+
+    def _warmup_jobs(self):
+        """Поровну запросов каждого вида: прогретые БД и кэш запросов не смещают перцентили отдельных видов"""
+        if not self.warmup:
+            return []
+        rng = random.Random(self.seed)
+        per_category = max(self.warmup // len(self.corpus), 1)
+        jobs = [(category, query) for category, queries in self.corpus.items()
+                for query in rng.sample(queries, min(per_category, len(queries)))]
+        rng.shuffle(jobs)
+        return jobs
+
+    async def _fetch(self, session, category, query):
+        start = time.perf_counter()
+        try:
+            async with session.get(self.url(query)) as response:
+                body = await response.read()
+                elapsed = time.perf_counter() - start
+                html = body.decode(response.charset or "utf-8", "replace")
+                return Sample(category, query, response.status, elapsed, len(body),
+                              result_count(html) if response.status < 400 else None, None)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            return Sample(category, query, None, time.perf_counter() - start, 0, None, repr(e))
+
+    async def _worker(self, session, queue, samples):
+        while True:
+            category, query = await queue.get()
+            start = time.perf_counter()
+            try:
+                samples.append(await self._fetch(session, category, query))
+            except Exception as e:
+                # Например, LookupError для неизвестной кодировки: без воркеров queue.join() не вернется
+                samples.append(Sample(category, query, None, time.perf_counter() - start, 0, None, repr(e)))
+            finally:
+                queue.task_done()
+
+    async def _pass(self, session, jobs):
+        queue = asyncio.Queue()
+        for job in jobs:
+            queue.put_nowait(job)
+        samples = []
+        workers = [asyncio.ensure_future(self._worker(session, queue, samples)) for _ in range(self.concurrency)]
+        await queue.join()
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        return samples
+
+    async def _run(self):
+        connector = aiohttp.TCPConnector(limit=self.concurrency)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout,
+                                         headers={"User-Agent": "opencart-autotest-search-bench"}) as session:
+            # Прогрев соединений и кэшей PHP; в результаты не попадает
+            await self._pass(session, self._warmup_jobs())
+            start = time.perf_counter()
+            self.samples = await self._pass(session, self._jobs())
+            elapsed = time.perf_counter() - start
+            catalog, = await self._pass(session, [("catalog_size", "%")])
+        return elapsed, catalog.results
+
+    def run(self):
+        return asyncio.run(self._run())
+
+
+def failed(sample):
+    return sample.error is not None or sample.status >= 500
+
+
+def results(benchmark, elapsed, catalog_size):
+    by_category = {}
+    for sample in benchmark.samples:
+        by_category.setdefault(sample.category, []).append(sample)
+    categories = {}
+    for category, samples in sorted(by_category.items()):
+        ok = [sample for sample in samples if not failed(sample)]
+        latencies = [sample.elapsed * 1000 for sample in ok]
+        counts = [sample.results for sample in ok if sample.results is not None]
+        categories[category] = {
+            "requests": len(samples),
+            "errors": len(samples) - len(ok),
+            "statuses": {str(status): sum(1 for sample in samples if sample.status == status)
+                         for status in sorted({sample.status for sample in samples if sample.status})},
+            **{f"p{p}": perf_stats.percentile(latencies, p) for p in PERCENTILES},
+            "max": max(latencies) if latencies else None,
+            "avg_bytes": sum(sample.size for sample in ok) / len(ok) if ok else 0,
+            "avg_results": sum(counts) / len(counts) if counts else 0,
+            "zero_results": sum(1 for count in counts if count == 0),
+        }
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {"base_url": benchmark.base_url, "concurrency": benchmark.concurrency, "repeat": benchmark.repeat,
+                   "warmup": benchmark.warmup, "seed": benchmark.seed},
+        # Поиск '%' совпадает с любым названием в LIKE '%...%': это число товаров в каталоге
+        "catalog_size": catalog_size,
+        "elapsed": elapsed,
+        "requests": len(benchmark.samples),
+        "throughput": len(benchmark.samples) / elapsed if elapsed else 0.0,
+        "errors": sum(1 for sample in benchmark.samples if failed(sample)),
+        "categories": categories,
+        "slowest": [sample._asdict() for sample in sorted(benchmark.samples, key=lambda sample: -sample.elapsed)[:20]],
+    }
+
+
+def summary_lines(current, previous=None):
+    catalog = current["catalog_size"] if current["catalog_size"] is not None else "?"
+    lines = [f"{current['requests']} searches in {current['elapsed']:.1f}s, {current['throughput']:.1f} req/s, "
+             f"{current['errors']} errors, catalog of {catalog} products"]
+    lines.append(f"{'category':<13}{'requests':>9}{'errors':>8}" + "".join(f"{f'p{p}':>8}" for p in PERCENTILES)
+                 + f"{'KiB':>8}{'results':>9}{'zero':>6}  (ms)")
+    for category, stats in current["categories"].items():
+        latencies = "".join(f"{stats[f'p{p}']:>8.0f}" if stats[f"p{p}"] is not None else f"{'-':>8}"
+                            for p in PERCENTILES)
+        lines.append(f"{category[:12]:<13}{stats['requests']:>9}{stats['errors']:>8}{latencies}"
+                     f"{stats['avg_bytes'] / 1024:>8.1f}{stats['avg_results']:>9.1f}{stats['zero_results']:>6}")
+
+    if previous:
+        lines.append(f"compared with {previous['timestamp']} (catalog of {previous.get('catalog_size', '?')} products):")
+        for category, stats in current["categories"].items():
+            old = previous.get("categories", {}).get(category)
+            if not old:
+                continue
+            changes = "  ".join(f"p{p} {stats[f'p{p}'] - old[f'p{p}']:+.0f}ms ({stats[f'p{p}'] / old[f'p{p}'] - 1:+.0%})"
+                                for p in (50, 95) if old[f"p{p}"] and stats[f"p{p}"] is not None)
+            lines.append(f"  {category:<13}{changes}")
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the OpenCart search route over a large query corpus")
+    parser.add_argument("--base-url", default="http://localhost")
+    parser.add_argument("--corpus", help="JSON object of query lists by category instead of the generated corpus")
+    parser.add_argument("--queries", type=int, default=2100,
+                        help=f"size of the generated corpus, split evenly over {', '.join(CATEGORIES)} (default: 2100)")
+    parser.add_argument("--concurrency", type=int, default=8, help="searches in flight (default: 8)")
+    parser.add_argument("--repeat", type=int, default=1, help="passes over the corpus (default: 1)")
+    parser.add_argument("--warmup", type=int, default=20,
+                        help="searches before measuring, spread evenly over categories, not recorded (default: 20)")
+    parser.add_argument("--seed", type=int, default=1, help="seed for the generated corpus and request order")
+    parser.add_argument("--compare", nargs="?", const="",
+                        help="results JSON of a previous run to compare with (without a path: the previous --out)")
+    parser.add_argument("--out", default=os.path.join("reports", "search_bench.json"),
+                        help="results JSON; the file it replaces is kept as <name>.prev.json")
+    args = parser.parse_args()
+    kept = os.path.splitext(args.out)[0] + ".prev.json"
+
+    corpus = load_corpus(args.corpus) if args.corpus else generate_corpus(args.queries, args.seed)
+    benchmark = SearchBenchmark(args.base_url, corpus, args.concurrency, args.repeat, args.warmup, seed=args.seed)
+    elapsed, catalog_size = benchmark.run()
+    current = results(benchmark, elapsed, catalog_size)
+    previous = None
+    if args.compare is not None:
+        # Без пути сравнение с прошлым прогоном: его результаты еще лежат в --out
+        path = args.compare or (args.out if os.path.exists(args.out) else kept)
+        with open(path, encoding="utf-8") as f:
+            previous = json.load(f)
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    if os.path.exists(args.out):
+        os.replace(args.out, kept)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(current, f, ensure_ascii=False, indent=2)
+    for line in summary_lines(current, previous):
+        print(line)
+    print(f"details: {args.out}")
+    return 1 if current["errors"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,297 @@
+"""Локальная замена витрины OpenCart для прогонов без Docker
+
+Сервер отдает снимки страниц, которые посещают тесты (главная, поиск,
+категория, товар, контакты, вход в аккаунт, корзина, 404), и их ресурсы
+(CSS, JS, картинки) по тем же маршрутам index.php?route=... Снимки
+записываются один раз с настоящего магазина:
+
+    python standin_server.py record --base-url http://localhost
+
+Ссылки на исходный магазин при записи заменяются на метку и при отдаче
+подставляется адрес локального сервера. Профили сети добавляют постоянную
+задержку до первого байта и ограничение пропускной способности без
+случайного разброса, поэтому замеры воспроизводимы.
+"""
+import argparse
+import html
+import json
+import mimetypes
+import os
+import re
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import namedtuple
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, urljoin, urlsplit
+
+
+DEFAULT_SNAPSHOT_DIR = "snapshots"
+MANIFEST = "manifest.json"
+BASE_PLACEHOLDER = "{{standin_base}}"
+
+# Запрос, с которым записывается страница поиска; при отдаче меняется на фактический
+SEARCH_QUERY = "iphone"
+
+RECORDED_PAGES = {
+    "common/home": "index.php?route=common/home",
+    "product/search": f"index.php?route=product/search&search={SEARCH_QUERY}",
+    "product/category": "index.php?route=product/category&path=20",
+    "product/product": "index.php?route=product/product&product_id=40",
+    "information/contact": "index.php?route=information/contact",
+    "account/login": "index.php?route=account/login",
+    "checkout/cart": "index.php?route=checkout/cart",
+    "common/cart/info": "index.php?route=common/cart/info",
+    "404": "nonexistent-page-12345",
+}
+
+# Маршруты, которые магазин без входа в аккаунт перенаправляет
+REDIRECTS = {
+    "account/account": "account/login",
+    "account/register": "account/login",
+    "checkout/checkout": "checkout/cart",
+}
+
+# Заголовки кэширования, которые сохраняются вместе с ресурсами
+KEPT_HEADERS = ("Cache-Control", "Expires", "Last-Modified", "ETag")
+
+NetworkProfile = namedtuple("NetworkProfile", "name latency bandwidth")
+
+# latency - секунды до первого байта, bandwidth - байт/с (None - без ограничения)
+NETWORK_PROFILES = {
+    "none": NetworkProfile("none", 0.0, None),
+    "lan": NetworkProfile("lan", 0.002, None),
+    "cable": NetworkProfile("cable", 0.02, 5_000_000 / 8),
+    "dsl": NetworkProfile("dsl", 0.05, 2_000_000 / 8),
+    "3g": NetworkProfile("3g", 0.15, 1_600_000 / 8),
+}
+
+_ASSET_ATTRS = re.compile(r"""<(?:link|script|img)\b[^>]*?\b(?:href|src)=["']([^"']+)["']""", re.I)
+_CSS_URLS = re.compile(r"""url\(\s*["']?([^"')]+)["']?\s*\)""")
+
+
+def _route(url):
+    parts = urlsplit(url)
+    route = parse_qs(parts.query).get("route")
+    if route:
+        return route[0]
+    if parts.path in ("", "/", "/index.php"):
+        return "common/home"
+    return None
+
+
+# --- запись ---
+
+def _fetch(url):
+    try:
+        with urllib.request.urlopen(url, timeout=30) as response:
+            return response.status, dict(response.headers), response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, dict(e.headers), e.read()
+
+
+def _asset_file(path):
+    """Путь ресурса внутри снимка; пути с '..' не записываются"""
+    path = path.lstrip("/")
+    if not path or ".." in path.split("/"):
+        return None
+    return os.path.join("assets", *path.split("/"))
+
+
+def record(base_url, directory=DEFAULT_SNAPSHOT_DIR):
+    """Записывает страницы RECORDED_PAGES и их ресурсы с того же хоста"""
+    base_url = base_url.rstrip("/") + "/"
+    origin = "{0.scheme}://{0.netloc}".format(urlsplit(base_url))
+    manifest = {"base": base_url, "search_query": SEARCH_QUERY, "pages": {}, "assets": {}}
+    pending = []
+
+    os.makedirs(os.path.join(directory, "pages"), exist_ok=True)
+    for route, path in RECORDED_PAGES.items():
+        url = urljoin(base_url, path)
+        status, headers, body = _fetch(url)
+        text = body.decode("utf-8", "replace")
+        pending += [urljoin(url, src) for src in _ASSET_ATTRS.findall(text)]
+        name = os.path.join("pages", route.replace("/", "_") + ".html")
+        with open(os.path.join(directory, name), "w", encoding="utf-8") as f:
+            f.write(text.replace(base_url, BASE_PLACEHOLDER).replace(origin + "/", BASE_PLACEHOLDER))
+        manifest["pages"][route] = {"file": name, "status": status,
+                                    "content_type": headers.get("Content-Type", "text/html; charset=utf-8")}
+        print(f"{status} {route}")
+
+    seen = set()
+    while pending:
+        url = pending.pop()
+        parts = urlsplit(url)
+        if "{0.scheme}://{0.netloc}".format(parts) != origin or parts.path in seen:
+            continue
+        seen.add(parts.path)
+        name = _asset_file(parts.path)
+        if not name:
+            continue
+        status, headers, body = _fetch(url)
+        if status != 200:
+            continue
+        content_type = headers.get("Content-Type") or mimetypes.guess_type(parts.path)[0] or "application/octet-stream"
+        if "css" in content_type:
+            # Шрифты и фоновые картинки из стилей
+            pending += [urljoin(url, ref) for ref in _CSS_URLS.findall(body.decode("utf-8", "replace"))
+                        if not ref.startswith("data:")]
+        os.makedirs(os.path.dirname(os.path.join(directory, name)), exist_ok=True)
+        with open(os.path.join(directory, name), "wb") as f:
+            f.write(body)
+        manifest["assets"][parts.path] = {"file": name, "content_type": content_type,
+                                          "headers": {key: headers[key] for key in KEPT_HEADERS if key in headers}}
+
+    with open(os.path.join(directory, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    print(f"recorded {len(manifest['pages'])} pages and {len(manifest['assets'])} assets into {directory}")
+    return manifest
+
+
+# --- отдача ---
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "OpenCartStandin"
+    # Заголовки и тело уходят отдельными записями: без этого Nagle и отложенный ACK добавляют ~40 мс
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.server.standin.handle(self)
+
+    do_POST = do_GET
+
+    def do_HEAD(self):
+        self.server.standin.handle(self, head=True)
+
+
+class StandinServer:
+    """Сервер снимков в фоновом потоке; url доступен после start()"""
+
+    def __init__(self, directory=DEFAULT_SNAPSHOT_DIR, profile="none", host="127.0.0.1", port=0):
+        path = os.path.join(directory, MANIFEST)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No stand-in snapshots in {directory}: record them once from a running "
+                                    f"store with 'python standin_server.py record --base-url http://localhost'")
+        with open(path, encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        self.directory = directory
+        self.profile = NETWORK_PROFILES[profile]
+        self.requests = 0
+        self._cache = {}
+        self._httpd = ThreadingHTTPServer((host, port), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.standin = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="standin-server", daemon=True)
+        self._thread.start()
+        return self.url
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def _read(self, name):
+        if name not in self._cache:
+            with open(os.path.join(self.directory, name), "rb") as f:
+                self._cache[name] = f.read()
+        return self._cache[name]
+
+    def _page(self, route, query):
+        page = self.manifest["pages"].get(route) or self.manifest["pages"]["404"]
+        text = self._read(page["file"]).decode("utf-8").replace(BASE_PLACEHOLDER, self.url + "/")
+        if route == "product/search":
+            # Запрос подставляется только в поле поиска, заголовок и ссылки страниц результатов
+            recorded = self.manifest.get("search_query", SEARCH_QUERY)
+            search = query.get("search", [""])[0]
+            text = (text.replace(f'value="{recorded}"', f'value="{html.escape(search)}"')
+                        .replace(f"- {recorded}", f"- {html.escape(search)}")
+                        .replace(f"search={recorded}", f"search={quote(search)}"))
+        return page["status"], page["content_type"], {}, text.encode("utf-8")
+
+    def resolve(self, path):
+        """(status, content_type, headers, body) для пути запроса"""
+        parts = urlsplit(path)
+        query = parse_qs(parts.query, keep_blank_values=True)
+        asset = self.manifest["assets"].get(parts.path)
+        if asset:
+            return 200, asset["content_type"], asset.get("headers", {}), self._read(asset["file"])
+
+        route = _route(path)
+        if route in REDIRECTS:
+            location = f"{self.url}/index.php?route={REDIRECTS[route]}"
+            return 302, "text/html; charset=utf-8", {"Location": location}, b""
+        if route is None or route not in self.manifest["pages"]:
+            route = "404"
+        return self._page(route, query)
+
+    def handle(self, request, head=False):
+        self.requests += 1
+        length = int(request.headers.get("Content-Length") or 0)
+        if length:
+            request.rfile.read(length)
+
+        status, content_type, headers, body = self.resolve(request.path)
+        time.sleep(self.profile.latency)
+        request.send_response(status)
+        request.send_header("Content-Type", content_type)
+        request.send_header("Content-Length", str(len(body)))
+        for name, value in headers.items():
+            request.send_header(name, value)
+        request.end_headers()
+        if head:
+            return
+        self._write(request.wfile, body)
+
+    def _write(self, stream, body):
+        """Отдача с ограничением пропускной способности профиля"""
+        if not self.profile.bandwidth:
+            stream.write(body)
+            return
+        chunk = max(int(self.profile.bandwidth / 50), 1024)
+        start = time.perf_counter()
+        for offset in range(0, len(body), chunk):
+            stream.write(body[offset:offset + chunk])
+            ahead = (offset + chunk) / self.profile.bandwidth - (time.perf_counter() - start)
+            if ahead > 0:
+                time.sleep(ahead)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stand-in OpenCart storefront built from recorded snapshots")
+    commands = parser.add_subparsers(dest="command", required=True)
+    record_parser = commands.add_parser("record", help="record snapshots from a running store")
+    record_parser.add_argument("--base-url", default="http://localhost")
+    record_parser.add_argument("--out", default=DEFAULT_SNAPSHOT_DIR)
+    serve_parser = commands.add_parser("serve", help="serve recorded snapshots")
+    serve_parser.add_argument("--snapshots", default=DEFAULT_SNAPSHOT_DIR)
+    serve_parser.add_argument("--profile", default="none", choices=sorted(NETWORK_PROFILES))
+    serve_parser.add_argument("--port", type=int, default=8080)
+    args = parser.parse_args()
+
+    if args.command == "record":
+        record(args.base_url, args.out)
+        return
+    server = StandinServer(args.snapshots, args.profile, port=args.port)
+    print(f"Serving {args.snapshots} at {server.url} ({args.profile} network profile)")
+    server.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
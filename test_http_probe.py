@@ -0,0 +1,30 @@
+from http_probe import ProbedPage
+
+
+PAGE = """
+<html><body>
+<div id="logo"><a href="/"><img src="logo.png" alt="Your Store" title="Your Store"></a></div>
+<div class="product-thumb"><a href="p1" data-label="a, b">One</a></div>
+<div class="product-thumb"><a href="p2" data-label="[x]">Two</a></div>
+</body></html>
+"""
+
+
+class TestSelectors:
+    """Разбор CSS-селекторов ProbedPage без браузера и сети"""
+
+    def page(self):
+        return ProbedPage("http://localhost/", 200, {}, PAGE, 0.0, [])
+
+    def test_quoted_attribute_with_spaces(self):
+        """Пробел в значении атрибута не делит селектор на потомков"""
+        page = self.page()
+        assert len(page.select("img[alt*='Your Store']")) == 1
+        assert len(page.select('#logo img[title="Your Store"]')) == 1
+        assert page.select("img[alt*='Your Shop']") == []
+
+    def test_quoted_attribute_with_comma_and_brackets(self):
+        """Запятая и скобки в кавычках не делят селектор на группы"""
+        page = self.page()
+        assert [element.text for element in page.select("a[data-label='a, b']")] == ["One"]
+        assert [element.text for element in page.select(".product-thumb a[data-label='[x]'], #logo img")] == ["", "Two"]
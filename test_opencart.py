@@ -1,5 +1,4 @@
 import pytest
-import time
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
@@ -7,11 +6,15 @@ from selenium.webdriver.common.action_chains import ActionChains
 from selenium.webdriver.support.ui import Select
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
 
+import cache_modes
+import perf_metrics
+import waits
+
 
 class TestOpenCart:
     """Автотесты для OpenCart интернет-магазина"""
 
-    def test_01_homepage_loads(self, driver, base_url):
+    def test_01_homepage_loads(self, driver, base_url, locators):
         """Тест 1: Проверка загрузки главной страницы"""
         driver.get(base_url)
 
@@ -22,10 +25,10 @@ class TestOpenCart:
         assert "OpenCart" in driver.title or "Your Store" in driver.title
 
         # Проверяем наличие основных элементов
-        logo = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "img[alt*='Your Store'], .logo img, #logo img")))
+        logo = wait.until(EC.presence_of_element_located(locators.by("logo")))
         assert logo.is_displayed()
 
-    def test_02_search_functionality(self, driver, base_url):
+    def test_02_search_functionality(self, driver, base_url, locators, dom):
         """Тест 2: Проверка функционала поиска"""
         driver.get(base_url)
 
@@ -33,62 +36,65 @@ class TestOpenCart:
 
         # Находим поле поиска
         search_input = wait.until(EC.presence_of_element_located((By.NAME, "search")))
-        search_button = driver.find_element(By.CSS_SELECTOR, "button[type='submit'].btn-default, .btn-search, button.btn.btn-default")
+        search_button = driver.find_element(*locators.by("search_button"))
 
         # Вводим запрос
         search_input.clear()
         search_input.send_keys("laptop")
+        current_url = driver.current_url
         search_button.click()
 
         # Проверяем результаты поиска
-        time.sleep(2)
-        assert "search" in driver.current_url.lower() or "laptop" in driver.page_source.lower()
+        waits.navigation(driver, current_url)
+        result = dom.batch().evaluate("url", "location.href").text_contains("query", "laptop").run()
+        assert "search" in result["url"].lower() or result["query"]
 
-    def test_03_navigation_menu(self, driver, base_url):
+    def test_03_navigation_menu(self, driver, base_url, locators):
         """Тест 3: Проверка навигационного меню"""
         driver.get(base_url)
 
         wait = WebDriverWait(driver, 10)
 
         # Ищем элементы навигации
-        try:
-            nav_menu = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, ".navbar-nav, .nav, .menu")))
+        if locators.selector("nav_menu"):
+            nav_menu = wait.until(EC.presence_of_element_located(locators.by("nav_menu")))
             assert nav_menu.is_displayed()
 
             # Проверяем наличие ссылок в меню
-            menu_links = driver.find_elements(By.CSS_SELECTOR, ".navbar-nav a, .nav a, .menu a")
+            menu_links = locators.find_all("nav_links")
             assert len(menu_links) > 0
 
-        except TimeoutException:
+        else:
             # Альтернативный поиск категорий
-            categories = driver.find_elements(By.CSS_SELECTOR, ".list-group-item, .category-link")
+            categories = locators.find_all("categories")
             assert len(categories) > 0
 
-    def test_04_product_catalog(self, driver, base_url):
+    def test_04_product_catalog(self, driver, base_url, locators):
         """Тест 4: Проверка каталога товаров"""
         driver.get(base_url)
 
         wait = WebDriverWait(driver, 10)
 
         # Ищем товары на главной странице
-        try:
-            products = wait.until(EC.presence_of_all_elements_located((By.CSS_SELECTOR, ".product-thumb, .product-item, .product")))
+        if locators.selector("product"):
+            products = wait.until(EC.presence_of_all_elements_located(locators.by("product")))
             assert len(products) > 0
 
             # Проверяем первый товар
             first_product = products[0]
             assert first_product.is_displayed()
 
-        except TimeoutException:
+        else:
             # Переходим в каталог если товаров нет на главной
             catalog_link = driver.find_element(By.PARTIAL_LINK_TEXT, "Catalog")
+            current_url = driver.current_url
             catalog_link.click()
-            time.sleep(2)
+            waits.navigation(driver, current_url)
 
-            products = driver.find_elements(By.CSS_SELECTOR, ".product-thumb, .product-item, .product")
+            products = locators.find_all("product")
             assert len(products) > 0
 
-    def test_05_product_details(self, driver, base_url):
+    def test_05_product_details(self, driver, base_url, locators):
         """Тест 5: Проверка страницы товара"""
         driver.get(base_url)
 
@@ -96,17 +102,18 @@ class TestOpenCart:
 
         # Находим и кликаем на товар
         try:
-            product_link = wait.until(EC.element_to_be_clickable((By.CSS_SELECTOR, ".product-thumb a, .product-item a, .product a")))
+            product_link = wait.until(EC.element_to_be_clickable(locators.by("product_link")))
+            current_url = driver.current_url
             product_link.click()
 
-            time.sleep(2)
+            waits.navigation(driver, current_url)
 
             # Проверяем элементы на странице товара
             product_title = wait.until(EC.presence_of_element_located((By.TAG_NAME, "h1")))
             assert product_title.is_displayed()
 
             # Проверяем наличие цены
-            price_elements = driver.find_elements(By.CSS_SELECTOR, ".price, .price-new, .price-old")
+            price_elements = locators.find_all("price")
             assert len(price_elements) > 0
 
         except (TimeoutException, NoSuchElementException):
@@ -114,25 +121,27 @@ class TestOpenCart:
             search_input = driver.find_element(By.NAME, "search")
             search_input.send_keys("laptop")
             search_button = driver.find_element(By.CSS_SELECTOR, "button[type='submit']")
+            current_url = driver.current_url
             search_button.click()
-            time.sleep(2)
+            waits.navigation(driver, current_url)
 
-    def test_06_shopping_cart_access(self, driver, base_url):
+    def test_06_shopping_cart_access(self, driver, base_url, locators):
         """Тест 6: Проверка доступа к корзине"""
         driver.get(base_url)
 
         wait = WebDriverWait(driver, 10)
 
         # Ищем кнопку корзины
-        cart_button = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, ".btn-inverse, #cart, .cart, [title*='cart'], [title*='Cart']")))
+        cart_button = wait.until(EC.presence_of_element_located(locators.by("cart_button")))
         assert cart_button.is_displayed()
 
         # Кликаем на корзину
         cart_button.click()
-        time.sleep(1)
+        waits.ajax_idle(driver)
+        waits.dom_settled(driver)
 
         # Проверяем, что корзина открылась (может быть dropdown или отдельная страница)
-        cart_content = driver.find_elements(By.CSS_SELECTOR, ".dropdown-menu, .cart-content, .shopping-cart")
+        cart_content = locators.find_all("cart_content")
         assert len(cart_content) > 0 or "cart" in driver.current_url.lower()
 
     def test_07_user_account_access(self, driver, base_url):
@@ -142,57 +151,64 @@ class TestOpenCart:
         wait = WebDriverWait(driver, 10)
 
         # Ищем ссылку на аккаунт/вход
+        current_url = driver.current_url
+        account_link = None
         try:
             account_link = wait.until(EC.element_to_be_clickable((By.PARTIAL_LINK_TEXT, "My Account")))
-            account_link.click()
         except TimeoutException:
             try:
                 login_link = driver.find_element(By.PARTIAL_LINK_TEXT, "Login")
                 login_link.click()
             except NoSuchElementException:
-                account_dropdown = driver.find_element(By.CSS_SELECTOR, ".dropdown-toggle")
-                account_dropdown.click()
+                account_link = driver.find_element(By.CSS_SELECTOR, ".dropdown-toggle")
+
+        if account_link is not None:
+            opens_menu = "dropdown-toggle" in (account_link.get_attribute("class") or "")
+            account_link.click()
+            # В OpenCart 3 и 4 "My Account" только раскрывает меню, адрес не меняется:
+            # переходим по ссылке входа или аккаунта из этого меню
+            if opens_menu:
+                menu_link = wait.until(EC.element_to_be_clickable((
+                    By.CSS_SELECTOR,
+                    ".dropdown-menu a[href*='account/login'], .dropdown-menu a[href*='account/account']")))
+                menu_link.click()
 
-        time.sleep(2)
+        waits.navigation(driver, current_url)
 
         # Проверяем, что попали на страницу входа или аккаунта
         assert "account" in driver.current_url.lower() or "login" in driver.current_url.lower()
 
-    def test_08_currency_selector(self, driver, base_url):
+    def test_08_currency_selector(self, driver, base_url, locators):
         """Тест 8: Проверка селектора валют"""
         driver.get(base_url)
 
-        wait = WebDriverWait(driver, 10)
-
         # Ищем селектор валют
-        try:
-            currency_selector = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, ".currency, #form-currency")))
-            assert currency_selector.is_displayed()
-
-            # Проверяем доступные валюты
-            currency_options = driver.find_elements(By.CSS_SELECTOR, ".currency option, .currency a")
-            assert len(currency_options) > 0
-
-        except TimeoutException:
+        currency_selector = locators.find("currency_form")
+        if currency_selector is None:
             # Валютный селектор может отсутствовать в некоторых темах
             print("Currency selector not found - this may be expected for some themes")
+            return
+
+        assert currency_selector.is_displayed()
 
-    def test_09_language_selector(self, driver, base_url):
+        # Проверяем доступные валюты
+        currency_options = locators.find_all("currency_options")
+        assert len(currency_options) > 0
+
+    def test_09_language_selector(self, driver, base_url, locators):
         """Тест 9: Проверка селектора языков"""
         driver.get(base_url)
 
-        wait = WebDriverWait(driver, 10)
-
         # Ищем селектор языков
-        try:
-            language_selector = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, ".language, #form-language")))
-            assert language_selector.is_displayed()
-
-        except TimeoutException:
+        language_selector = locators.find("language_form")
+        if language_selector is None:
             # Селектор языков может отсутствовать
             print("Language selector not found - this may be expected for single-language setups")
+            return
+
+        assert language_selector.is_displayed()
 
-    def test_10_footer_links(self, driver, base_url):
+    def test_10_footer_links(self, driver, base_url, locators, dom):
         """Тест 10: Проверка ссылок в футере"""
         driver.get(base_url)
 
@@ -200,80 +216,65 @@ class TestOpenCart:
 
         # Прокручиваем к футеру
         driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-        time.sleep(1)
+        waits.scroll_settled(driver)
 
         # Ищем футер и ссылки в нем
-        footer = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "footer, .footer")))
-        assert footer.is_displayed()
-
-        footer_links = driver.find_elements(By.CSS_SELECTOR, "footer a, .footer a")
-        assert len(footer_links) > 0
+        wait.until(EC.presence_of_element_located(locators.by("footer")))
+        result = (dom.batch()
+                  .visible("footer", locators.css("footer"), limit=1)
+                  .count("footer_links", locators.css("footer_links"))
+                  .visible("first_links", locators.css("footer_links"), limit=3)  # проверяем первые 3 ссылки
+                  .run())
+        assert all(result["footer"])
+        assert result["footer_links"] > 0
 
         # Проверяем, что ссылки кликабельны
-        for link in footer_links[:3]:  # проверяем первые 3 ссылки
-            assert link.is_displayed()
+        assert all(result["first_links"])
 
-    def test_11_contact_page(self, driver, base_url):
+    @pytest.mark.http_only
+    def test_11_contact_page(self, page_probe):
         """Тест 11: Проверка страницы контактов"""
-        driver.get(base_url)
-
-        wait = WebDriverWait(driver, 10)
-
-        # Ищем ссылку на контакты
-        try:
-            contact_link = wait.until(EC.element_to_be_clickable((By.PARTIAL_LINK_TEXT, "Contact")))
-            contact_link.click()
+        home = page_probe.get()
 
-            time.sleep(2)
+        # Ищем ссылку на контакты (в шапке или футере)
+        contact_links = home.links("Contact")
+        assert len(contact_links) > 0, "no Contact link on the home page"
 
-            # Проверяем, что попали на страницу контактов
-            assert "contact" in driver.current_url.lower()
+        # Переходим по ссылке и проверяем, что попали на страницу контактов
+        page = page_probe.get(contact_links[0][0])
+        assert page.status == 200
+        assert "contact" in page.url.lower()
 
-            # Проверяем наличие формы контактов
-            contact_form = driver.find_elements(By.CSS_SELECTOR, "form, .form")
-            assert len(contact_form) > 0
-
-        except (TimeoutException, NoSuchElementException):
-            print("Contact page not found - checking footer for contact link")
-            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            footer_contact = driver.find_elements(By.PARTIAL_LINK_TEXT, "Contact")
-            assert len(footer_contact) > 0
+        # Проверяем наличие формы контактов
+        contact_form = page.select("form, .form")
+        assert len(contact_form) > 0
 
-    def test_12_responsive_design(self, driver, base_url):
+    def test_12_responsive_design(self, driver, base_url, locators, responsive_check):
         """Тест 12: Проверка адаптивного дизайна"""
         driver.get(base_url)
 
-        wait = WebDriverWait(driver, 10)
-
-        # Проверяем разные размеры экрана
-        screen_sizes = [
-            (1920, 1080),  # Desktop
-            (768, 1024),   # Tablet
-            (375, 667)     # Mobile
-        ]
-
-        for width, height in screen_sizes:
-            driver.set_window_size(width, height)
-            time.sleep(1)
+        # Устройства из --devices эмулируются через CDP в отдельных вкладках и грузятся одновременно
+        results = responsive_check.run(base_url, {"logo": locators.css("logo")})
 
+        for result in results:
+            assert result.error is None, f"{result.device}: {result.error}"
             # Проверяем, что основные элементы видны
-            logo = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "img[alt*='Store'], .logo img, #logo img")))
-            assert logo.is_displayed()
+            assert result.elements["logo"]["visible"], f"Logo is not visible on {result.device}"
 
-        # Возвращаем исходный размер
-        driver.maximize_window()
-
-    def test_13_page_load_speed(self, driver, base_url):
+    def test_13_page_load_speed(self, request, cache_measurement):
         """Тест 13: Проверка скорости загрузки страницы"""
-        start_time = time.time()
-        driver.get(base_url)
-
-        # Ждем полной загрузки страницы
-        wait = WebDriverWait(driver, 10)
-        wait.until(EC.presence_of_element_located((By.TAG_NAME, "body")))
-
-        load_time = time.time() - start_time
-
-        # Проверяем, что страница загрузилась менее чем за 10 секунд
-        assert load_time < 10, f"Page load time {load_time:.2f}s exceeds 10 seconds"
-        print(f"Page loaded in {load_time:.2f} seconds")
+        # Холодная и прогретая загрузка в свежем профиле, а не в сессии, прогретой другими тестами
+        runs = request.config.getoption("cache_runs")
+        violations = []
+        for route in request.config._cache_targets:
+            samples = cache_measurement.measure(route, runs)
+            assert all(sample["load"] is not None for sample in samples), "Navigation Timing is not available"
+
+            # Бюджеты маршрута из perf_budgets.json проверяются по медиане холодных загрузок
+            cold = cache_modes.medians(samples, route, "cold")
+            warm = cache_modes.medians(samples, route, "warm")
+            violations += perf_metrics.violations(cold, request.config._perf_budgets)
+            print(f"{route}: TTFB {cold['ttfb']} / {warm['ttfb']} ms, load {cold['load']} / {warm['load']} ms, "
+                  f"LCP {cold['lcp']} / {warm['lcp']} ms (cold / warm median of {runs})")
+
+        assert not violations, "Performance budget exceeded: " + "; ".join(violations)
@@ -1,5 +1,4 @@
 import pytest
-import time
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
@@ -7,54 +6,41 @@ from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.common.action_chains import ActionChains
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
 
+import waits
+
 
 class TestOpenCartAdvanced:
     """Продвинутые автотесты для OpenCart"""
 
-    def test_14_search_empty_query(self, driver, base_url):
+    @pytest.mark.http_only
+    def test_14_search_empty_query(self, page_probe):
         """Тест 14: Поиск с пустым запросом"""
-        driver.get(base_url)
-
-        wait = WebDriverWait(driver, 10)
-
-        # Находим поле поиска и отправляем пустой запрос
-        search_input = wait.until(EC.presence_of_element_located((By.NAME, "search")))
-        search_button = driver.find_element(By.CSS_SELECTOR, "button[type='submit'].btn-default, .btn-search, button.btn.btn-default")
-
-        search_input.clear()
-        search_button.click()
+        # Поле поиска в шапке есть на главной
+        home = page_probe.get()
+        assert home.select("input[name='search']")
 
-        time.sleep(2)
+        # При пустом поле кнопка поиска OpenCart 3 не добавляет search=: открывается маршрут поиска без запроса
+        page = page_probe.get("index.php", route="product/search")
+        assert page.status == 200
+        assert page.broken() is None
 
         # Проверяем обработку пустого поиска
-        page_content = driver.page_source.lower()
-        assert "search" in driver.current_url.lower() or "no results" in page_content or "найден" in page_content
+        text = page.text
+        assert "search" in page.url.lower() or "no results" in text or "найден" in text
 
-    def test_15_search_special_characters(self, driver, base_url):
+    @pytest.mark.http_only
+    def test_15_search_special_characters(self, page_probe):
         """Тест 15: Поиск со специальными символами"""
-        driver.get(base_url)
-
-        wait = WebDriverWait(driver, 10)
-
-        search_input = wait.until(EC.presence_of_element_located((By.NAME, "search")))
-        search_button = driver.find_element(By.CSS_SELECTOR, "button[type='submit'].btn-default, .btn-search, button.btn.btn-default")
-
         # Тестируем поиск со специальными символами
         special_queries = ["<script>", "'; DROP TABLE", "café", "smartphone's"]
 
         for query in special_queries:
-            search_input.clear()
-            search_input.send_keys(query)
-            search_button.click()
-            time.sleep(1)
+            page = page_probe.search(query)
 
             # Проверяем, что страница не сломалась
-            assert "error" not in driver.current_url.lower()
-
-            # Возвращаемся на главную для следующего теста
-            driver.get(base_url)
-            search_input = wait.until(EC.presence_of_element_located((By.NAME, "search")))
-            search_button = driver.find_element(By.CSS_SELECTOR, "button[type='submit'].btn-default, .btn-search, button.btn.btn-default")
+            assert page.status < 500, f"{query!r}: HTTP {page.status}"
+            assert page.broken() is None, f"{query!r}: {page.broken()}"
+            assert "error" not in page.url.lower()
 
     def test_16_keyboard_navigation(self, driver, base_url):
         """Тест 16: Навигация с клавиатуры"""
@@ -69,10 +55,12 @@ class TestOpenCartAdvanced:
         # Используем Tab для перехода между элементами
         actions = ActionChains(driver)
         actions.send_keys(Keys.TAB).perform()
-        time.sleep(0.5)
 
         # Проверяем, что фокус переместился
-        focused_element = driver.switch_to.active_element
+        focused_element = waits.until(
+            driver,
+            lambda d: d.switch_to.active_element if d.switch_to.active_element != search_input else False,
+            "focus_moved")
         assert focused_element != search_input
 
     def test_17_browser_back_forward(self, driver, base_url):
@@ -84,21 +72,22 @@ class TestOpenCartAdvanced:
         # Переходим на другую страницу
         try:
             contact_link = wait.until(EC.element_to_be_clickable((By.PARTIAL_LINK_TEXT, "Contact")))
+            home_url = driver.current_url
             contact_link.click()
-            time.sleep(2)
+            waits.navigation(driver, home_url)
 
             current_url = driver.current_url
 
             # Используем кнопку "Назад"
             driver.back()
-            time.sleep(2)
+            waits.navigation(driver, current_url)
 
             # Проверяем, что вернулись на главную
             assert driver.current_url != current_url
 
             # Используем кнопку "Вперед"
             driver.forward()
-            time.sleep(2)
+            waits.navigation(driver, home_url)
 
             # Проверяем, что вернулись на страницу контактов
             assert driver.current_url == current_url
@@ -108,14 +97,16 @@ class TestOpenCartAdvanced:
             search_input = driver.find_element(By.NAME, "search")
             search_input.send_keys("test")
             search_button = driver.find_element(By.CSS_SELECTOR, "button[type='submit']")
+            home_url = driver.current_url
             search_button.click()
-            time.sleep(2)
+            waits.navigation(driver, home_url)
 
+            search_url = driver.current_url
             driver.back()
-            time.sleep(2)
+            waits.navigation(driver, search_url)
             assert base_url in driver.current_url
 
-    def test_18_page_refresh(self, driver, base_url):
+    def test_18_page_refresh(self, driver, base_url, locators):
         """Тест 18: Обновление страницы"""
         driver.get(base_url)
 
@@ -126,17 +117,17 @@ class TestOpenCartAdvanced:
 
         # Обновляем страницу
         driver.refresh()
-        time.sleep(2)
+        waits.page_loaded(driver)
 
         # Проверяем, что страница загрузилась корректно
         new_title = driver.title
         assert new_title == original_title
 
         # Проверяем наличие основных элементов
-        logo = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "img[alt*='Store'], .logo img, #logo img")))
+        logo = wait.until(EC.presence_of_element_located(locators.by("logo")))
         assert logo.is_displayed()
 
-    def test_19_multiple_tabs(self, driver, base_url):
+    def test_19_multiple_tabs(self, driver, base_url, locators):
         """Тест 19: Работа с несколькими вкладками"""
         driver.get(base_url)
 
@@ -157,10 +148,10 @@ class TestOpenCartAdvanced:
 
         # Загружаем страницу в новой вкладке
         driver.get(base_url)
-        time.sleep(2)
+        waits.page_loaded(driver)
 
         # Проверяем, что страница загрузилась
-        logo = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "img[alt*='Store'], .logo img, #logo img")))
+        logo = wait.until(EC.presence_of_element_located(locators.by("logo")))
         assert logo.is_displayed()
 
         # Возвращаемся к исходной вкладке
@@ -171,7 +162,7 @@ class TestOpenCartAdvanced:
         driver.close()
         driver.switch_to.window(original_window)
 
-    def test_20_scroll_functionality(self, driver, base_url):
+    def test_20_scroll_functionality(self, driver, base_url, locators):
         """Тест 20: Функциональность прокрутки"""
         driver.get(base_url)
 
@@ -182,21 +173,23 @@ class TestOpenCartAdvanced:
 
         # Прокручиваем вниз
         driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-        time.sleep(1)
+        waits.scroll_settled(driver)
 
         # Проверяем, что футер видим
-        footer = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "footer, .footer")))
+        footer = wait.until(EC.presence_of_element_located(locators.by("footer")))
         assert footer.is_displayed()
 
         # Прокручиваем вверх
         driver.execute_script("window.scrollTo(0, 0);")
-        time.sleep(1)
+        waits.scroll_settled(driver)
 
         # Проверяем, что шапка видима
-        header = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "header, .header, nav")))
+        header = wait.until(EC.presence_of_element_located(locators.by("header")))
         assert header.is_displayed()
 
-    def test_21_css_and_images_loading(self, driver, base_url):
+    @pytest.mark.browser_profile("default")
+    @pytest.mark.network_policy("none")
+    def test_21_css_and_images_loading(self, driver, base_url, dom):
         """Тест 21: Проверка загрузки CSS и изображений"""
         driver.get(base_url)
 
@@ -205,20 +198,17 @@ class TestOpenCartAdvanced:
         # Ждем загрузки страницы
         wait.until(EC.presence_of_element_located((By.TAG_NAME, "body")))
 
-        # Проверяем загрузку изображений
-        images = driver.find_elements(By.TAG_NAME, "img")
-        loaded_images = 0
-
-        for img in images[:5]:  # проверяем первые 5 изображений
-            # Проверяем, что изображение загружено
-            if driver.execute_script("return arguments[0].complete && arguments[0].naturalHeight !== 0", img):
-                loaded_images += 1
+        # Проверяем загрузку первых 5 изображений и стили body одним запросом
+        result = (dom.batch()
+                  .images_complete("images", "img", limit=5)
+                  .style("background", "body", "background-color")
+                  .run())
+        loaded_images = sum(result["images"])
 
         assert loaded_images > 0, "No images loaded successfully"
 
         # Проверяем применение CSS стилей
-        body = driver.find_element(By.TAG_NAME, "body")
-        background_color = body.value_of_css_property("background-color")
+        background_color = result["background"]
 
         # Проверяем, что CSS применился (цвет фона не прозрачный)
         assert background_color != "rgba(0, 0, 0, 0)"
@@ -241,7 +231,7 @@ class TestOpenCartAdvanced:
                 # Пытаемся отправить форму с пустыми обязательными полями
                 submit_button = driver.find_element(By.CSS_SELECTOR, "button[type='submit'], input[type='submit']")
                 submit_button.click()
-                time.sleep(1)
+                waits.dom_settled(driver)
 
                 # Проверяем, что валидация сработала (форма не отправилась или показала ошибку)
                 validation_messages = driver.find_elements(By.CSS_SELECTOR, ".error, .invalid, .validation-error")
@@ -253,26 +243,19 @@ class TestOpenCartAdvanced:
         except (TimeoutException, NoSuchElementException):
             print("No forms with validation found on this page")
 
-    def test_23_error_handling(self, driver, base_url):
+    @pytest.mark.http_only
+    def test_23_error_handling(self, page_probe):
         """Тест 23: Обработка ошибок (404 страница)"""
         # Пытаемся перейти на несуществующую страницу
-        driver.get(f"{base_url}/nonexistent-page-12345")
-
-        time.sleep(2)
-
-        # Проверяем обработку 404 ошибки
-        page_content = driver.page_source.lower()
+        page = page_probe.get("nonexistent-page-12345")
 
         # Ищем признаки 404 страницы
         error_indicators = ["404", "not found", "page not found", "не найдена", "ошибка"]
-        found_error_indicator = any(indicator in page_content for indicator in error_indicators)
-
-        # Или проверяем статус через JavaScript если возможно
-        status_code = driver.execute_script("return window.performance.getEntriesByType('navigation')[0].responseStatus || 0")
+        error_indicator = any(indicator in page.body.lower() for indicator in error_indicators)
 
-        assert found_error_indicator or status_code == 404 or "error" in driver.current_url.lower()
+        assert error_indicator or page.status == 404 or "error" in page.url.lower()
 
-    def test_24_javascript_functionality(self, driver, base_url):
+    def test_24_javascript_functionality(self, driver, base_url, locators, dom):
         """Тест 24: Функциональность JavaScript"""
         driver.get(base_url)
 
@@ -287,7 +270,7 @@ class TestOpenCartAdvanced:
         # Проверяем интерактивные элементы
         try:
             # Ищем dropdown меню или другие интерактивные элементы
-            dropdowns = driver.find_elements(By.CSS_SELECTOR, ".dropdown, .dropdown-toggle")
+            dropdowns = locators.find_all("dropdown")
 
             if dropdowns:
                 dropdown = dropdowns[0]
@@ -295,14 +278,14 @@ class TestOpenCartAdvanced:
                 # Наводим курсор или кликаем на dropdown
                 actions = ActionChains(driver)
                 actions.move_to_element(dropdown).perform()
-                time.sleep(1)
+                waits.dom_settled(driver)
 
                 # Проверяем, что dropdown отреагировал
-                dropdown_menu = driver.find_elements(By.CSS_SELECTOR, ".dropdown-menu, .dropdown-content")
+                dropdown_menu = dom.batch().visible("menus", locators.css("dropdown_menu")).run()["menus"]
 
                 if dropdown_menu:
                     # Проверяем видимость меню
-                    menu_visible = any(menu.is_displayed() for menu in dropdown_menu)
+                    menu_visible = any(dropdown_menu)
                     assert menu_visible or js_enabled
 
         except Exception as e:
@@ -0,0 +1,140 @@
+"""Ожидания по условиям вместо фиксированных пауз time.sleep
+
+Каждое ожидание возвращается сразу, как только условие выполнено,
+и записывает фактическую длительность в журнал, который conftest.py
+выводит в итоговой сводке pytest.
+"""
+import time
+from collections import namedtuple
+
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from selenium.webdriver.support.ui import WebDriverWait
+
+
+DEFAULT_TIMEOUT = 10
+POLL_FREQUENCY = 0.05
+QUIET_PERIOD = 0.2
+
+WaitRecord = namedtuple("WaitRecord", "test name duration ok")
+
+# Тест, к которому относятся ожидания (выставляется из conftest.py)
+current_test = None
+
+_records = []
+
+# Счетчики XHR/fetch и время последней мутации DOM. Скрипт идемпотентен:
+# его ставит install() до загрузки документа, а проверки добавляют его
+# в начало на случай, если установка через CDP недоступна.
+INSTRUMENT_JS = """
+(function () {
+  if (window.__autotest) { return; }
+  var state = window.__autotest = {pending: 0, lastMutation: performance.now()};
+  var send = XMLHttpRequest.prototype.send;
+  XMLHttpRequest.prototype.send = function () {
+    state.pending++;
+    this.addEventListener('loadend', function () { state.pending--; });
+    return send.apply(this, arguments);
+  };
+  if (window.fetch) {
+    var fetch = window.fetch;
+    window.fetch = function () {
+      state.pending++;
+      return fetch.apply(this, arguments).finally(function () { state.pending--; });
+    };
+  }
+  new MutationObserver(function () { state.lastMutation = performance.now(); })
+    .observe(document, {subtree: true, childList: true, attributes: true, characterData: true});
+})();
+"""
+
+
+def install(driver):
+    """Регистрирует INSTRUMENT_JS для всех будущих документов (только Chrome)"""
+    try:
+        driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": INSTRUMENT_JS})
+    except (AttributeError, WebDriverException):
+        # Без CDP скрипт поставят сами проверки при первом вызове
+        pass
+
+
+def _script(driver, body, *args):
+    return driver.execute_script(INSTRUMENT_JS + body, *args)
+
+
+def until(driver, condition, name, timeout=DEFAULT_TIMEOUT, message=""):
+    """Ждет условие condition(driver) и записывает длительность под именем name"""
+    start = time.perf_counter()
+    try:
+        result = WebDriverWait(driver, timeout, poll_frequency=POLL_FREQUENCY).until(condition, message)
+    except TimeoutException:
+        _records.append(WaitRecord(current_test, name, time.perf_counter() - start, False))
+        raise
+    _records.append(WaitRecord(current_test, name, time.perf_counter() - start, True))
+    return result
+
+
+def url_changes(driver, old_url, timeout=DEFAULT_TIMEOUT):
+    """Ожидание смены URL после клика, back() или forward()"""
+    return until(driver, lambda d: d.current_url != old_url, "url_changes", timeout,
+                 f"URL did not change from {old_url}")
+
+
+def page_loaded(driver, timeout=DEFAULT_TIMEOUT):
+    """Ожидание document.readyState == 'complete'"""
+    return until(driver, lambda d: d.execute_script("return document.readyState") == "complete",
+                 "page_loaded", timeout, "document.readyState did not reach 'complete'")
+
+
+def navigation(driver, old_url, timeout=DEFAULT_TIMEOUT):
+    """Ожидание завершения перехода: URL сменился и документ загружен"""
+    url_changes(driver, old_url, timeout)
+    page_loaded(driver, timeout)
+
+
+def ajax_idle(driver, timeout=DEFAULT_TIMEOUT):
+    """Ожидание завершения запросов jQuery и XHR/fetch"""
+    return until(
+        driver,
+        lambda d: _script(d, "return (typeof jQuery === 'undefined' || jQuery.active === 0)"
+                             " && window.__autotest.pending === 0;"),
+        "ajax_idle", timeout, "XHR requests are still pending")
+
+
+def dom_settled(driver, quiet_period=QUIET_PERIOD, timeout=DEFAULT_TIMEOUT):
+    """Ожидание, пока в DOM не будет мутаций в течение quiet_period секунд"""
+    return until(
+        driver,
+        lambda d: _script(d, "return performance.now() - window.__autotest.lastMutation >= arguments[0];",
+                          quiet_period * 1000),
+        "dom_settled", timeout, f"DOM kept changing for {timeout}s")
+
+
+def scroll_settled(driver, timeout=DEFAULT_TIMEOUT):
+    """Ожидание окончания прокрутки (в т.ч. плавной scroll-behavior: smooth)"""
+    positions = []
+
+    def settled(d):
+        positions.append(d.execute_script("return [window.scrollX, window.scrollY];"))
+        return len(positions) > 1 and positions[-1] == positions[-2]
+
+    return until(driver, settled, "scroll_settled", timeout, "Page is still scrolling")
+
+
+def records():
+    """Все записанные ожидания текущего процесса"""
+    return list(_records)
+
+
+def merge(records):
+    """Ожидания воркеров xdist в журнал контроллера: records - списки полей WaitRecord"""
+    _records.extend(WaitRecord(*record) for record in records)
+
+
+def summary():
+    """Сводка по типам ожиданий: {name: (calls, total, max, timeouts)}"""
+    result = {}
+    for record in _records:
+        calls, total, longest, timeouts = result.get(record.name, (0, 0.0, 0.0, 0))
+        result[record.name] = (calls + 1, total + record.duration,
+                               max(longest, record.duration), timeouts + (not record.ok))
+    return result